@@ -0,0 +1,16 @@
+"""
+API模块初始化
+"""
+from .auth import HuobiAuth
+from .client import HuobiClient
+from .async_client import AsyncHuobiClient
+from .rate_limit import RateLimiter, TokenBucket
+from .websocket import MarketDataHub
+from .private_websocket import AccountStream
+from .cache import TickerCache, AccountCache, BalanceCache
+
+__all__ = [
+    'HuobiAuth', 'HuobiClient', 'AsyncHuobiClient',
+    'RateLimiter', 'TokenBucket', 'MarketDataHub', 'AccountStream',
+    'TickerCache', 'AccountCache', 'BalanceCache'
+]
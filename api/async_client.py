@@ -0,0 +1,291 @@
+"""
+火币异步REST API客户端
+"""
+import asyncio
+import json
+import logging
+from typing import Dict, Optional, List
+
+import aiohttp
+
+from .auth import HuobiAuth
+from .cache import AccountCache, BalanceCache
+from .orders import (
+    BATCH_CANCEL_LIMIT, BATCH_PLACE_LIMIT, BatchCancelResult, BatchPlaceResult,
+    chunked, fail_chunk, merge_cancel_results, merge_place_results, order_params
+)
+from .rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncHuobiClient:
+    """火币异步API客户端
+
+    接口与 HuobiClient 保持一致，所有方法均为协程，可直接在 Telegram 处理器中 await。
+    底层使用共享的 aiohttp 连接池（keep-alive + 单主机连接数限制），不会阻塞事件循环。
+    """
+
+    def __init__(self, api_key: str, secret_key: str, base_url: str = 'https://api.huobi.pro',
+                 pool_size: int = 100, pool_per_host: int = 20,
+                 keepalive: float = 30, timeout: float = 10, rate_limiter: RateLimiter = None,
+                 balance_ttl: float = 5.0):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.base_url = base_url
+        self.auth = HuobiAuth(api_key, secret_key)
+        self.account_id = None
+        self._pool_size = pool_size
+        self._pool_per_host = pool_per_host
+        self._keepalive = keepalive
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.accounts = AccountCache()
+        self.balances = BalanceCache(balance_ttl)
+        # 可选的交易对索引（services.symbols.SymbolIndex），用于下单精度处理
+        self.symbol_index = None
+        # 可选的账户推送（api.private_websocket.AccountStream），就绪时余额与挂单直接读内存
+        self.account_stream = None
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """获取共享会话（首次调用时在当前事件循环中创建）"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self._pool_size,
+                limit_per_host=self._pool_per_host,
+                keepalive_timeout=self._keepalive,
+                ttl_dns_cache=300
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=self._timeout,
+                headers={
+                    'User-Agent': 'Mozilla/5.0',
+                    'Content-Type': 'application/json'
+                }
+            )
+        return self._session
+
+    async def close(self):
+        """关闭连接池"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def _request(self, method: str, path: str, params: Dict = None,
+                       auth_required: bool = False) -> Dict:
+        """发送HTTP请求"""
+        await self.rate_limiter.acquire_async(method, path)
+
+        url = f"{self.base_url}{path}"
+        session = await self._get_session()
+
+        try:
+            if auth_required:
+                auth_params = self.auth.generate_signature(method, url, params if method == 'GET' else None)
+
+                if method == 'GET':
+                    request = session.get(url, params=auth_params)
+                else:
+                    request = session.post(
+                        url,
+                        params=auth_params,
+                        data=json.dumps(params) if params else None
+                    )
+            else:
+                if method == 'GET':
+                    request = session.get(url, params=params)
+                else:
+                    request = session.post(url, json=params)
+
+            async with request as response:
+                response.raise_for_status()
+                data = await response.json(content_type=None)
+
+            if data.get('status') == 'error':
+                error_msg = f"API Error: {data.get('err-code', 'Unknown')} - {data.get('err-msg', 'No message')}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+            return data
+
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise
+
+    async def get_symbols(self) -> List[Dict]:
+        """获取所有交易对信息"""
+        response = await self._request('GET', '/v1/common/symbols')
+        return response.get('data', [])
+
+    async def get_ticker(self, symbol: str) -> Dict:
+        """获取最新ticker"""
+        response = await self._request('GET', '/market/detail/merged', {'symbol': symbol})
+        return response.get('tick', {})
+
+    async def get_tickers(self) -> List[Dict]:
+        """获取全市场ticker快照"""
+        response = await self._request('GET', '/market/tickers')
+        return response.get('data', [])
+
+    async def get_klines(self, symbol: str, period: str, size: int = 200) -> List:
+        """获取K线数据"""
+        params = {
+            'symbol': symbol,
+            'period': period,
+            'size': size
+        }
+        response = await self._request('GET', '/market/history/kline', params)
+        return response.get('data', [])
+
+    async def get_accounts(self, refresh: bool = False) -> List[Dict]:
+        """获取账户列表（默认读取缓存）"""
+        if refresh or not self.accounts.valid:
+            response = await self._request('GET', '/v1/account/accounts', auth_required=True)
+            self.accounts.load(response.get('data', []))
+        return self.accounts.list()
+
+    async def get_account_id(self, account_type: str = 'spot') -> int:
+        """获取可用账户ID"""
+        if account_type == 'spot' and self.account_id:
+            return self.account_id
+
+        await self.get_accounts()
+        account_id = self.accounts.find_id(account_type)
+        if account_id is None:
+            account_id = self.accounts.find_id(account_type, state=None)
+        if account_id is None:
+            raise Exception(f"未找到 {account_type} 账户")
+
+        if account_type == 'spot':
+            self.account_id = account_id
+        return account_id
+
+    def invalidate_accounts(self):
+        """清除账户与余额缓存"""
+        self.account_id = None
+        self.accounts.invalidate()
+        self.balances.invalidate()
+
+    async def get_balance(self, account_id: int = None, refresh: bool = False) -> Dict:
+        """获取账户余额（短时间内复用快照）"""
+        if not account_id:
+            account_id = await self.get_account_id()
+
+        if not refresh:
+            stream = self.account_stream
+            if stream is not None and stream.ready and stream.account_id == account_id:
+                return stream.balance_data()
+            cached = self.balances.get(account_id)
+            if cached is not None:
+                return cached
+
+        response = await self._request('GET', f'/v1/account/accounts/{account_id}/balance', auth_required=True)
+        data = response.get('data', {})
+        self.balances.put(account_id, data)
+        return data
+
+    async def place_order(self, symbol: str, amount: str, price: str = None,
+                          order_type: str = 'buy-limit', client_order_id: str = None) -> str:
+        """下单"""
+        account_id = await self.get_account_id()
+
+        if self.symbol_index is not None:
+            amount, price = self.symbol_index.format_order(symbol, amount, price)
+
+        params = {
+            'account-id': str(account_id),
+            'symbol': symbol,
+            'type': order_type,
+            'amount': amount
+        }
+
+        if 'limit' in order_type and price:
+            params['price'] = price
+
+        if client_order_id:
+            params['client-order-id'] = client_order_id
+
+        response = await self._request('POST', '/v1/order/orders/place', params, auth_required=True)
+        # 下单会冻结资金，旧快照不再准确
+        self.balances.invalidate(account_id)
+        return response.get('data', '')
+
+    async def cancel_order(self, client_order_id: str) -> Dict:
+        """按 client-order-id 撤单"""
+        response = await self._request(
+            'POST', '/v1/order/orders/submitCancelClientOrder',
+            {'client-order-id': client_order_id}, auth_required=True
+        )
+        self.balances.invalidate()
+        return response.get('data', {})
+
+    async def get_order_by_client_id(self, client_order_id: str) -> Optional[Dict]:
+        """按 client-order-id 查询订单详情（查无此单返回 None）"""
+        try:
+            response = await self._request(
+                'GET', '/v1/order/orders/getClientOrder', {'clientOrderId': client_order_id}, auth_required=True
+            )
+        except Exception as e:
+            if 'base-record-invalid' in str(e):
+                return None
+            raise
+        return response.get('data') or None
+
+    async def place_orders_batch(self, orders: List[Dict]) -> BatchPlaceResult:
+        """批量下单：按每批10单切分并发提交，返回 (成功, 失败) 两个以 client-order-id 为键的字典"""
+        if not orders:
+            return {}, {}
+        account_id = await self.get_account_id()
+        params = [order_params(account_id, order, self.symbol_index) for order in orders]
+        chunks = list(chunked(params, BATCH_PLACE_LIMIT))
+        results = await asyncio.gather(
+            *(self._request('POST', '/v1/order/batch-orders', chunk, auth_required=True) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        placed: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                fail_chunk(chunk, result, failed)
+            else:
+                merge_place_results(chunk, result.get('data') or [], placed, failed)
+        self.balances.invalidate(account_id)
+        return placed, failed
+
+    async def cancel_orders_batch(self, client_order_ids: List[str]) -> BatchCancelResult:
+        """批量撤单：按每批50单切分并发提交，返回 (成功列表, 失败字典)"""
+        if not client_order_ids:
+            return [], {}
+        chunks = list(chunked(list(client_order_ids), BATCH_CANCEL_LIMIT))
+        results = await asyncio.gather(
+            *(self._request(
+                'POST', '/v1/order/orders/batchcancel', {'client-order-ids': list(chunk)}, auth_required=True
+            ) for chunk in chunks),
+            return_exceptions=True
+        )
+
+        cancelled: List[str] = []
+        failed: Dict[str, str] = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                fail_chunk(chunk, result, failed)
+            else:
+                merge_cancel_results(chunk, result.get('data'), cancelled, failed)
+        self.balances.invalidate()
+        return cancelled, failed
+
+    async def get_open_orders(self, symbol: str = None, size: int = 500, refresh: bool = False) -> List[Dict]:
+        """获取当前挂单（单次最多500条；账户推送就绪时读内存）"""
+        stream = self.account_stream
+        if not refresh and stream is not None and stream.ready:
+            return stream.open_orders(symbol)
+
+        account_id = await self.get_account_id()
+        params = {'account-id': str(account_id), 'size': size}
+        if symbol:
+            params['symbol'] = symbol
+        response = await self._request('GET', '/v1/order/openOrders', params, auth_required=True)
+        return response.get('data', [])
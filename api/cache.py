@@ -0,0 +1,198 @@
+"""
+API数据缓存
+"""
+import asyncio
+import functools
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TickerCache:
+    """Ticker缓存（TTL + LRU + 请求合并）
+
+    同一交易对并发未命中时只发起一次上游请求，其余调用等待同一个结果；
+    失败结果不缓存，异常会传递给所有等待者（等待者全部取消时由完成回调取回并计入 errors）。
+    """
+
+    def __init__(self, fetch: Callable[[str], Awaitable[Dict]], ttl: float = 2.0,
+                 maxsize: int = 512, ttl_overrides: Dict[str, float] = None):
+        self.fetch = fetch
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.ttl_overrides: Dict[str, float] = dict(ttl_overrides or {})
+        self._data: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.upstream_calls = 0
+        self.errors = 0
+
+    def set_ttl(self, symbol: str, ttl: float):
+        """设置单个交易对的TTL"""
+        self.ttl_overrides[symbol] = ttl
+
+    def peek(self, symbol: str) -> Optional[Dict]:
+        """读取未过期的缓存，不触发请求"""
+        entry = self._data.get(symbol)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del self._data[symbol]
+            return None
+        self._data.move_to_end(symbol)
+        return value
+
+    def put(self, symbol: str, value: Dict):
+        """写入缓存并按LRU淘汰"""
+        ttl = self.ttl_overrides.get(symbol, self.ttl)
+        self._data[symbol] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(symbol)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, symbol: str = None):
+        """清除单个或全部缓存"""
+        if symbol is None:
+            self._data.clear()
+        else:
+            self._data.pop(symbol, None)
+
+    async def get(self, symbol: str) -> Dict:
+        """读取ticker，未命中时合并并发请求"""
+        value = self.peek(symbol)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        task = self._inflight.get(symbol)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(symbol))
+            task.add_done_callback(functools.partial(self._load_done, symbol))
+            self._inflight[symbol] = task
+
+        # shield: 单个调用方被取消时不影响其他等待者
+        return await asyncio.shield(task)
+
+    async def _load(self, symbol: str) -> Dict:
+        self.upstream_calls += 1
+        value = await self.fetch(symbol)
+        if value:
+            self.put(symbol, value)
+        return value
+
+    def _load_done(self, symbol: str, task: asyncio.Task):
+        """请求结束：清除进行中记录，并取回异常（调用方都已取消时避免 "Task exception was never retrieved"）"""
+        if self._inflight.get(symbol) is task:
+            del self._inflight[symbol]
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            self.errors += 1
+            logger.warning(f"获取 {symbol} ticker 失败: {error}")
+
+    def stats(self) -> Dict[str, Any]:
+        """命中统计"""
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'coalesced': self.coalesced,
+            'upstream_calls': self.upstream_calls,
+            'errors': self.errors,
+            'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
+
+
+class AccountCache:
+    """账户元数据缓存（账户ID、类型、状态）
+
+    账户列表极少变化，默认缓存一小时；账户状态异常或切换账户时调用 invalidate 强制刷新。
+    """
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self.accounts: Dict[int, Dict] = {}
+        self._expires_at = 0.0
+
+    @property
+    def valid(self) -> bool:
+        return bool(self.accounts) and time.monotonic() < self._expires_at
+
+    def load(self, accounts: List[Dict]):
+        """写入 /v1/account/accounts 返回的账户列表"""
+        self.accounts = {acc['id']: acc for acc in accounts}
+        self._expires_at = time.monotonic() + self.ttl
+
+    def list(self) -> List[Dict]:
+        return list(self.accounts.values())
+
+    def find_id(self, account_type: str = 'spot', state: str = 'working') -> Optional[int]:
+        """按类型与状态查找账户ID"""
+        for account in self.accounts.values():
+            if account.get('type') == account_type and (state is None or account.get('state') == state):
+                return account['id']
+        return None
+
+    def invalidate(self):
+        self.accounts = {}
+        self._expires_at = 0.0
+
+
+class BalanceCache:
+    """余额快照缓存
+
+    按账户保存最近一次 /balance 结果，短TTL内的重复查询直接复用；
+    账户推送（AccountStream）到来时通过 set_balance 原地更新，无需重新拉取。
+    """
+
+    def __init__(self, ttl: float = 5.0):
+        self.ttl = ttl
+        # account_id -> {(currency, type): entry}
+        self._entries: Dict[int, Dict[tuple, Dict]] = {}
+        self._meta: Dict[int, Dict] = {}
+        self._expires_at: Dict[int, float] = {}
+
+    def get(self, account_id: int) -> Optional[Dict]:
+        """读取未过期的余额快照（与接口返回格式一致）"""
+        if time.monotonic() >= self._expires_at.get(account_id, 0):
+            return None
+        data = dict(self._meta[account_id])
+        data['list'] = [dict(entry) for entry in self._entries[account_id].values()]
+        return data
+
+    def put(self, account_id: int, data: Dict):
+        """写入完整余额快照"""
+        self._meta[account_id] = {k: v for k, v in data.items() if k != 'list'}
+        self._entries[account_id] = {
+            (item['currency'], item['type']): dict(item) for item in data.get('list', [])
+        }
+        self._expires_at[account_id] = time.monotonic() + self.ttl
+
+    def set_balance(self, account_id: int, currency: str, balance: float, balance_type: str = 'trade'):
+        """覆盖单个币种余额"""
+        entries = self._entries.get(account_id)
+        if entries is None:
+            return
+        entry = entries.setdefault((currency, balance_type), {'currency': currency, 'type': balance_type})
+        entry['balance'] = str(balance)
+
+    def invalidate(self, account_id: int = None):
+        if account_id is None:
+            self._entries.clear()
+            self._meta.clear()
+            self._expires_at.clear()
+        else:
+            self._entries.pop(account_id, None)
+            self._meta.pop(account_id, None)
+            self._expires_at.pop(account_id, None)
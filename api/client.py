@@ -0,0 +1,242 @@
+"""
+火币REST API客户端
+"""
+import requests
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from .auth import HuobiAuth
+from .cache import AccountCache, BalanceCache
+from .orders import (
+    BATCH_CANCEL_LIMIT, BATCH_PLACE_LIMIT, BatchCancelResult, BatchPlaceResult,
+    chunked, fail_chunk, merge_cancel_results, merge_place_results, order_params
+)
+from .rate_limit import RateLimiter
+
+logger = logging.getLogger(__name__)
+
+class HuobiClient:
+    """火币API客户端"""
+
+    def __init__(self, api_key: str, secret_key: str, base_url: str = 'https://api.huobi.pro',
+                 rate_limiter: RateLimiter = None, balance_ttl: float = 5.0):
+        self.api_key = api_key
+        self.secret_key = secret_key
+        self.base_url = base_url
+        self.auth = HuobiAuth(api_key, secret_key)
+        self.session = requests.Session()
+        self.session.headers.update({
+            'User-Agent': 'Mozilla/5.0',
+            'Content-Type': 'application/json'
+        })
+        self.account_id = None
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.accounts = AccountCache()
+        self.balances = BalanceCache(balance_ttl)
+        # 可选的交易对索引（services.symbols.SymbolIndex），用于下单精度处理
+        self.symbol_index = None
+
+    def _request(self, method: str, path: str, params: Dict = None, 
+                auth_required: bool = False) -> Dict:
+        """发送HTTP请求"""
+        self.rate_limiter.acquire(method, path)
+
+        url = f"{self.base_url}{path}"
+
+        try:
+            if auth_required:
+                auth_params = self.auth.generate_signature(method, url, params if method == 'GET' else None)
+
+                if method == 'GET':
+                    response = self.session.get(url, params=auth_params, timeout=10)
+                else:
+                    response = self.session.post(
+                        url, 
+                        params=auth_params,
+                        data=json.dumps(params) if params else None,
+                        timeout=10
+                    )
+            else:
+                if method == 'GET':
+                    response = self.session.get(url, params=params, timeout=10)
+                else:
+                    response = self.session.post(url, json=params, timeout=10)
+
+            response.raise_for_status()
+            data = response.json()
+
+            if data.get('status') == 'error':
+                error_msg = f"API Error: {data.get('err-code', 'Unknown')} - {data.get('err-msg', 'No message')}"
+                logger.error(error_msg)
+                raise Exception(error_msg)
+
+            return data
+
+        except Exception as e:
+            logger.error(f"Request failed: {e}")
+            raise
+
+    def get_symbols(self) -> List[Dict]:
+        """获取所有交易对信息"""
+        response = self._request('GET', '/v1/common/symbols')
+        return response.get('data', [])
+
+    def get_ticker(self, symbol: str) -> Dict:
+        """获取最新ticker"""
+        response = self._request('GET', '/market/detail/merged', {'symbol': symbol})
+        return response.get('tick', {})
+
+    def get_tickers(self) -> List[Dict]:
+        """获取全市场ticker快照"""
+        response = self._request('GET', '/market/tickers')
+        return response.get('data', [])
+
+    def get_klines(self, symbol: str, period: str, size: int = 200) -> List:
+        """获取K线数据"""
+        params = {
+            'symbol': symbol,
+            'period': period,
+            'size': size
+        }
+        response = self._request('GET', '/market/history/kline', params)
+        return response.get('data', [])
+
+    def get_accounts(self, refresh: bool = False) -> List[Dict]:
+        """获取账户列表（默认读取缓存）"""
+        if refresh or not self.accounts.valid:
+            response = self._request('GET', '/v1/account/accounts', auth_required=True)
+            self.accounts.load(response.get('data', []))
+        return self.accounts.list()
+
+    def get_account_id(self, account_type: str = 'spot') -> int:
+        """获取可用账户ID"""
+        if account_type == 'spot' and self.account_id:
+            return self.account_id
+
+        self.get_accounts()
+        account_id = self.accounts.find_id(account_type)
+        if account_id is None:
+            account_id = self.accounts.find_id(account_type, state=None)
+        if account_id is None:
+            raise Exception(f"未找到 {account_type} 账户")
+
+        if account_type == 'spot':
+            self.account_id = account_id
+        return account_id
+
+    def invalidate_accounts(self):
+        """清除账户与余额缓存"""
+        self.account_id = None
+        self.accounts.invalidate()
+        self.balances.invalidate()
+
+    def get_balance(self, account_id: int = None, refresh: bool = False) -> Dict:
+        """获取账户余额（短时间内复用快照）"""
+        if not account_id:
+            account_id = self.get_account_id()
+
+        if not refresh:
+            cached = self.balances.get(account_id)
+            if cached is not None:
+                return cached
+
+        response = self._request('GET', f'/v1/account/accounts/{account_id}/balance', auth_required=True)
+        data = response.get('data', {})
+        self.balances.put(account_id, data)
+        return data
+
+    def place_order(self, symbol: str, amount: str, price: str = None, 
+                   order_type: str = 'buy-limit', client_order_id: str = None) -> str:
+        """下单"""
+        account_id = self.get_account_id()
+
+        if self.symbol_index is not None:
+            amount, price = self.symbol_index.format_order(symbol, amount, price)
+
+        params = {
+            'account-id': str(account_id),
+            'symbol': symbol,
+            'type': order_type,
+            'amount': amount
+        }
+
+        if 'limit' in order_type and price:
+            params['price'] = price
+
+        if client_order_id:
+            params['client-order-id'] = client_order_id
+
+        response = self._request('POST', '/v1/order/orders/place', params, auth_required=True)
+        # 下单会冻结资金，旧快照不再准确
+        self.balances.invalidate(account_id)
+        return response.get('data', '')
+
+    def cancel_order(self, client_order_id: str) -> Dict:
+        """按 client-order-id 撤单"""
+        response = self._request(
+            'POST', '/v1/order/orders/submitCancelClientOrder',
+            {'client-order-id': client_order_id}, auth_required=True
+        )
+        self.balances.invalidate()
+        return response.get('data', {})
+
+    def _post_chunks(self, path: str, bodies: List) -> List:
+        """并发提交多批请求（线程池，令牌桶限流），按顺序返回结果或异常"""
+        def post(body):
+            try:
+                return self._request('POST', path, body, auth_required=True)
+            except Exception as e:
+                return e
+
+        if len(bodies) == 1:
+            return [post(bodies[0])]
+        with ThreadPoolExecutor(max_workers=min(len(bodies), 4)) as pool:
+            return list(pool.map(post, bodies))
+
+    def place_orders_batch(self, orders: List[Dict]) -> BatchPlaceResult:
+        """批量下单：按每批10单切分并发提交，返回 (成功, 失败) 两个以 client-order-id 为键的字典"""
+        if not orders:
+            return {}, {}
+        account_id = self.get_account_id()
+        params = [order_params(account_id, order, self.symbol_index) for order in orders]
+        chunks = list(chunked(params, BATCH_PLACE_LIMIT))
+        results = self._post_chunks('/v1/order/batch-orders', chunks)
+
+        placed: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                fail_chunk(chunk, result, failed)
+            else:
+                merge_place_results(chunk, result.get('data') or [], placed, failed)
+        self.balances.invalidate(account_id)
+        return placed, failed
+
+    def cancel_orders_batch(self, client_order_ids: List[str]) -> BatchCancelResult:
+        """批量撤单：按每批50单切分并发提交，返回 (成功列表, 失败字典)"""
+        if not client_order_ids:
+            return [], {}
+        chunks = list(chunked(list(client_order_ids), BATCH_CANCEL_LIMIT))
+        results = self._post_chunks(
+            '/v1/order/orders/batchcancel', [{'client-order-ids': list(chunk)} for chunk in chunks]
+        )
+
+        cancelled: List[str] = []
+        failed: Dict[str, str] = {}
+        for chunk, result in zip(chunks, results):
+            if isinstance(result, Exception):
+                fail_chunk(chunk, result, failed)
+            else:
+                merge_cancel_results(chunk, result.get('data'), cancelled, failed)
+        self.balances.invalidate()
+        return cancelled, failed
+
+    def get_open_orders(self, symbol: str = None, size: int = 500) -> List[Dict]:
+        """获取当前挂单（单次最多500条）"""
+        account_id = self.get_account_id()
+        params = {'account-id': str(account_id), 'size': size}
+        if symbol:
+            params['symbol'] = symbol
+        response = self._request('GET', '/v1/order/openOrders', params, auth_required=True)
+        return response.get('data', [])
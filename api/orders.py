@@ -0,0 +1,77 @@
+"""
+批量下单/撤单辅助函数（同步与异步客户端共用）
+"""
+import uuid
+from typing import Dict, Iterator, List, Sequence, Tuple
+
+# 火币单次请求上限
+BATCH_PLACE_LIMIT = 10
+BATCH_CANCEL_LIMIT = 50
+
+# (成功 {client-order-id: order-id}, 失败 {client-order-id: 错误信息})
+BatchPlaceResult = Tuple[Dict[str, str], Dict[str, str]]
+# (成功撤单的 client-order-id 列表, 失败 {client-order-id: 错误信息})
+BatchCancelResult = Tuple[List[str], Dict[str, str]]
+
+
+def chunked(items: Sequence, size: int) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def order_params(account_id: int, order: Dict, symbol_index=None) -> Dict:
+    """把 {symbol, amount, price, order_type, client_order_id} 转为接口参数
+
+    未指定 client_order_id 时自动生成，便于把部分失败映射回具体订单。
+    """
+    symbol = order['symbol']
+    order_type = order.get('order_type', 'buy-limit')
+    amount, price = order['amount'], order.get('price')
+    if symbol_index is not None:
+        amount, price = symbol_index.format_order(symbol, amount, price)
+
+    params = {
+        'account-id': str(account_id),
+        'symbol': symbol,
+        'type': order_type,
+        'amount': str(amount),
+        'client-order-id': order.get('client_order_id') or uuid.uuid4().hex,
+    }
+    if 'limit' in order_type and price is not None:
+        params['price'] = str(price)
+    return params
+
+
+def merge_place_results(chunk: List[Dict], data: List[Dict], placed: Dict[str, str], failed: Dict[str, str]):
+    """解析 batch-orders 返回：按 client-order-id（缺失时按顺序）归入成功/失败"""
+    for i, params in enumerate(chunk):
+        client_order_id = params['client-order-id']
+        item = next((d for d in data if d.get('client-order-id') == client_order_id), None)
+        if item is None and i < len(data) and not data[i].get('client-order-id'):
+            item = data[i]
+        if item is None:
+            failed[client_order_id] = 'no result'
+        elif item.get('order-id'):
+            placed[client_order_id] = str(item['order-id'])
+        else:
+            failed[client_order_id] = f"{item.get('err-code', 'Unknown')} - {item.get('err-msg', 'No message')}"
+
+
+def merge_cancel_results(chunk: Sequence[str], data: Dict, cancelled: List[str], failed: Dict[str, str]):
+    """解析 batchcancel 返回：failed 列表之外的订单视为撤单成功"""
+    errors = {
+        item.get('client-order-id'): f"{item.get('err-code', 'Unknown')} - {item.get('err-msg', 'No message')}"
+        for item in (data or {}).get('failed', [])
+    }
+    for client_order_id in chunk:
+        if client_order_id in errors:
+            failed[client_order_id] = errors[client_order_id]
+        else:
+            cancelled.append(client_order_id)
+
+
+def fail_chunk(chunk: Sequence, error: Exception, failed: Dict[str, str]):
+    """整批请求失败时，批内所有订单记为失败"""
+    for item in chunk:
+        client_order_id = item['client-order-id'] if isinstance(item, dict) else item
+        failed[client_order_id] = str(error)
@@ -0,0 +1,332 @@
+"""
+火币v2私有WebSocket - 订单与资产推送
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+from .auth import HuobiAuth
+
+logger = logging.getLogger(__name__)
+
+ORDER_CHANNEL = 'orders#*'
+ACCOUNT_CHANNEL = 'accounts.update#1'
+
+# 订单终态，收到后从挂单表移除
+FINAL_STATES = {'filled', 'canceled', 'partial-canceled'}
+
+
+class AccountStream:
+    """账户私有数据推送
+
+    鉴权后订阅 orders#* 与 accounts.update#1：连接（或重连）后先拉取一次挂单和余额快照，
+    此后只按推送增量维护内存中的挂单表与余额表；快照期间到达的推送先缓存，快照完成后重放。
+    就绪后余额与挂单查询直接读内存，成交事件分发给已注册的监听者（通知、策略补单）。
+    """
+
+    RECONNECT_DELAY = 1
+    MAX_RECONNECT_DELAY = 60
+
+    def __init__(self, auth: HuobiAuth, ws_url: str = 'wss://api.huobi.pro/ws/v2',
+                 client=None, session: aiohttp.ClientSession = None):
+        self.auth = auth
+        self.ws_url = ws_url
+        self.client = client
+        self._session = session
+        self._own_session = session is None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        # 快照加载与异步监听者任务，保留引用直到完成
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = False
+
+        self._fill_listeners: List[Callable] = []
+        self._order_listeners: List[Callable] = []
+        self._buffer: Optional[List[Dict]] = None
+        self._seed_started = 0
+
+        self.ready = False
+        self.account_id: Optional[int] = None
+        # order_id -> 订单状态（仅未完成订单）
+        self.orders: Dict[str, Dict] = {}
+        self._client_ids: Dict[str, str] = {}
+        # currency -> {'balance': 总额, 'available': 可用}
+        self.balances: Dict[str, Dict[str, float]] = {}
+
+    # ========== 生命周期 ==========
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._running = False
+        self.ready = False
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self):
+        """连接主循环，断线后指数退避重连、重新鉴权并重建快照"""
+        delay = self.RECONNECT_DELAY
+        while self._running:
+            try:
+                async with self._session.ws_connect(self.ws_url, heartbeat=None, autoping=False) as ws:
+                    self._ws = ws
+                    await self._send({'action': 'req', 'ch': 'auth', 'params': self.auth.generate_ws_auth(self.ws_url)})
+                    await self._read_loop(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"账户WebSocket异常: {e}")
+            finally:
+                self._ws = None
+                # 就绪过的连接断开后立即重连，鉴权或快照失败则继续退避
+                if self.ready:
+                    delay = self.RECONNECT_DELAY
+                self.ready = False
+
+            if self._running:
+                logger.info(f"{delay} 秒后重连账户WebSocket")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    async def _send(self, data: Dict):
+        await self._ws.send_str(json.dumps(data))
+
+    async def _read_loop(self, ws: aiohttp.ClientWebSocketResponse):
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                data = json.loads(msg.data)
+            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                break
+            else:
+                continue
+
+            action = data.get('action')
+            if action == 'ping':
+                await self._send({'action': 'pong', 'data': data.get('data', {})})
+            elif action == 'push':
+                if self._buffer is not None:
+                    self._buffer.append(data)
+                else:
+                    self._apply(data)
+            elif action == 'req' and data.get('ch') == 'auth':
+                if data.get('code') != 200:
+                    logger.error(f"账户WebSocket鉴权失败: {data.get('message')}")
+                    break
+                await self._on_authenticated()
+            elif action == 'sub' and data.get('code') != 200:
+                logger.warning(f"订阅失败 {data.get('ch')}: {data.get('message')}")
+
+    async def _on_authenticated(self):
+        """鉴权成功：订阅频道，拉取快照后重放期间缓存的推送"""
+        self._buffer = []
+        for channel in (ORDER_CHANNEL, ACCOUNT_CHANNEL):
+            await self._send({'action': 'sub', 'ch': channel})
+        self._spawn(self._seed())
+
+    async def _seed(self):
+        ws = self._ws
+        self._seed_started = int(time.time() * 1000)
+        try:
+            if self.client is not None:
+                self.account_id = await self.client.get_account_id()
+                balance = await self.client.get_balance(self.account_id, refresh=True)
+                orders = await self.client.get_open_orders(refresh=True)
+                self._load_snapshot(balance, orders)
+        except Exception as e:
+            logger.error(f"账户快照加载失败: {e}")
+            if self._ws is not None:
+                await self._ws.close()
+            return
+        if self._ws is not ws:
+            # 快照期间连接已断开，等待重连后重新加载
+            return
+
+        buffered, self._buffer = self._buffer or [], None
+        for data in buffered:
+            self._apply(data, replay=True)
+        self.ready = True
+        logger.info(f"账户推送已就绪: {len(self.orders)} 个挂单，{len(self.balances)} 个币种")
+
+    def _load_snapshot(self, balance: Dict, orders: List[Dict]):
+        self.balances = {}
+        for item in balance.get('list', []):
+            entry = self.balances.setdefault(item['currency'], {'balance': 0.0, 'available': 0.0})
+            amount = float(item.get('balance', 0))
+            entry['balance'] += amount
+            if item.get('type') == 'trade':
+                entry['available'] += amount
+
+        self.orders = {}
+        self._client_ids = {}
+        for order in orders:
+            self._store_order({
+                'order_id': str(order['id']),
+                'client_order_id': order.get('client-order-id'),
+                'symbol': order['symbol'],
+                'type': order['type'],
+                'price': float(order.get('price', 0)),
+                'amount': float(order.get('amount', 0)),
+                'filled': float(order.get('filled-amount', 0)),
+                'status': order.get('state', 'submitted'),
+            })
+
+    # ========== 推送处理 ==========
+
+    def _apply(self, data: Dict, replay: bool = False):
+        channel = data.get('ch', '')
+        payload = data.get('data') or {}
+        if channel.startswith('orders#'):
+            self._on_order(payload)
+        elif channel.startswith('accounts.update'):
+            # 快照开始前的余额变动已包含在快照中
+            if replay and int(payload.get('changeTime') or 0) < self._seed_started:
+                return
+            self._on_account(payload)
+
+    def _store_order(self, order: Dict):
+        self.orders[order['order_id']] = order
+        if order.get('client_order_id'):
+            self._client_ids[order['client_order_id']] = order['order_id']
+
+    def _drop_order(self, order_id: str):
+        order = self.orders.pop(order_id, None)
+        if order is not None and order.get('client_order_id'):
+            self._client_ids.pop(order['client_order_id'], None)
+
+    def _on_order(self, event: Dict):
+        order_id = str(event.get('orderId'))
+        event_type = event.get('eventType')
+        order = self.orders.get(order_id) or {
+            'order_id': order_id,
+            'client_order_id': event.get('clientOrderId') or None,
+            'symbol': event.get('symbol'),
+            'type': event.get('type'),
+            'price': float(event.get('orderPrice') or 0),
+            'amount': float(event.get('orderSize') or 0),
+            'filled': 0.0,
+            'status': 'submitted',
+        }
+        order['status'] = event.get('orderStatus', order['status'])
+        if event.get('execAmt') is not None:
+            order['filled'] = float(event['execAmt'])
+
+        if order['status'] in FINAL_STATES:
+            self._drop_order(order_id)
+        else:
+            self._store_order(order)
+
+        if event_type == 'trade':
+            fill = {
+                'order_id': order_id,
+                'client_order_id': order.get('client_order_id'),
+                'symbol': order['symbol'],
+                'side': (order.get('type') or '').split('-')[0],
+                'price': float(event.get('tradePrice') or 0),
+                'amount': float(event.get('tradeVolume') or 0),
+                'status': order['status'],
+                'remaining': float(event.get('remainAmt') or 0),
+                'time': event.get('tradeTime'),
+            }
+            for listener in self._fill_listeners:
+                self._invoke(listener, fill)
+        for listener in self._order_listeners:
+            self._invoke(listener, order, event_type)
+
+    def _on_account(self, event: Dict):
+        if self.account_id is not None and event.get('accountId') not in (None, self.account_id):
+            return
+        entry = self.balances.setdefault(event['currency'], {'balance': 0.0, 'available': 0.0})
+        if event.get('balance') is not None:
+            entry['balance'] = float(event['balance'])
+        if event.get('available') is not None:
+            entry['available'] = float(event['available'])
+        self._update_cache(event['currency'], entry)
+
+    def _update_cache(self, currency: str, entry: Dict[str, float]):
+        """同步到客户端的余额快照缓存：推送给出的是变动后的余额，直接覆盖，成交无需再按增量计算"""
+        cache = getattr(self.client, 'balances', None)
+        if cache is None or self.account_id is None:
+            return
+        cache.set_balance(self.account_id, currency, entry['available'], 'trade')
+        cache.set_balance(self.account_id, currency, entry['balance'] - entry['available'], 'frozen')
+
+    def _invoke(self, callback: Callable, *args):
+        try:
+            result = callback(*args)
+            if asyncio.iscoroutine(result):
+                self._spawn(result)
+        except Exception as e:
+            logger.error(f"账户推送回调异常: {e}")
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"账户推送后台任务异常: {task.exception()}")
+
+    def add_fill_listener(self, callback: Callable):
+        """监听成交，回调参数为 fill 字典（order_id / client_order_id / symbol / side / price / amount / status）"""
+        self._fill_listeners.append(callback)
+
+    def add_order_listener(self, callback: Callable):
+        """监听订单状态变化，回调参数为 (order, event_type)"""
+        self._order_listeners.append(callback)
+
+    # ========== 查询 ==========
+
+    def open_orders(self, symbol: str = None) -> List[Dict]:
+        """当前挂单（与 /v1/order/openOrders 返回格式一致）"""
+        return [
+            {
+                'id': order['order_id'],
+                'client-order-id': order.get('client_order_id'),
+                'symbol': order['symbol'],
+                'type': order['type'],
+                'price': str(order['price']),
+                'amount': str(order['amount']),
+                'filled-amount': str(order['filled']),
+                'state': order['status'],
+            }
+            for order in self.orders.values()
+            if symbol is None or order['symbol'] == symbol
+        ]
+
+    def get_order(self, client_order_id: str) -> Optional[Dict]:
+        order_id = self._client_ids.get(client_order_id)
+        return self.orders.get(order_id) if order_id else None
+
+    def balance_data(self) -> Dict:
+        """账户余额（与 /v1/account/accounts/{id}/balance 返回格式一致）"""
+        items = []
+        for currency, entry in self.balances.items():
+            items.append({'currency': currency, 'type': 'trade', 'balance': str(entry['available'])})
+            items.append({'currency': currency, 'type': 'frozen', 'balance': str(entry['balance'] - entry['available'])})
+        return {'id': self.account_id, 'type': 'spot', 'state': 'working', 'list': items}
@@ -0,0 +1,115 @@
+"""
+火币API限流模块 - 按接口类别的令牌桶
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional
+
+# 接口类别
+MARKET = 'market'
+ACCOUNT = 'account'
+TRADE = 'trade'
+
+# 默认配额: 类别 -> (每秒补充令牌数, 桶容量)
+DEFAULT_LIMITS = {
+    MARKET: (50.0, 100),
+    ACCOUNT: (10.0, 20),
+    TRADE: (20.0, 40),
+}
+
+
+class TokenBucket:
+    """令牌桶
+
+    内部只在极短的临界区内持有 threading.Lock，因此可同时被多线程和 asyncio 协程使用；
+    等待令牌时同步接口使用 time.sleep，异步接口使用 asyncio.sleep，不会阻塞事件循环。
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self._last_refill
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+            self._last_refill = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """尝试取令牌，成功返回0，否则返回需要等待的秒数（不扣减令牌）"""
+        if tokens > self.capacity:
+            raise ValueError(f"requested {tokens} tokens exceeds bucket capacity {self.capacity}")
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return 0.0
+            return (tokens - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """阻塞直到取得令牌（线程环境）"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    async def acquire_async(self, tokens: float = 1):
+        """等待直到取得令牌（asyncio环境）"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if not wait:
+                return
+            await asyncio.sleep(wait)
+
+    @property
+    def available(self) -> float:
+        """当前剩余令牌数"""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+
+class RateLimiter:
+    """按接口类别（行情/账户/交易）分桶的限流器
+
+    各类别使用独立的令牌桶，行情查询的突发流量不会推迟下单请求。
+    """
+
+    def __init__(self, limits: Optional[Dict[str, tuple]] = None):
+        merged = dict(DEFAULT_LIMITS)
+        if limits:
+            merged.update(limits)
+        self.buckets: Dict[str, TokenBucket] = {
+            name: TokenBucket(rate, capacity) for name, (rate, capacity) in merged.items()
+        }
+
+    @staticmethod
+    def classify(method: str, path: str) -> str:
+        """根据请求路径判断接口类别"""
+        if path.startswith('/market/') or path.startswith('/v1/common/') or path.startswith('/v2/market-status'):
+            return MARKET
+        if method != 'GET' or '/order/' in path:
+            return TRADE
+        return ACCOUNT
+
+    def bucket(self, method: str, path: str) -> TokenBucket:
+        return self.buckets[self.classify(method, path)]
+
+    def acquire(self, method: str, path: str, tokens: float = 1):
+        """同步获取令牌"""
+        self.bucket(method, path).acquire(tokens)
+
+    async def acquire_async(self, method: str, path: str, tokens: float = 1):
+        """异步获取令牌"""
+        await self.bucket(method, path).acquire_async(tokens)
+
+    def remaining(self) -> Dict[str, float]:
+        """各类别剩余令牌数"""
+        return {name: bucket.available for name, bucket in self.buckets.items()}
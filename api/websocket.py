@@ -0,0 +1,245 @@
+"""
+火币WebSocket行情客户端
+"""
+import asyncio
+import functools
+import gzip
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Set
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+
+class MarketDataHub:
+    """共享行情推送中心
+
+    整个进程只维持一条长连接，所有用户的自选和提醒订阅在此复用（按频道引用计数）。
+    收到的 ticker 写入内存最新价表，处理器通过 get_price / get_ticker 以 O(1) 读取，无需网络请求。
+    """
+
+    RECONNECT_DELAY = 1
+    MAX_RECONNECT_DELAY = 60
+
+    def __init__(self, ws_url: str = 'wss://api.huobi.pro/ws', session: aiohttp.ClientSession = None):
+        self.ws_url = ws_url
+        self._session = session
+        self._own_session = session is None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        # 异步回调任务，保留引用直到完成
+        self._tasks: Set[asyncio.Task] = set()
+        self._running = False
+        self._next_id = 0
+
+        # 频道 -> 引用计数 / 回调
+        self._channels: Dict[str, int] = {}
+        self._callbacks: Dict[str, Set[Callable]] = {}
+        # 所有 ticker 推送的监听者 (symbol, price, tick)
+        self._ticker_listeners: List[Callable] = []
+        # 请求ID -> 等待 rep 响应的 Future
+        self._requests: Dict[str, asyncio.Future] = {}
+
+        # 最新行情表
+        self.tickers: Dict[str, Dict] = {}
+        self.prices: Dict[str, float] = {}
+        self.updated_at: Dict[str, float] = {}
+
+    # ========== 生命周期 ==========
+
+    async def start(self):
+        """启动后台连接任务"""
+        if self._running:
+            return
+        self._running = True
+        if self._session is None:
+            self._session = aiohttp.ClientSession()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止推送并关闭连接"""
+        self._running = False
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._own_session and self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    async def _run(self):
+        """连接主循环，断线后指数退避重连并恢复订阅"""
+        delay = self.RECONNECT_DELAY
+        while self._running:
+            try:
+                async with self._session.ws_connect(self.ws_url, heartbeat=None, autoping=False) as ws:
+                    self._ws = ws
+                    delay = self.RECONNECT_DELAY
+                    logger.info(f"行情WebSocket已连接，恢复 {len(self._channels)} 个订阅")
+                    for channel in list(self._channels):
+                        await self._send_sub(channel)
+                    await self._read_loop(ws)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"行情WebSocket异常: {e}")
+            finally:
+                self._ws = None
+
+            if self._running:
+                logger.info(f"{delay} 秒后重连行情WebSocket")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.MAX_RECONNECT_DELAY)
+
+    async def _read_loop(self, ws: aiohttp.ClientWebSocketResponse):
+        async for msg in ws:
+            if msg.type == aiohttp.WSMsgType.BINARY:
+                data = json.loads(gzip.decompress(msg.data))
+            elif msg.type == aiohttp.WSMsgType.TEXT:
+                data = json.loads(msg.data)
+            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                break
+            else:
+                continue
+
+            if 'ping' in data:
+                await ws.send_str(json.dumps({'pong': data['ping']}))
+            elif 'ch' in data and 'tick' in data:
+                self._dispatch(data['ch'], data['tick'], data.get('ts'))
+            elif 'rep' in data:
+                future = self._requests.pop(str(data.get('id')), None)
+                if future is not None and not future.done():
+                    if data.get('status') == 'error':
+                        future.set_exception(Exception(f"请求失败 {data['rep']}: {data.get('err-msg')}"))
+                    else:
+                        future.set_result(data.get('data'))
+            elif data.get('status') == 'error':
+                logger.warning(f"订阅失败: {data.get('err-msg')}")
+
+    # ========== 订阅管理 ==========
+
+    async def _send_sub(self, channel: str):
+        if self.connected:
+            self._next_id += 1
+            await self._ws.send_str(json.dumps({'sub': channel, 'id': str(self._next_id)}))
+
+    async def _send_unsub(self, channel: str):
+        if self.connected:
+            self._next_id += 1
+            await self._ws.send_str(json.dumps({'unsub': channel, 'id': str(self._next_id)}))
+
+    async def request(self, channel: str, timeout: float = 10) -> Dict:
+        """通过同一连接发送一次性 req 请求（如深度快照），返回响应 data"""
+        if not self.connected:
+            raise Exception("行情WebSocket未连接")
+        self._next_id += 1
+        request_id = str(self._next_id)
+        future = asyncio.get_running_loop().create_future()
+        self._requests[request_id] = future
+        try:
+            await self._ws.send_str(json.dumps({'req': channel, 'id': request_id}))
+            return await asyncio.wait_for(future, timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def subscribe(self, channel: str, callback: Callable = None):
+        """订阅频道（已有相同订阅时只增加引用计数）"""
+        if callback is not None:
+            self._callbacks.setdefault(channel, set()).add(callback)
+        count = self._channels.get(channel, 0)
+        self._channels[channel] = count + 1
+        if count == 0:
+            await self._send_sub(channel)
+
+    async def unsubscribe(self, channel: str, callback: Callable = None):
+        """取消订阅，引用计数归零时才真正退订"""
+        if callback is not None and channel in self._callbacks:
+            self._callbacks[channel].discard(callback)
+        count = self._channels.get(channel, 0)
+        if count <= 1:
+            self._channels.pop(channel, None)
+            self._callbacks.pop(channel, None)
+            if count == 1:
+                await self._send_unsub(channel)
+        else:
+            self._channels[channel] = count - 1
+
+    async def subscribe_ticker(self, symbol: str, callback: Callable = None):
+        """订阅ticker"""
+        await self.subscribe(f'market.{symbol}.ticker', callback)
+
+    async def subscribe_depth(self, symbol: str, depth_type: str = 'step0', callback: Callable = None):
+        """订阅深度"""
+        await self.subscribe(f'market.{symbol}.depth.{depth_type}', callback)
+
+    async def subscribe_kline(self, symbol: str, period: str = '1min', callback: Callable = None):
+        """订阅K线"""
+        await self.subscribe(f'market.{symbol}.kline.{period}', callback)
+
+    def is_subscribed(self, channel: str) -> bool:
+        return channel in self._channels
+
+    def add_ticker_listener(self, callback: Callable):
+        """监听所有已订阅交易对的 ticker 推送，回调参数为 (symbol, price, tick)"""
+        self._ticker_listeners.append(callback)
+
+    # ========== 数据分发 ==========
+
+    def _dispatch(self, channel: str, tick: Dict, ts: int = None):
+        parts = channel.split('.')
+        symbol = parts[1] if len(parts) > 1 else ''
+
+        if len(parts) == 3 and parts[2] == 'ticker':
+            price = float(tick.get('close', tick.get('lastPrice', 0)))
+            self.tickers[symbol] = tick
+            self.prices[symbol] = price
+            self.updated_at[symbol] = time.time()
+            for listener in self._ticker_listeners:
+                self._invoke(listener, channel, symbol, price, tick)
+
+        for callback in tuple(self._callbacks.get(channel, ())):
+            self._invoke(callback, channel, symbol, tick)
+
+    def _invoke(self, callback: Callable, channel: str, *args):
+        try:
+            result = callback(*args)
+            if asyncio.iscoroutine(result):
+                task = asyncio.ensure_future(result)
+                self._tasks.add(task)
+                task.add_done_callback(functools.partial(self._task_done, channel))
+        except Exception as e:
+            logger.error(f"行情回调异常 {channel}: {e}")
+
+    def _task_done(self, channel: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"行情回调异常 {channel}: {task.exception()}")
+
+    # ========== 查询 ==========
+
+    def get_price(self, symbol: str, max_age: float = None) -> Optional[float]:
+        """读取内存中的最新价，超过 max_age 秒未更新视为无效"""
+        if max_age is not None and time.time() - self.updated_at.get(symbol, 0) > max_age:
+            return None
+        return self.prices.get(symbol)
+
+    def get_ticker(self, symbol: str, max_age: float = None) -> Optional[Dict]:
+        """读取内存中的最新ticker"""
+        if max_age is not None and time.time() - self.updated_at.get(symbol, 0) > max_age:
+            return None
+        return self.tickers.get(symbol)
@@ -0,0 +1,101 @@
+"""
+签名性能基准：对比旧版 HuobiAuth 与当前实现
+
+运行: python benchmarks/bench_auth.py [次数]
+"""
+import base64
+import hashlib
+import hmac
+import sys
+import timeit
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from api.auth import HuobiAuth
+
+
+class LegacyHuobiAuth:
+    """旧版签名实现（每次重新创建HMAC、解析URL）"""
+
+    def __init__(self, api_key: str, secret_key: str):
+        self.api_key = api_key
+        self.secret_key = secret_key
+
+    def generate_signature(self, method: str, url: str, params: dict = None, timestamp: str = None) -> dict:
+        timestamp = timestamp or datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%S')
+
+        params_to_sign = {
+            'AccessKeyId': self.api_key,
+            'SignatureMethod': 'HmacSHA256',
+            'SignatureVersion': '2',
+            'Timestamp': timestamp,
+        }
+
+        if params:
+            params_to_sign.update(params)
+
+        sorted_params = sorted(params_to_sign.items())
+        encoded_params = urlencode(sorted_params)
+
+        url_without_protocol = url.replace('https://', '').replace('http://', '')
+        parts = url_without_protocol.split('/')
+        host = parts[0]
+        path = '/' + '/'.join(parts[1:]) if len(parts) > 1 else '/'
+
+        payload = f'{method}\n{host}\n{path}\n{encoded_params}'
+
+        signature = base64.b64encode(
+            hmac.new(
+                self.secret_key.encode('utf-8'),
+                payload.encode('utf-8'),
+                hashlib.sha256
+            ).digest()
+        ).decode('utf-8')
+
+        params_to_sign['Signature'] = signature
+
+        return params_to_sign
+
+
+API_KEY = 'bench-access-key-0000-0000'
+SECRET_KEY = 'bench-secret-key-0000-0000-0000-0000'
+CASES = [
+    ('GET', 'https://api.huobi.pro/v1/account/accounts', None),
+    ('GET', 'https://api.huobi.pro/v1/order/openOrders', {'symbol': 'btcusdt', 'size': 100}),
+    ('POST', 'https://api.huobi.pro/v1/order/orders/place', None),
+]
+
+
+def check_equivalence():
+    """固定时间戳下两种实现的签名必须一致"""
+    legacy = LegacyHuobiAuth(API_KEY, SECRET_KEY)
+    current = HuobiAuth(API_KEY, SECRET_KEY)
+    timestamp = '2024-01-15T08:00:00'
+    for method, url, params in CASES:
+        expected = legacy.generate_signature(method, url, params, timestamp)
+        actual = current.generate_signature(method, url, params, timestamp)
+        assert expected == actual, f"签名不一致: {method} {url}"
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    check_equivalence()
+    print("✅ 签名结果与旧实现一致")
+
+    legacy = LegacyHuobiAuth(API_KEY, SECRET_KEY)
+    current = HuobiAuth(API_KEY, SECRET_KEY)
+
+    print(f"每种情况执行 {number} 次")
+    print(f"{'接口':<36}{'旧实现 µs':>12}{'新实现 µs':>12}{'加速':>8}")
+    for method, url, params in CASES:
+        old = timeit.timeit(lambda: legacy.generate_signature(method, url, params), number=number)
+        new = timeit.timeit(lambda: current.generate_signature(method, url, params), number=number)
+        name = f"{method} {url.split('.pro', 1)[-1]}"
+        print(f"{name:<36}{old / number * 1e6:>12.2f}{new / number * 1e6:>12.2f}{old / new:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+"""
+Webhook 端到端延迟回放
+
+本脚本启动一个本地假 Bot API 服务，把录制的更新 POST 到机器人的 webhook，
+并统计从投递更新到机器人发出第一条回复之间的延迟。
+
+1. 录制: 设置 RECORD_UPDATES_FILE=data/updates.jsonl 正常运行机器人一段时间
+2. 启动本脚本: python benchmarks/replay_updates.py data/updates.jsonl
+3. 另开终端以 webhook 模式启动机器人，并指向假 Bot API:
+   BOT_MODE=webhook WEBHOOK_URL=http://127.0.0.1:8443/telegram \\
+   TELEGRAM_API_BASE_URL=http://127.0.0.1:8081/bot python main.py
+   机器人调用 setWebhook 后开始回放（secret token 自动取自 setWebhook 参数）
+"""
+import argparse
+import asyncio
+import copy
+import json
+import statistics
+import sys
+import time
+from collections import defaultdict, deque
+from typing import Deque, Dict, List
+from urllib.parse import urlsplit
+
+from aiohttp import ClientSession, web
+
+CHAT_BASE = 9_000_000_000
+
+
+class FakeBotApi:
+    """最小化的 Bot API：所有方法返回成功，记录每个会话的发送时间"""
+
+    def __init__(self):
+        self.webhook_set = asyncio.Event()
+        self.secret_token = ''
+        self.sent: Dict[int, List[float]] = defaultdict(list)
+        self._waiting: Dict[int, Deque[float]] = defaultdict(deque)
+        self.latencies: List[float] = []
+        self._message_id = 0
+
+    def expect(self, chat_id: int):
+        self._waiting[chat_id].append(time.perf_counter())
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = dict(await request.post()) if request.can_read_body else {}
+        if not params and request.content_type == 'application/json':
+            params = await request.json()
+
+        if method == 'getMe':
+            result = {'id': 1, 'is_bot': True, 'first_name': 'replay', 'username': 'replay_bot'}
+        elif method == 'setWebhook':
+            self.secret_token = params.get('secret_token', '')
+            self.webhook_set.set()
+            result = True
+        elif method in ('sendMessage', 'sendPhoto', 'editMessageText'):
+            chat_id = int(params.get('chat_id', 0))
+            now = time.perf_counter()
+            self.sent[chat_id].append(now)
+            waiting = self._waiting.get(chat_id)
+            if waiting:
+                self.latencies.append(now - waiting.popleft())
+            self._message_id += 1
+            result = {
+                'message_id': self._message_id,
+                'date': int(time.time()),
+                'chat': {'id': chat_id, 'type': 'private'},
+                'text': params.get('text', ''),
+            }
+        else:
+            result = True
+        return web.json_response({'ok': True, 'result': result})
+
+
+def load_updates(path: str, keep_ids: bool) -> List[Dict]:
+    """读取录制的更新，重新编号；默认每条更新使用独立会话，避免回复互相混淆"""
+    updates = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                updates.append(json.loads(line))
+
+    prepared = []
+    for i, update in enumerate(updates):
+        update = copy.deepcopy(update)
+        update['update_id'] = i + 1
+        if not keep_ids:
+            for key in ('message', 'edited_message', 'callback_query'):
+                item = update.get(key)
+                if not item:
+                    continue
+                if 'from' in item:
+                    item['from']['id'] = CHAT_BASE + i
+                message = item.get('message', item)
+                if 'chat' in message:
+                    message['chat']['id'] = CHAT_BASE + i
+        prepared.append(update)
+    return prepared
+
+
+def chat_of(update: Dict) -> int:
+    for key in ('message', 'edited_message'):
+        if key in update:
+            return update[key]['chat']['id']
+    if 'callback_query' in update:
+        return update['callback_query']['message']['chat']['id']
+    return 0
+
+
+async def replay(args):
+    api = FakeBotApi()
+    app = web.Application()
+    app.router.add_route('*', '/bot{token}/{method}', api.handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', args.api_port).start()
+    print(f"假 Bot API 已启动: http://127.0.0.1:{args.api_port}/bot，等待机器人调用 setWebhook ...")
+
+    try:
+        await asyncio.wait_for(api.webhook_set.wait(), args.wait)
+    except asyncio.TimeoutError:
+        print("❌ 等待 setWebhook 超时")
+        await runner.cleanup()
+        return
+
+    # setWebhook 可能早于 webhook 服务开始监听，等待端口可连接
+    url = urlsplit(args.webhook)
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection(url.hostname, url.port or 443)
+            writer.close()
+            break
+        except OSError:
+            await asyncio.sleep(0.1)
+
+    updates = load_updates(args.updates, args.keep_ids) * args.repeat
+    secret = args.secret or api.secret_token
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rejected = 0
+
+    async def post(session: ClientSession, update: Dict):
+        nonlocal rejected
+        async with semaphore:
+            api.expect(chat_of(update))
+            async with session.post(args.webhook, json=update, headers=headers) as response:
+                if response.status != 200:
+                    rejected += 1
+
+    print(f"回放 {len(updates)} 条更新 → {args.webhook}（并发 {args.concurrency}）")
+    started = time.perf_counter()
+    async with ClientSession() as session:
+        await asyncio.gather(*(post(session, update) for update in updates))
+
+    deadline = time.perf_counter() + args.timeout
+    while len(api.latencies) < len(updates) - rejected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    await runner.cleanup()
+
+    latencies = sorted(x * 1000 for x in api.latencies)
+    print(f"\n已回复 {len(latencies)}/{len(updates)}，被拒绝 {rejected}，总耗时 {elapsed:.2f}s")
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        print(f"吞吐: {len(latencies) / elapsed:.1f} 条/秒")
+        print(f"延迟 ms: p50={quantiles[49]:.1f} p90={quantiles[89]:.1f} "
+              f"p99={quantiles[98]:.1f} max={latencies[-1]:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放录制的 Telegram 更新并统计 webhook 端到端延迟')
+    parser.add_argument('updates', help='录制文件（每行一个更新JSON）')
+    parser.add_argument('--webhook', default='http://127.0.0.1:8443/telegram', help='机器人本地 webhook 地址')
+    parser.add_argument('--secret', default='', help='secret token（默认取自 setWebhook）')
+    parser.add_argument('--api-port', type=int, default=8081, help='假 Bot API 端口')
+    parser.add_argument('--concurrency', type=int, default=20, help='同时投递的更新数')
+    parser.add_argument('--repeat', type=int, default=1, help='重复回放次数')
+    parser.add_argument('--keep-ids', action='store_true', help='保留原始用户/会话ID')
+    parser.add_argument('--wait', type=float, default=120, help='等待 setWebhook 的秒数')
+    parser.add_argument('--timeout', type=float, default=30, help='投递完成后等待回复的秒数')
+    args = parser.parse_args()
+
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    asyncio.run(replay(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,4 @@
+from .handlers import BotHandlers
+from .keyboards import Keyboards
+
+__all__ = ['BotHandlers', 'Keyboards']
@@ -0,0 +1,168 @@
+"""
+入站更新并发处理
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+# 当前协程是否占用着处理器的工作槽
+_holding_worker: contextvars.ContextVar = contextvars.ContextVar('holding_worker', default=None)
+
+
+class UserOrderedUpdateProcessor(BaseUpdateProcessor):
+    """按用户保序的并发更新处理器
+
+    - 不同用户的更新并发处理，同时执行的处理函数不超过 workers 个；
+    - 同一用户（无用户时按会话）的更新严格按到达顺序逐条处理，例如先 watch 后 alert；
+    - 已接收未完成的更新不超过 max_pending 条，达到上限后 BoundedUpdateQueue 暂停取出，
+      队列写满后轮询停止拉取 / webhook 延迟响应，把压力传回 Telegram。
+    """
+
+    def __init__(self, workers: int = 16, max_pending: int = 256):
+        super().__init__(max(workers, max_pending))
+        self.workers = workers
+        self.max_pending = max(workers, max_pending)
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        self._capacity: Optional[asyncio.Event] = None
+        # key -> [锁, 引用计数]，无人排队时删除
+        self._locks: Dict[int, List] = {}
+        self._pending = 0
+
+        self.metrics = {'processed': 0, 'max_pending': 0, 'max_wait': 0.0, 'throttled': 0}
+
+    async def initialize(self):
+        self._worker_slots = asyncio.Semaphore(self.workers)
+        self._capacity = asyncio.Event()
+        self._capacity.set()
+
+    async def shutdown(self):
+        if self._pending:
+            logger.warning(f"更新处理器关闭时仍有 {self._pending} 条更新未完成")
+
+    @staticmethod
+    def _key(update: object) -> Optional[int]:
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    # ========== 背压 ==========
+
+    async def wait_for_capacity(self):
+        if self._pending >= self.max_pending:
+            self.metrics['throttled'] += 1
+            while self._pending >= self.max_pending:
+                self._capacity.clear()
+                await self._capacity.wait()
+
+    def _admit(self):
+        self._pending += 1
+        self.metrics['max_pending'] = max(self.metrics['max_pending'], self._pending)
+
+    def _done(self):
+        self._pending = max(0, self._pending - 1)
+        self._capacity.set()
+
+    # ========== 处理 ==========
+
+    async def do_process_update(self, update: object, coroutine):
+        received = time.monotonic()
+        key = self._key(update)
+        entry = None
+        if key is not None:
+            entry = self._locks.get(key)
+            if entry is None:
+                entry = self._locks[key] = [asyncio.Lock(), 0]
+            entry[1] += 1
+        try:
+            # 先按用户排队再占工作槽，排队中的更新不占用工作协程
+            if entry is not None:
+                await entry[0].acquire()
+            try:
+                async with self._worker_slots:
+                    wait = time.monotonic() - received
+                    self.metrics['max_wait'] = max(self.metrics['max_wait'], wait)
+                    token = _holding_worker.set(self)
+                    try:
+                        await coroutine
+                    finally:
+                        _holding_worker.reset(token)
+            finally:
+                if entry is not None:
+                    entry[0].release()
+        finally:
+            if entry is not None:
+                entry[1] -= 1
+                if not entry[1]:
+                    self._locks.pop(key, None)
+            if isinstance(update, Update):
+                self.metrics['processed'] += 1
+                self._done()
+
+    @asynccontextmanager
+    async def released_worker(self):
+        """暂时让出工作槽（等待处理函数并发名额时使用）"""
+        self._worker_slots.release()
+        try:
+            yield
+        finally:
+            await self._worker_slots.acquire()
+
+    def stats(self) -> Dict:
+        return dict(self.metrics, pending=self._pending, users=len(self._locks), workers=self.workers)
+
+
+class BoundedUpdateQueue(asyncio.Queue):
+    """有界更新队列：处理器已满时暂停取出更新"""
+
+    def __init__(self, processor: UserOrderedUpdateProcessor, maxsize: int = 1000):
+        super().__init__(maxsize)
+        self.processor = processor
+
+    async def get(self):
+        await self.processor.wait_for_capacity()
+        item = await super().get()
+        # 只统计真实更新（不含停止信号等内部对象）
+        if isinstance(item, Update):
+            self.processor._admit()
+        return item
+
+
+def concurrency_limit(limit: int):
+    """限制处理函数的同时执行数
+
+    等待名额期间让出处理器工作槽，避免大量排队的慢命令占满工作协程、拖慢其他命令。
+    """
+    def decorator(func):
+        semaphore: Optional[asyncio.Semaphore] = None
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            nonlocal semaphore
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(limit)
+            processor = _holding_worker.get()
+            if semaphore.locked() and processor is not None:
+                async with processor.released_worker():
+                    await semaphore.acquire()
+            else:
+                await semaphore.acquire()
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                semaphore.release()
+
+        return wrapper
+    return decorator
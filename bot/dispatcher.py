@@ -0,0 +1,250 @@
+"""
+Telegram 出站消息调度
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TimedOut
+
+from api.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# 优先级（数值越小越先发送）
+PRIORITY_TRADE = 0
+PRIORITY_ALERT = 1
+PRIORITY_NOTICE = 2
+PRIORITY_DIGEST = 3
+
+# Telegram 单条消息长度上限
+MAX_MESSAGE_LENGTH = 4096
+
+
+def normalize_chat_id(chat_id) -> Union[int, str]:
+    """数字会话ID统一为 int（同一会话只占一个队列），@频道名等字符串原样保留"""
+    if isinstance(chat_id, str):
+        text = chat_id.strip()
+        return int(text) if text.lstrip('-').isdigit() else text
+    return chat_id
+
+
+class _Message:
+    __slots__ = ('text', 'kwargs', 'coalesce', 'attempts', 'queued_at')
+
+    def __init__(self, text: str, kwargs: Dict, coalesce: bool):
+        self.text = text
+        self.kwargs = kwargs
+        self.coalesce = coalesce
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class MessageDispatcher:
+    """出站消息调度器
+
+    所有主动推送（成交、提醒、通知、摘要）进入按优先级分道的队列，由少量发送协程处理：
+    - 全局令牌桶 + 每个会话独立令牌桶，避免触发 Telegram 的全局/单会话频率限制；
+    - 同一会话同一优先级的多条待发消息合并为一条（不超过4096字符）；
+    - 同一会话同时只有一个发送中的请求，保证消息顺序；
+    - 收到 RetryAfter 时暂停全部发送并将消息放回队首，网络错误按指数退避重试。
+    """
+
+    def __init__(self, bot, global_rate: float = 25, chat_rate: float = 1, chat_burst: int = 3,
+                 workers: int = 4, max_retries: int = 3, idle_bucket_ttl: float = 300):
+        self.bot = bot
+        self.global_bucket = TokenBucket(global_rate, max(1, int(global_rate)))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.workers = workers
+        self.max_retries = max_retries
+        self.idle_bucket_ttl = idle_bucket_ttl
+
+        self._lanes: List[Deque[int]] = [deque() for _ in range(PRIORITY_DIGEST + 1)]
+        self._pending: Dict[Tuple[int, int], Deque[_Message]] = {}
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._chat_used: Dict[int, float] = {}
+        self._in_flight: Set[int] = set()
+        # 网络错误后单个会话的重试时间
+        self._retry_at: Dict[int, float] = {}
+        self._paused_until = 0.0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+
+        self.metrics = {
+            'queued': 0, 'sent': 0, 'merged': 0, 'retries': 0,
+            'dropped': 0, 'flood_waits': 0, 'max_depth': 0, 'max_wait': 0.0,
+        }
+
+    # ========== 生命周期 ==========
+
+    async def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, drain_timeout: float = 10):
+        """停止发送，最多等待 drain_timeout 秒把队列发完"""
+        deadline = time.monotonic() + drain_timeout
+        while self.depth and time.monotonic() < deadline and self._running:
+            await asyncio.sleep(0.1)
+        self._running = False
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self.depth:
+            logger.warning(f"消息调度器停止时仍有 {self.depth} 条消息未发送")
+
+    # ========== 入队 ==========
+
+    def send(self, chat_id, text: str, priority: int = PRIORITY_NOTICE, coalesce: bool = True, **kwargs):
+        """提交一条消息（立即返回）；kwargs 透传给 bot.send_message"""
+        chat_id = normalize_chat_id(chat_id)
+        key = (chat_id, priority)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+            self._lanes[priority].append(chat_id)
+        queue.append(_Message(text, kwargs, coalesce))
+
+        self.metrics['queued'] += 1
+        self.metrics['max_depth'] = max(self.metrics['max_depth'], self.depth)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _requeue(self, chat_id: int, priority: int, messages: List[_Message]):
+        """发送失败的消息放回队首"""
+        key = (chat_id, priority)
+        queue = self._pending.get(key)
+        if queue is None:
+            queue = self._pending[key] = deque()
+            self._lanes[priority].appendleft(chat_id)
+        queue.extendleft(reversed(messages))
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self._pending.values())
+
+    def stats(self) -> Dict:
+        """队列深度与发送统计"""
+        lanes = [0] * len(self._lanes)
+        for (_, priority), queue in self._pending.items():
+            lanes[priority] += len(queue)
+        return dict(self.metrics, depth=sum(lanes), lanes=lanes, chats=len(self._chat_buckets))
+
+    # ========== 调度 ==========
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst)
+        self._chat_used[chat_id] = time.monotonic()
+        return bucket
+
+    def _prune_buckets(self):
+        cutoff = time.monotonic() - self.idle_bucket_ttl
+        for chat_id in [c for c, used in self._chat_used.items() if used < cutoff and c not in self._in_flight]:
+            self._chat_used.pop(chat_id, None)
+            self._chat_buckets.pop(chat_id, None)
+
+    def _next(self) -> Tuple[Optional[Tuple[int, int]], float]:
+        """按优先级选出可以立即发送的会话，返回 ((chat_id, priority) 或 None, 建议等待秒数)"""
+        wait = 1.0
+        now = time.monotonic()
+        for priority, lane in enumerate(self._lanes):
+            for _ in range(len(lane)):
+                chat_id = lane[0]
+                retry_at = self._retry_at.get(chat_id)
+                if retry_at is not None and retry_at > now:
+                    wait = min(wait, retry_at - now)
+                elif chat_id not in self._in_flight:
+                    chat_wait = self._chat_bucket(chat_id).try_acquire()
+                    if not chat_wait:
+                        lane.popleft()
+                        return (chat_id, priority), 0.0
+                    wait = min(wait, chat_wait)
+                lane.rotate(-1)
+        return None, wait
+
+    def _take(self, chat_id: int, priority: int) -> List[_Message]:
+        """取出一批要合并发送的消息，剩余部分重新排队"""
+        key = (chat_id, priority)
+        queue = self._pending[key]
+        batch = [queue.popleft()]
+        length = len(batch[0].text)
+        while queue and batch[0].coalesce and queue[0].coalesce and queue[0].kwargs == batch[0].kwargs:
+            length += len(queue[0].text) + 2
+            if length > MAX_MESSAGE_LENGTH:
+                break
+            batch.append(queue.popleft())
+        if queue:
+            self._lanes[priority].append(chat_id)
+        else:
+            del self._pending[key]
+        return batch
+
+    async def _worker(self):
+        while self._running:
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+                continue
+
+            # 先清除唤醒标志再检查队列，避免丢失检查期间入队的通知
+            self._wakeup.clear()
+            global_wait = 0.0 if self.global_bucket.available >= 1 else 1 / self.global_bucket.rate
+            selected, wait = self._next() if not global_wait else (None, global_wait)
+            if selected is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            chat_id, priority = selected
+            await self.global_bucket.acquire_async()
+            batch = self._take(chat_id, priority)
+            self._in_flight.add(chat_id)
+            try:
+                await self._deliver(chat_id, priority, batch)
+            finally:
+                self._in_flight.discard(chat_id)
+                if len(self._chat_buckets) > 10000:
+                    self._prune_buckets()
+
+    async def _deliver(self, chat_id: int, priority: int, batch: List[_Message]):
+        text = '\n\n'.join(message.text for message in batch)
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, **batch[0].kwargs)
+            self._retry_at.pop(chat_id, None)
+            self.metrics['sent'] += 1
+            self.metrics['merged'] += len(batch) - 1
+            self.metrics['max_wait'] = max(self.metrics['max_wait'], time.monotonic() - batch[0].queued_at)
+        except RetryAfter as e:
+            retry_after = float(e.retry_after)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self.metrics['flood_waits'] += 1
+            logger.warning(f"触发Telegram限流，暂停发送 {retry_after:.1f} 秒")
+            self._requeue(chat_id, priority, batch)
+        except (Forbidden, BadRequest) as e:
+            self.metrics['dropped'] += len(batch)
+            logger.error(f"消息发送失败 {chat_id}: {e}")
+        except (TimedOut, NetworkError) as e:
+            batch[0].attempts += 1
+            if batch[0].attempts > self.max_retries:
+                self._retry_at.pop(chat_id, None)
+                self.metrics['dropped'] += len(batch)
+                logger.error(f"消息发送多次失败 {chat_id}: {e}")
+                return
+            self.metrics['retries'] += 1
+            self._retry_at[chat_id] = time.monotonic() + min(2 ** batch[0].attempts, 30)
+            self._requeue(chat_id, priority, batch)
+        except Exception as e:
+            self.metrics['dropped'] += len(batch)
+            logger.error(f"消息发送异常 {chat_id}: {e}")
@@ -0,0 +1,924 @@
+"""
+Telegram消息处理器
+"""
+import asyncio
+import functools
+import json
+import logging
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+from telegram import Update
+from telegram.ext import Application, ContextTypes
+
+from config import Config
+from api.async_client import AsyncHuobiClient
+from api.cache import TickerCache
+from api.private_websocket import AccountStream
+from api.rate_limit import RateLimiter
+from api.websocket import MarketDataHub
+from services.account import value_holdings
+from services.charts import ChartService, render_assets, render_grid, render_kline
+from services.executor import TaskExecutor
+from services.klines import KlineStore, PERIOD_SECONDS
+from services.market import MarketSnapshot
+from services.monitoring import AlertEngine, MoveDetector
+from services.orderbook import OrderBookManager
+from services.statistics import BalanceHistory
+from services.storage import UserStore, sqlite_path
+from services.symbols import SymbolIndex
+from strategies import indicators
+from strategies.grid_trading import BUY, RANGE_BARS, RANGE_PERIOD, SELL, GridManager, GridStrategy
+from .dispatcher import MessageDispatcher, PRIORITY_ALERT, PRIORITY_DIGEST, PRIORITY_TRADE
+from .keyboards import Keyboards
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path('data')
+DEFAULT_SYMBOLS = ['btcusdt', 'ethusdt']
+
+GRID_USAGE = (
+    "📌 使用方法:\n"
+    f"/grid <币种> <投资金额> [网格数] - 按最近{RANGE_BARS}根4小时K线高低点创建网格\n"
+    "/grid list - 查看运行中的网格\n"
+    "/grid stop <网格ID> - 停止网格并撤销挂单\n"
+    "示例: /grid btc 200 10"
+)
+
+
+class BotHandlers:
+    """消息处理器"""
+
+    def __init__(self):
+        self.config = Config()
+        self.app = None
+        self.dispatcher = None
+        self.executor = TaskExecutor(
+            io_workers=self.config.EXECUTOR_IO_WORKERS,
+            cpu_workers=self.config.EXECUTOR_CPU_WORKERS,
+            max_queue=self.config.EXECUTOR_MAX_QUEUE,
+            timeout=self.config.EXECUTOR_TIMEOUT
+        )
+        self.client = AsyncHuobiClient(
+            self.config.HUOBI_API_KEY,
+            self.config.HUOBI_SECRET_KEY,
+            self.config.HUOBI_BASE_URL,
+            pool_size=self.config.HTTP_POOL_SIZE,
+            pool_per_host=self.config.HTTP_POOL_PER_HOST,
+            keepalive=self.config.HTTP_KEEPALIVE,
+            timeout=self.config.HTTP_TIMEOUT,
+            rate_limiter=RateLimiter(self.config.rate_limits()),
+            balance_ttl=self.config.BALANCE_CACHE_TTL
+        )
+        self.market_hub = MarketDataHub(self.config.HUOBI_WS_URL)
+        self.order_books = OrderBookManager(self.market_hub, levels=self.config.ORDER_BOOK_LEVELS)
+        self.account_stream = None
+        if self.config.HUOBI_API_KEY and self.config.HUOBI_SECRET_KEY:
+            self.account_stream = AccountStream(self.client.auth, self.config.HUOBI_WS_PRIVATE_URL, client=self.client)
+            self.client.account_stream = self.account_stream
+        self.ticker_cache = TickerCache(
+            self.client.get_ticker,
+            ttl=self.config.TICKER_CACHE_TTL,
+            maxsize=self.config.TICKER_CACHE_SIZE
+        )
+        self.market_snapshot = MarketSnapshot(self.client, max_age=self.config.MARKET_SNAPSHOT_MAX_AGE)
+        self.symbol_index = SymbolIndex(
+            str(DATA_DIR / 'symbols.json'),
+            max_age=self.config.SYMBOL_REFRESH_INTERVAL,
+            executor=self.executor
+        )
+        self.client.symbol_index = self.symbol_index
+        self.charts = ChartService(self.executor, max_bytes=self.config.CHART_CACHE_MB * 1024 * 1024)
+        # 后台任务（提醒推送等），保留引用直到完成
+        self._tasks = set()
+
+        # 用户数据
+        self.store = UserStore(sqlite_path(self.config.DATABASE_URL))
+        self.balance_history = BalanceHistory(str(DATA_DIR / 'balance_history'))
+        self._kline_channels = set()
+        self.kline_store = KlineStore(
+            str(DATA_DIR / 'klines.db'), executor=self.executor, max_age=self.config.KLINE_MAX_AGE
+        )
+        self.migrate_legacy_data()
+        self.user_watchlist: Dict[str, List[str]] = self.store.load_watchlists()
+        self.alert_engine = AlertEngine()
+        self.alert_engine.load(self.store.load_alerts())
+        move_thresholds = self.config.move_thresholds()
+        self.move_detector = MoveDetector(
+            horizons=sorted(move_thresholds),
+            bucket=self.config.MOVE_BUCKET_SECONDS,
+            sigma=self.config.MOVE_SIGMA,
+            pct_thresholds=move_thresholds,
+            min_pct=self.config.MOVE_MIN_PCT,
+            halflife=self.config.MOVE_VOL_HALFLIFE
+        )
+        # grid_id -> 创建者
+        self.grid_owners: Dict[str, str] = {}
+        self.grid_manager = GridManager(
+            self.client, sync_interval=self.config.GRID_SYNC_INTERVAL, on_change=self.save_grid
+        )
+        if self.account_stream is not None:
+            # 成交通知先于网格处理：网格在成交完成后才释放订单归属
+            self.account_stream.add_fill_listener(self.on_fill)
+            self.account_stream.add_fill_listener(self.grid_manager.on_fill)
+
+    @property
+    def price_alerts(self) -> Dict[str, List[Dict]]:
+        """未触发的提醒 {user_id: [alert, ...]}"""
+        return self.alert_engine.to_dict()
+
+    def setup(self, app: Application):
+        """初始化定时任务"""
+        self.app = app
+        self.dispatcher = MessageDispatcher(
+            app.bot,
+            global_rate=self.config.TELEGRAM_GLOBAL_RATE,
+            chat_rate=self.config.TELEGRAM_CHAT_RATE
+        )
+        job_queue = app.job_queue
+        if job_queue is None:
+            logger.warning("JobQueue 不可用，定时任务未启动（请安装 python-telegram-bot[job-queue]）")
+            return
+
+        job_queue.run_repeating(self.check_price_alerts, interval=60, first=10, name='price_alerts')
+        job_queue.run_repeating(self.record_balance_history, interval=3600, first=60, name='balance_history')
+        job_queue.run_repeating(
+            self.refresh_symbols,
+            interval=self.config.SYMBOL_REFRESH_INTERVAL,
+            first=self.config.SYMBOL_REFRESH_INTERVAL,
+            name='symbol_index'
+        )
+        if self.config.MOVE_SCAN_INTERVAL > 0:
+            job_queue.run_repeating(
+                self.scan_market_moves,
+                interval=self.config.MOVE_SCAN_INTERVAL,
+                first=self.config.MOVE_SCAN_INTERVAL,
+                name='market_moves'
+            )
+        if self.config.DIGEST_INTERVAL > 0:
+            job_queue.run_repeating(
+                self.send_watchlist_digest,
+                interval=self.config.DIGEST_INTERVAL,
+                first=self.config.DIGEST_INTERVAL,
+                name='watchlist_digest'
+            )
+
+    async def start_services(self):
+        """加载交易对索引，启动行情推送并订阅所有自选/提醒币种"""
+        if self.dispatcher is not None:
+            await self.dispatcher.start()
+        try:
+            await self.symbol_index.ensure_loaded(self.client)
+        except Exception as e:
+            logger.error(f"加载交易对信息失败: {e}")
+        if self.symbol_index.stale and len(self.symbol_index):
+            self.spawn(self.refresh_symbols(), '刷新交易对信息')
+
+        self.market_hub.add_ticker_listener(self.on_ticker)
+        await self.market_hub.start()
+        for symbol in self.tracked_symbols():
+            await self.track_symbol(symbol)
+        if self.account_stream is not None:
+            await self.account_stream.start()
+        await self.restore_grids()
+
+    async def refresh_symbols(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """后台刷新交易对信息"""
+        try:
+            await self.symbol_index.refresh(self.client)
+        except Exception as e:
+            logger.error(f"刷新交易对信息失败: {e}")
+
+    async def close(self):
+        """释放网络资源并提交未落盘的数据"""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.dispatcher is not None:
+            await self.dispatcher.stop()
+        await self.market_hub.stop()
+        if self.account_stream is not None:
+            await self.account_stream.stop()
+        await self.client.close()
+        # 等待执行器中的写入完成后再关闭数据库
+        self.executor.shutdown()
+        self.store.close()
+        self.balance_history.flush()
+        self.kline_store.close()
+
+    def spawn(self, coro, name: str) -> asyncio.Task:
+        """启动后台任务：保留引用直到完成，异常记录日志"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(self._task_done, name))
+        return task
+
+    def _task_done(self, name: str, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"后台任务失败 {name}: {task.exception()}")
+
+    def tracked_symbols(self) -> set:
+        """所有用户自选与提醒涉及的交易对"""
+        symbols = set(DEFAULT_SYMBOLS)
+        for watchlist in self.user_watchlist.values():
+            symbols.update(watchlist)
+        symbols.update(self.alert_engine.symbols())
+        symbols.update(self.grid_manager.symbols())
+        return symbols
+
+    async def track_symbol(self, symbol: str):
+        """确保交易对已在共享行情连接中订阅"""
+        if not self.market_hub.is_subscribed(f'market.{symbol}.ticker'):
+            await self.market_hub.subscribe_ticker(symbol)
+
+    async def track_klines(self, symbol: str, period: str):
+        """订阅K线推送并合并进本地K线库"""
+        channel = f'market.{symbol}.kline.{period}'
+        if channel in self._kline_channels or self.market_hub.is_subscribed(channel):
+            return
+        # 先登记再订阅，并发调用只订阅一次
+        self._kline_channels.add(channel)
+        try:
+            await self.market_hub.subscribe_kline(
+                symbol, period, lambda sym, tick: self.kline_store.on_kline(sym, period, tick)
+            )
+        except Exception:
+            self._kline_channels.discard(channel)
+            raise
+
+    async def get_candles(self, symbol: str, period: str, size: int = 200, max_age: float = None,
+                          tracked: set = None):
+        """读取K线窗口（NumPy结构化数组），只补齐本地缺失部分
+
+        自选/提醒涉及的交易对首次使用时订阅K线推送，此后最后一根K线由推送保持最新；
+        其他交易对在本地数据超过 KLINE_MAX_AGE 秒未刷新时重新请求最近的K线。
+        批量调用时由调用方传入 tracked（tracked_symbols() 的结果），避免每个交易对重算一次。
+        """
+        if tracked is None:
+            tracked = self.tracked_symbols()
+        if symbol in tracked:
+            try:
+                await self.track_klines(symbol, period)
+            except Exception as e:
+                logger.warning(f"订阅K线推送失败 {symbol} {period}: {e}")
+        return await self.kline_store.get(self.client, symbol, period, size, max_age=max_age)
+
+    async def analyze_symbols(self, symbols: List[str], period: str = '60min', size: int = 100,
+                              fast: int = 5, slow: int = 20) -> Dict[str, Dict]:
+        """批量计算均线交叉、ATR与区间高低点，整个列表一次向量化完成"""
+        tracked = self.tracked_symbols()
+        results = await asyncio.gather(
+            *(self.get_candles(symbol, period, size, tracked=tracked) for symbol in symbols), return_exceptions=True
+        )
+        candles = {}
+        for symbol, result in zip(symbols, results):
+            if isinstance(result, Exception):
+                logger.error(f"获取K线失败 {symbol}: {result}")
+            else:
+                candles[symbol] = result
+        if not candles:
+            return {}
+
+        names, closes = indicators.stack_candles(candles, 'close', size)
+        _, highs = indicators.stack_candles(candles, 'high', size)
+        _, lows = indicators.stack_candles(candles, 'low', size)
+
+        summary = await self.executor.run_cpu(indicators.summarize, highs, lows, closes, fast, slow)
+        return {
+            symbol: {
+                'signal': int(summary['signal'][i]),
+                'close': float(summary['close'][i]),
+                'atr': float(summary['atr'][i]),
+                'range_high': float(summary['range_high'][i]),
+                'range_low': float(summary['range_low'][i]),
+            }
+            for i, symbol in enumerate(names)
+        }
+
+    async def get_ticker(self, symbol: str) -> Dict:
+        """优先读取推送的最新行情，没有时回退到REST"""
+        ticker = self.market_hub.get_ticker(symbol, max_age=self.config.WS_TICKER_MAX_AGE)
+        if ticker:
+            return ticker
+        return await self.ticker_cache.get(symbol)
+
+    # ========== 数据持久化 ==========
+
+    def load_user_data(self, name: str, default: Any) -> Any:
+        """读取旧版 data/<name>.json 数据（仅用于迁移）"""
+        file_path = DATA_DIR / f'{name}.json'
+        if not file_path.exists():
+            return default
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"加载用户数据失败 {name}: {e}")
+            return default
+
+    def migrate_legacy_data(self):
+        """数据库为空时导入旧版JSON文件；资产历史为空时导入旧版 balance_history 表（导入后删除该表）"""
+        has_history = bool(self.balance_history.users())
+        legacy = self.store.load_legacy_balance_history()
+        if legacy:
+            if not has_history:
+                for user_id, snapshots in legacy.items():
+                    for snapshot in snapshots:
+                        self.balance_history.append(
+                            user_id, datetime.fromisoformat(snapshot['time']).timestamp(), snapshot['total']
+                        )
+                self.balance_history.flush()
+                has_history = True
+                logger.info(f"旧版资产历史已导入: {len(legacy)} 个用户")
+            self.store.drop_legacy_balance_history()
+
+        if not self.store.is_empty():
+            return
+
+        watchlist = self.load_user_data('watchlist', {})
+        alerts = self.load_user_data('alerts', {})
+        history = {} if has_history else self.load_user_data('balance_history', {})
+        if not (watchlist or alerts or history):
+            return
+
+        for user_id, symbols in watchlist.items():
+            for symbol in symbols:
+                self.store.add_watch(user_id, symbol)
+        for user_id, user_alerts in alerts.items():
+            for alert in user_alerts:
+                alert.setdefault('id', uuid.uuid4().hex)
+                self.store.upsert_alert(user_id, alert)
+        for user_id, snapshots in history.items():
+            for snapshot in snapshots:
+                self.balance_history.append(
+                    user_id, datetime.fromisoformat(snapshot['time']).timestamp(), snapshot['total']
+                )
+        self.store.flush()
+        logger.info("旧版JSON用户数据已导入数据库")
+
+    # ========== 基础命令 ==========
+
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理 /start 命令"""
+        welcome_text = (
+            "🤖 欢迎使用火币交易机器人\n\n"
+            "主要功能：\n"
+            "• 💹 实时行情监控\n"
+            "• 💰 账户余额查询\n"
+            "• 🎯 网格交易策略\n"
+            "• 💱 现货交易下单\n\n"
+            "/help - 查看帮助"
+        )
+
+        await update.message.reply_text(welcome_text, reply_markup=Keyboards.main_menu())
+
+    async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理 /help 命令"""
+        help_text = (
+            "使用帮助：\n"
+            "/start - 启动机器人\n"
+            "/help - 显示帮助\n"
+            "/balance - 查询总资产\n"
+            "/price <币种> - 查询价格\n"
+            "/watch <币种> - 添加自选\n"
+            "/alert <币种> <价格> - 设置价格提醒\n"
+            "/chart <币种> [周期] - K线图\n"
+            "/chart assets - 资产分布图\n"
+            "/chart grid <币种> - 网格图\n"
+            "/grid <币种> <投资金额> [网格数] - 创建网格\n"
+            "/grid list | /grid stop <网格ID> - 查看/停止网格"
+        )
+        await update.message.reply_text(help_text)
+
+    async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理文本消息"""
+        text = update.message.text
+
+        if text == '💹 市场行情':
+            await self.handle_market_info(update, context)
+        elif text == '💰 账户余额':
+            await self.handle_balance(update, context)
+        elif text == '🎯 网格交易':
+            await self.handle_grid_command(update, str(update.effective_user.id), [])
+        else:
+            await update.message.reply_text("请使用命令或按钮选择功能")
+
+    async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理回调查询"""
+        query = update.callback_query
+        await query.answer()
+        await query.message.reply_text("功能开发中...")
+
+    # ========== 行情 ==========
+
+    async def handle_market_info(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理市场行情查询"""
+        user_id = str(update.effective_user.id)
+        symbols = self.user_watchlist.get(user_id) or DEFAULT_SYMBOLS
+
+        lines = ["💹 市场行情\n"]
+        for symbol in symbols:
+            try:
+                ticker = await self.get_ticker(symbol)
+                lines.append(self.format_ticker(symbol, ticker))
+            except Exception as e:
+                logger.error(f"获取行情失败 {symbol}: {e}")
+                lines.append(f"{symbol.upper()}: 获取失败")
+
+        await update.message.reply_text("\n".join(lines))
+
+    async def handle_price_command(self, update: Update, coin: str):
+        """处理 /price <币种>"""
+        symbol = self.coin_to_symbol(coin)
+        try:
+            ticker = await self.get_ticker(symbol)
+            if not ticker:
+                await update.message.reply_text(f"❌ 未找到交易对 {symbol.upper()}")
+                return
+            await update.message.reply_text(self.format_ticker(symbol, ticker))
+        except Exception as e:
+            logger.error(f"获取价格失败 {symbol}: {e}")
+            await update.message.reply_text("❌ 获取价格失败，请稍后重试")
+
+    def coin_to_symbol(self, coin: str) -> str:
+        """币种名转交易对，默认计价币为USDT"""
+        coin = coin.lower()
+        symbol = self.symbol_index.resolve(coin)
+        if symbol:
+            return symbol
+        return coin if coin.endswith('usdt') else f'{coin}usdt'
+
+    @staticmethod
+    def format_ticker(symbol: str, ticker: Dict) -> str:
+        """格式化行情信息"""
+        close = float(ticker.get('close', 0))
+        open_price = float(ticker.get('open', 0))
+        change = (close - open_price) / open_price * 100 if open_price else 0
+        arrow = '📈' if change >= 0 else '📉'
+        return (
+            f"{arrow} {symbol.upper()}: ${close:,.4f} "
+            f"({change:+.2f}%) 24h量: {float(ticker.get('vol', 0)):,.0f}"
+        )
+
+    # ========== 自选摘要 ==========
+
+    async def send_watchlist_digest(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """定时推送自选摘要
+
+        先对所有用户的自选取并集，每轮只读一次全市场行情快照、做一次批量指标计算，
+        每个交易对的摘要行只生成一次，用户摘要只是拼接；成本随不同交易对数增长，与用户数无关。
+        """
+        watchlists = {user_id: symbols for user_id, symbols in self.user_watchlist.items() if symbols}
+        if not watchlists:
+            return
+        symbols = sorted(set().union(*watchlists.values()))
+
+        try:
+            snapshot = await self.market_snapshot.refresh()
+        except Exception as e:
+            logger.error(f"自选摘要获取行情失败: {e}")
+            return
+        try:
+            analysis = await self.analyze_symbols(symbols)
+        except Exception as e:
+            logger.error(f"自选摘要指标计算失败: {e}")
+            analysis = {}
+
+        lines = self.digest_lines(symbols, snapshot, analysis)
+        header = f"📋 自选摘要 {datetime.now().strftime('%m-%d %H:%M')}\n\n"
+        users = list(watchlists)
+        batch = self.config.DIGEST_BATCH_SIZE
+        for start in range(0, len(users), batch):
+            if start:
+                # 分批入队，避免一次性占满发送队列
+                await asyncio.sleep(self.config.DIGEST_BATCH_DELAY)
+            for user_id in users[start:start + batch]:
+                text = header + '\n'.join(lines[symbol] for symbol in watchlists[user_id])
+                self.dispatcher.send(user_id, text, priority=PRIORITY_DIGEST)
+        logger.info(f"自选摘要已排队: {len(users)} 个用户, {len(symbols)} 个交易对")
+
+    @staticmethod
+    def digest_lines(symbols: List[str], snapshot, analysis: Dict[str, Dict]) -> Dict[str, str]:
+        """每个交易对的摘要行（价格与24h涨跌幅向量化计算）"""
+        closes = snapshot.lookup(symbols)
+        opens = snapshot.lookup(symbols, 'open')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            changes = np.where(opens > 0, (closes - opens) / opens * 100, 0.0)
+
+        signal_text = {1: ' 🟢金叉', -1: ' 🔴死叉'}
+        lines = {}
+        for symbol, close, change in zip(symbols, closes.tolist(), changes.tolist()):
+            if close != close:  # NaN: 快照中没有该交易对
+                lines[symbol] = f"❔ {symbol.upper()}: 暂无行情"
+                continue
+            arrow = '📈' if change >= 0 else '📉'
+            signal = signal_text.get(analysis.get(symbol, {}).get('signal'), '')
+            lines[symbol] = f"{arrow} {symbol.upper()}: ${close:,.4f} ({change:+.2f}%){signal}"
+        return lines
+
+    # ========== 账户 ==========
+
+    async def handle_balance(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """处理余额查询"""
+        try:
+            balance = await self.client.get_balance()
+            holdings = self.aggregate_balance(balance)
+            text = "💰 账户余额\n\n"
+
+            for currency, amount in sorted(holdings.items(), key=lambda x: -x[1])[:20]:
+                text += f"{currency.upper()}: {amount:.8f}\n"
+
+            await update.message.reply_text(text)
+        except Exception as e:
+            logger.error(f"获取余额失败: {e}")
+            await update.message.reply_text("❌ 获取余额失败")
+
+    @staticmethod
+    def aggregate_balance(balance: Dict) -> Dict[str, float]:
+        """合并可用与冻结余额，返回非零币种"""
+        holdings: Dict[str, float] = {}
+        for item in balance.get('list', []):
+            amount = float(item.get('balance', 0))
+            if amount > 0:
+                holdings[item['currency']] = holdings.get(item['currency'], 0) + amount
+        return holdings
+
+    async def calculate_total_balance(self) -> float:
+        """计算账户总资产（USDT计价），全部币种共用一次全市场行情快照"""
+        balance = await self.client.get_balance()
+        snapshot = await self.market_snapshot.refresh()
+        total, _ = value_holdings(self.aggregate_balance(balance), snapshot)
+        return total
+
+    def record_balance(self, user_id: str, total: float):
+        """记录一条资产快照"""
+        self.balance_history.append(user_id, time.time(), total)
+
+    def balance_trend_text(self, user_id: str, seconds: float = 86400) -> str:
+        """资产变化摘要"""
+        trend = self.balance_history.trend(user_id, seconds, time.time())
+        if trend is None:
+            return ''
+        return f"24h 变化: {trend['change']:+,.2f} ({trend['change_pct']:+.2f}%)"
+
+    async def record_balance_history(self, context: ContextTypes.DEFAULT_TYPE):
+        """定时记录资产快照"""
+        user_ids = set(self.balance_history.users()) | {u for u in self.config.ALLOWED_USERS if u}
+        if not user_ids:
+            return
+
+        try:
+            total = await self.calculate_total_balance()
+        except Exception as e:
+            logger.error(f"记录资产快照失败: {e}")
+            return
+
+        for user_id in user_ids:
+            self.record_balance(user_id, total)
+
+    # ========== 网格交易 ==========
+
+    async def handle_grid_command(self, update: Update, user_id: str, args: List[str]):
+        """处理 /grid <币种> <投资金额> [网格数] | /grid list | /grid stop <网格ID>"""
+        action = args[0].lower() if args else 'list'
+        if action == 'list':
+            grids = [grid for grid in self.grid_manager.grids.values() if self.grid_owners.get(grid.grid_id) == user_id]
+            lines = ["🎯 运行中的网格\n"] + [self.format_grid(grid) for grid in grids] if grids else ["暂无运行中的网格"]
+            await update.message.reply_text('\n'.join(lines) + '\n\n' + GRID_USAGE)
+            return
+
+        # 所有网格共用一个交易所账户：只有 ALLOWED_USERS 中的用户可以下单，未配置时禁止交易
+        if user_id not in [u for u in self.config.ALLOWED_USERS if u]:
+            await update.message.reply_text("❌ 没有交易权限（需在 ALLOWED_USERS 中配置）")
+            return
+        if self.account_stream is None:
+            await update.message.reply_text("❌ 未配置API密钥，无法运行网格")
+            return
+
+        try:
+            if action == 'stop':
+                if len(args) < 2 or self.grid_owners.get(args[1]) != user_id:
+                    raise ValueError("未找到该网格，使用 /grid list 查看网格ID")
+                cancelled, remaining = await self.grid_manager.stop(args[1])
+                if remaining:
+                    await update.message.reply_text(
+                        f"⚠️ 网格 {args[1]} 已撤销挂单 {cancelled} 个，仍有 {remaining} 个撤单失败，"
+                        f"请稍后再次 /grid stop {args[1]}"
+                    )
+                    return
+                self.grid_owners.pop(args[1], None)
+                await update.message.reply_text(f"⏹ 网格 {args[1]} 已停止，撤销挂单 {cancelled} 个")
+                return
+
+            if len(args) < 2:
+                raise ValueError(GRID_USAGE)
+            symbol = self.coin_to_symbol(args[0])
+            investment = float(args[1])
+            levels = int(args[2]) if len(args) > 2 else None
+            grid, placed = await self.create_grid(user_id, symbol, investment, levels)
+            await update.message.reply_text(
+                f"✅ 网格已启动\n{self.format_grid(grid)}\n已挂单 {placed} 个"
+            )
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+        except Exception as e:
+            logger.error(f"网格操作失败 {' '.join(args)}: {e}")
+            await update.message.reply_text("❌ 网格操作失败，请稍后重试")
+
+    @staticmethod
+    def format_grid(grid: GridStrategy) -> str:
+        text = (
+            f"{grid.grid_id} {grid.symbol.upper()} {grid.levels[0]:.6g} - {grid.levels[-1]:.6g} "
+            f"{len(grid.levels) - 1}格，已成交 {grid.fills} 次，收益 ${grid.profit:,.2f}"
+        )
+        if grid.stopped:
+            text += f"（停止中，剩余挂单 {len(grid.open)} 个）"
+        return text
+
+    async def create_grid(self, user_id: str, symbol: str, investment: float,
+                          levels: int = None) -> Tuple[GridStrategy, int]:
+        """按最近 RANGE_BARS 根4小时K线的高低点计算网格区间并挂出初始订单，返回 (网格, 下单数)"""
+        levels = levels or self.config.GRID_LEVELS
+        order_value = investment / levels
+        if order_value < self.config.GRID_MIN_AMOUNT:
+            raise ValueError(f"单格金额 {order_value:.2f} 低于最小值 {self.config.GRID_MIN_AMOUNT}")
+
+        candles = await self.get_candles(symbol, RANGE_PERIOD, RANGE_BARS)
+        if not len(candles):
+            raise ValueError(f"无法获取 {symbol.upper()} 的K线数据")
+        range_high, range_low = indicators.price_range(candles['high'], candles['low'], RANGE_BARS)
+
+        grid = GridStrategy(
+            f'g{user_id[-6:]}{uuid.uuid4().hex[:6]}', symbol,
+            float(range_low[0]), float(range_high[0]), levels, order_value,
+            profit_rate=self.config.GRID_PROFIT_RATE, symbol_index=self.symbol_index
+        )
+        # 先登记创建者，挂单后的状态回调据此持久化
+        self.grid_owners[grid.grid_id] = user_id
+        placed, _ = await self.grid_manager.start(grid, await self.reference_price(symbol))
+        await self.track_symbol(symbol)
+        return grid, placed
+
+    def save_grid(self, grid: GridStrategy):
+        """网格状态变化回调：运行中的网格写入数据库，已停止的删除"""
+        if grid.grid_id in self.grid_manager.grids:
+            self.store.upsert_grid(self.grid_owners.get(grid.grid_id, ''), grid.grid_id, grid.symbol, grid.to_dict())
+        else:
+            self.store.delete_grid(grid.grid_id)
+
+    async def restore_grids(self):
+        """启动时恢复运行中的网格，并与交易所挂单对账"""
+        restored = 0
+        for user_id, state in self.store.load_grids():
+            try:
+                grid = GridStrategy.from_dict(state, symbol_index=self.symbol_index)
+            except Exception as e:
+                logger.error(f"恢复网格失败 {state.get('grid_id')}: {e}")
+                continue
+            self.grid_owners[grid.grid_id] = user_id
+            self.grid_manager.add(grid)
+            await self.track_symbol(grid.symbol)
+            await self.grid_manager.reconcile(grid)
+            restored += 1
+        if restored:
+            logger.info(f"已恢复 {restored} 个网格")
+
+    async def reference_price(self, symbol: str) -> float:
+        """下单参考价：本地深度簿已同步时取买卖中间价，否则取最新成交价"""
+        book = self.order_books.get(symbol)
+        if book is not None and book.mid is not None:
+            return book.mid
+        await self.order_books.subscribe(symbol)
+        ticker = await self.get_ticker(symbol)
+        return float(ticker.get('close', 0))
+
+    # ========== 自选与提醒 ==========
+
+    async def handle_watch_command(self, update: Update, user_id: str, coin: str):
+        """处理 /watch <币种>"""
+        symbol = self.coin_to_symbol(coin)
+        watchlist = self.user_watchlist.setdefault(user_id, [])
+
+        if symbol in watchlist:
+            await update.message.reply_text(f"ℹ️ {symbol.upper()} 已在自选列表中")
+            return
+
+        watchlist.append(symbol)
+        self.store.add_watch(user_id, symbol, datetime.now().isoformat(timespec='seconds'))
+        await self.track_symbol(symbol)
+        await update.message.reply_text(
+            f"✅ 已添加 {symbol.upper()} 到自选\n当前自选: {', '.join(s.upper() for s in watchlist)}"
+        )
+
+    async def handle_alert_command(self, update: Update, user_id: str, text: str):
+        """处理 /alert <币种> <价格>"""
+        parts = text.split()
+        try:
+            symbol = self.coin_to_symbol(parts[1])
+            target = float(parts[2])
+        except (IndexError, ValueError):
+            await update.message.reply_text("❌ 格式错误，示例: /alert btc 100000")
+            return
+
+        try:
+            ticker = await self.get_ticker(symbol)
+            current = float(ticker.get('close', 0))
+        except Exception as e:
+            logger.error(f"设置提醒失败 {symbol}: {e}")
+            await update.message.reply_text("❌ 获取当前价格失败，请稍后重试")
+            return
+
+        direction = 'above' if target > current else 'below'
+        alert = {
+            'id': uuid.uuid4().hex,
+            'symbol': symbol,
+            'price': target,
+            'direction': direction,
+            'created': datetime.now().isoformat(timespec='seconds')
+        }
+        self.alert_engine.add(user_id, alert)
+        self.store.upsert_alert(user_id, alert)
+        await self.track_symbol(symbol)
+
+        word = '突破' if direction == 'above' else '跌破'
+        await update.message.reply_text(
+            f"🔔 已设置提醒: {symbol.upper()} {word} ${target:,.4f}\n当前价格: ${current:,.4f}"
+        )
+
+    # ========== 图表 ==========
+
+    async def handle_chart_command(self, update: Update, args: List[str]):
+        """处理 /chart <币种> [周期] | /chart assets | /chart grid <币种>"""
+        chat_id = update.effective_chat.id
+        bot = update.get_bot()
+        try:
+            target = args[0].lower()
+            if target == 'assets':
+                await self.send_asset_chart(bot, chat_id)
+            elif target == 'grid':
+                if len(args) < 2:
+                    raise ValueError("使用方法: /chart grid <币种>")
+                await self.send_grid_chart(bot, chat_id, self.coin_to_symbol(args[1]))
+            else:
+                period = args[1].lower() if len(args) > 1 else '60min'
+                await self.send_kline_chart(bot, chat_id, self.coin_to_symbol(target), period)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+        except Exception as e:
+            logger.error(f"生成图表失败 {' '.join(args)}: {e}")
+            await update.message.reply_text("❌ 生成图表失败，请稍后重试")
+
+    @staticmethod
+    def chart_key(kind: str, symbol: str, period: str, candles) -> tuple:
+        """图表缓存键 (类型, 交易对, 周期, 最后一根K线的时间/收盘/最高/最低)
+
+        K线由 chart_candles 按 CHART_MAX_AGE 刷新，未收盘K线变化时键随之变化，行情不动时复用同一张图。
+        """
+        last = candles[-1]
+        return kind, symbol, period, int(last['ts']), float(last['close']), float(last['high']), float(last['low'])
+
+    async def chart_candles(self, symbol: str, period: str):
+        if period not in PERIOD_SECONDS:
+            raise ValueError(f"不支持的周期 {period}，可选: {', '.join(PERIOD_SECONDS)}")
+        candles = await self.get_candles(symbol, period, self.config.CHART_CANDLES, max_age=self.config.CHART_MAX_AGE)
+        if not len(candles):
+            raise ValueError(f"未找到 {symbol.upper()} 的K线数据")
+        return candles
+
+    async def send_kline_chart(self, bot, chat_id, symbol: str, period: str = '60min'):
+        candles = await self.chart_candles(symbol, period)
+        key = self.chart_key('kline', symbol, period, candles)
+        await self.charts.send(bot, chat_id, key, render_kline, symbol, period, candles)
+
+    async def send_asset_chart(self, bot, chat_id):
+        balance = await self.client.get_balance()
+        snapshot = await self.market_snapshot.refresh()
+        total, values = value_holdings(self.aggregate_balance(balance), snapshot)
+        if total <= 0:
+            raise ValueError("账户暂无可估值的资产")
+        # 占比精确到0.1%、总额精确到1美元，资产无明显变化时复用同一张图
+        shares = tuple(sorted((c, round(v / total, 3)) for c, v in values.items() if v > 0))
+        key = ('assets', shares, round(total))
+        await self.charts.send(bot, chat_id, key, render_assets, values)
+
+    async def send_grid_chart(self, bot, chat_id, symbol: str, period: str = '60min'):
+        grids = [grid for grid in self.grid_manager.grids.values() if grid.symbol == symbol]
+        if not grids:
+            raise ValueError(f"{symbol.upper()} 没有运行中的网格")
+        candles = await self.chart_candles(symbol, period)
+        for grid in grids:
+            buys = sorted(level for side, level in grid.open if side == BUY)
+            sells = sorted(level for side, level in grid.open if side == SELL)
+            key = self.chart_key('grid', symbol, period, candles) + (grid.grid_id, tuple(buys), tuple(sells))
+            await self.charts.send(
+                bot, chat_id, key, render_grid, symbol, period, candles, grid.levels, buys, sells,
+                caption=f"🎯 {grid.grid_id} 已成交 {grid.fills} 次，收益 ${grid.profit:,.2f}"
+            )
+
+    def on_ticker(self, symbol: str, price: float, tick: Dict):
+        """行情推送回调：只弹出被穿越的提醒，驱动该交易对的网格与异动检测"""
+        self.grid_manager.on_price(symbol, price)
+        triggered = self.alert_engine.on_price(symbol, price)
+        if triggered and self.dispatcher is not None:
+            self.spawn(self.notify_alerts(triggered, price), f'价格提醒 {symbol}')
+        moves = self.move_detector.update(symbol, price)
+        if moves:
+            self.notify_moves(moves)
+
+    async def notify_alerts(self, triggered: List, price: float):
+        for user_id, alert in triggered:
+            self.store.delete_alert(alert['id'])
+            await self.send_alert(user_id, alert, price)
+
+    async def check_price_alerts(self, context: ContextTypes.DEFAULT_TYPE):
+        """兜底检查：只处理推送已过期（如WebSocket断线）的交易对"""
+        for symbol in self.alert_engine.symbols():
+            if self.market_hub.get_price(symbol, max_age=self.config.WS_TICKER_MAX_AGE) is not None:
+                continue
+            try:
+                ticker = await self.ticker_cache.get(symbol)
+                price = float(ticker.get('close', 0))
+            except Exception as e:
+                logger.error(f"检查提醒失败 {symbol}: {e}")
+                continue
+            if price:
+                await self.notify_alerts(self.alert_engine.on_price(symbol, price), price)
+
+    async def send_alert(self, user_id: str, alert: Dict, price: float):
+        """发送价格提醒"""
+        word = '突破' if alert['direction'] == 'above' else '跌破'
+        self.dispatcher.send(
+            user_id,
+            f"🔔 价格提醒\n{alert['symbol'].upper()} 已{word} ${alert['price']:,.4f}\n"
+            f"当前价格: ${price:,.4f}",
+            priority=PRIORITY_ALERT
+        )
+
+    # ========== 价格异动 ==========
+
+    async def scan_market_moves(self, context: ContextTypes.DEFAULT_TYPE = None):
+        """全市场异动扫描：一次 /market/tickers 请求覆盖所有USDT交易对"""
+        try:
+            snapshot = await self.market_snapshot.refresh(force=True)
+        except Exception as e:
+            logger.error(f"异动扫描获取行情失败: {e}")
+            return
+        usdt = np.char.endswith(snapshot.symbols, 'usdt') & (snapshot.closes > 0)
+        moves = self.move_detector.update_many(
+            zip(snapshot.symbols[usdt].tolist(), snapshot.closes[usdt].tolist())
+        )
+        if moves:
+            self.notify_moves(moves)
+
+    def notify_moves(self, moves: List[Dict]):
+        """异动通知：自选了该交易对的用户 + MOVE_ALERT_CHATS 中的会话"""
+        if self.dispatcher is None:
+            return
+        watchers: Dict[str, List[str]] = {}
+        for user_id, symbols in self.user_watchlist.items():
+            for symbol in symbols:
+                watchers.setdefault(symbol, []).append(user_id)
+        broadcast = [chat for chat in self.config.MOVE_ALERT_CHATS if chat]
+
+        for move in moves:
+            recipients = set(watchers.get(move['symbol'], ())) | set(broadcast)
+            if not recipients:
+                continue
+            horizon = move['horizon']
+            label = f"{horizon // 60}分钟" if horizon % 60 == 0 else f"{horizon}秒"
+            arrow = '🚀' if move['direction'] == 'up' else '💥'
+            sigma = f" ({move['zscore']:+.1f}σ)" if move['zscore'] else ''
+            text = (
+                f"{arrow} 价格异动\n{move['symbol'].upper()} {label}内 {move['change_pct']:+.2f}%{sigma}\n"
+                f"当前价格: ${move['price']:,.4f}"
+            )
+            for user_id in recipients:
+                self.dispatcher.send(user_id, text, priority=PRIORITY_ALERT)
+
+    # ========== 成交通知 ==========
+
+    def on_fill(self, fill: Dict):
+        """账户推送成交回调：网格订单通知网格创建者，其他订单通知所有授权用户"""
+        if self.dispatcher is None:
+            return
+        grid = self.grid_manager.find_by_order(fill['client_order_id']) if fill.get('client_order_id') else None
+        owner = self.grid_owners.get(grid.grid_id) if grid is not None else None
+        user_ids = [owner] if owner else [u for u in self.config.ALLOWED_USERS if u]
+        if not user_ids:
+            return
+
+        side = '买入' if fill['side'] == 'buy' else '卖出'
+        status = '全部成交' if fill['status'] == 'filled' else '部分成交'
+        text = (
+            f"✅ 成交通知\n{fill['symbol'].upper()} {side} {fill['amount']:.8g} @ ${fill['price']:,.4f}\n"
+            f"订单状态: {status}"
+        )
+        if grid is not None:
+            text += f"\n网格: {grid.grid_id}"
+        for user_id in user_ids:
+            self.dispatcher.send(user_id, text, priority=PRIORITY_TRADE)
@@ -0,0 +1,14 @@
+"""
+Telegram键盘布局
+"""
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup
+
+class Keyboards:
+    @staticmethod
+    def main_menu():
+        """主菜单键盘"""
+        keyboard = [
+            ['💹 市场行情', '💰 账户余额'],
+            ['🎯 网格交易', '💱 现货交易'],
+        ]
+        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
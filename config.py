@@ -1,19 +1,120 @@
-"""配置管理"""
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-class Config:
-    TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
-    HUOBI_API_KEY = os.getenv('HUOBI_API_KEY')
-    HUOBI_SECRET_KEY = os.getenv('HUOBI_SECRET_KEY')
-    ALLOWED_USERS = os.getenv('ALLOWED_USERS', '').split(',') if os.getenv('ALLOWED_USERS') else []
-
-    @classmethod
-    def validate(cls):
-        if not cls.TELEGRAM_BOT_TOKEN:
-            raise ValueError("TELEGRAM_BOT_TOKEN is required")
-        if not cls.HUOBI_API_KEY:
-            raise ValueError("HUOBI_API_KEY is required")
-        return True
+"""配置管理"""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+class Config:
+    TELEGRAM_BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
+    HUOBI_API_KEY = os.getenv('HUOBI_API_KEY')
+    HUOBI_SECRET_KEY = os.getenv('HUOBI_SECRET_KEY')
+    ALLOWED_USERS = os.getenv('ALLOWED_USERS', '').split(',') if os.getenv('ALLOWED_USERS') else []
+
+    # 运行模式: polling / webhook
+    BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL', '')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '127.0.0.1')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', 'telegram')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET', '')
+    # 更新处理: 并发工作数 / 已接收未完成上限 / 待取队列长度 / 余额命令并发上限
+    CONCURRENT_UPDATES = int(os.getenv('CONCURRENT_UPDATES', '16'))
+    MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '256'))
+    UPDATE_QUEUE_SIZE = int(os.getenv('UPDATE_QUEUE_SIZE', '1000'))
+    BALANCE_CONCURRENCY = int(os.getenv('BALANCE_CONCURRENCY', '2'))
+    # 可选: 自定义 Bot API 地址（本地回放测试用）与更新记录文件
+    TELEGRAM_API_BASE_URL = os.getenv('TELEGRAM_API_BASE_URL', '')
+    RECORD_UPDATES_FILE = os.getenv('RECORD_UPDATES_FILE', '')
+
+    HUOBI_BASE_URL = os.getenv('HUOBI_BASE_URL', 'https://api.huobi.pro')
+    HUOBI_WS_URL = os.getenv('HUOBI_WS_URL', 'wss://api.huobi.pro/ws')
+    HUOBI_WS_PRIVATE_URL = os.getenv('HUOBI_WS_PRIVATE_URL', 'wss://api.huobi.pro/ws/v2')
+    WS_TICKER_MAX_AGE = float(os.getenv('WS_TICKER_MAX_AGE', '10'))
+    # 本地K线（含未收盘的最后一根）距上次刷新超过该秒数时重新请求最新K线
+    KLINE_MAX_AGE = float(os.getenv('KLINE_MAX_AGE', '10'))
+    ORDER_BOOK_LEVELS = int(os.getenv('ORDER_BOOK_LEVELS', '150'))
+    TICKER_CACHE_TTL = float(os.getenv('TICKER_CACHE_TTL', '2'))
+    TICKER_CACHE_SIZE = int(os.getenv('TICKER_CACHE_SIZE', '512'))
+    MARKET_SNAPSHOT_MAX_AGE = float(os.getenv('MARKET_SNAPSHOT_MAX_AGE', '5'))
+    BALANCE_CACHE_TTL = float(os.getenv('BALANCE_CACHE_TTL', '5'))
+    SYMBOL_REFRESH_INTERVAL = int(os.getenv('SYMBOL_REFRESH_INTERVAL', '21600'))
+
+    DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///data/bot.db')
+
+    # 网格交易
+    GRID_LEVELS = int(os.getenv('GRID_LEVELS', '10'))
+    GRID_PROFIT_RATE = float(os.getenv('GRID_PROFIT_RATE', '0.002'))
+    GRID_MIN_AMOUNT = float(os.getenv('GRID_MIN_AMOUNT', '10'))
+    GRID_SYNC_INTERVAL = float(os.getenv('GRID_SYNC_INTERVAL', '5'))
+
+    # 共享执行器: I/O线程数 / 计算进程数(0为CPU核数-1) / 排队上限 / 单次调用超时秒数
+    EXECUTOR_IO_WORKERS = int(os.getenv('EXECUTOR_IO_WORKERS', '8'))
+    EXECUTOR_CPU_WORKERS = int(os.getenv('EXECUTOR_CPU_WORKERS', '0'))
+    EXECUTOR_MAX_QUEUE = int(os.getenv('EXECUTOR_MAX_QUEUE', '100'))
+    EXECUTOR_TIMEOUT = float(os.getenv('EXECUTOR_TIMEOUT', '10'))
+
+    # 自选摘要: 推送间隔秒数(0为关闭) / 每批用户数 / 批间隔秒数
+    DIGEST_INTERVAL = int(os.getenv('DIGEST_INTERVAL', '14400'))
+    DIGEST_BATCH_SIZE = int(os.getenv('DIGEST_BATCH_SIZE', '20'))
+    DIGEST_BATCH_DELAY = float(os.getenv('DIGEST_BATCH_DELAY', '1'))
+
+    # 价格异动: 周期(秒) / 各周期涨跌幅阈值(%) / z分数阈值 / z分数触发的最小涨跌幅(%)
+    MOVE_THRESHOLDS = os.getenv('MOVE_THRESHOLDS', '60:2,300:3,900:5')
+    MOVE_SIGMA = float(os.getenv('MOVE_SIGMA', '4'))
+    MOVE_MIN_PCT = float(os.getenv('MOVE_MIN_PCT', '0.5'))
+    # 分桶秒数 / 波动率半衰期秒数 / 全市场扫描间隔秒数(0为只监控已订阅的交易对) / 接收全市场异动的会话
+    MOVE_BUCKET_SECONDS = int(os.getenv('MOVE_BUCKET_SECONDS', '10'))
+    MOVE_VOL_HALFLIFE = float(os.getenv('MOVE_VOL_HALFLIFE', '3600'))
+    MOVE_SCAN_INTERVAL = int(os.getenv('MOVE_SCAN_INTERVAL', '10'))
+    MOVE_ALERT_CHATS = os.getenv('MOVE_ALERT_CHATS', '').split(',') if os.getenv('MOVE_ALERT_CHATS') else []
+
+    # 图表: PNG缓存上限(MB) / 作图K线的最长刷新间隔秒数（未收盘K线超过即重新请求） / K线根数
+    CHART_CACHE_MB = int(os.getenv('CHART_CACHE_MB', '32'))
+    CHART_MAX_AGE = int(os.getenv('CHART_MAX_AGE', '60'))
+    CHART_CANDLES = int(os.getenv('CHART_CANDLES', '120'))
+
+    # HTTP连接池
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '100'))
+    HTTP_POOL_PER_HOST = int(os.getenv('HTTP_POOL_PER_HOST', '20'))
+    HTTP_KEEPALIVE = float(os.getenv('HTTP_KEEPALIVE', '30'))
+    HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', '10'))
+
+    # Telegram 出站消息: 全局每秒条数 / 单会话每秒条数
+    TELEGRAM_GLOBAL_RATE = float(os.getenv('TELEGRAM_GLOBAL_RATE', '25'))
+    TELEGRAM_CHAT_RATE = float(os.getenv('TELEGRAM_CHAT_RATE', '1'))
+
+    # 限流: 每秒补充令牌数/突发容量
+    RATE_LIMIT_MARKET = os.getenv('RATE_LIMIT_MARKET', '50/100')
+    RATE_LIMIT_ACCOUNT = os.getenv('RATE_LIMIT_ACCOUNT', '10/20')
+    RATE_LIMIT_TRADE = os.getenv('RATE_LIMIT_TRADE', '20/40')
+
+    @classmethod
+    def rate_limits(cls):
+        limits = {}
+        for name, value in (('market', cls.RATE_LIMIT_MARKET),
+                            ('account', cls.RATE_LIMIT_ACCOUNT),
+                            ('trade', cls.RATE_LIMIT_TRADE)):
+            rate, burst = value.split('/')
+            limits[name] = (float(rate), int(burst))
+        return limits
+
+    @classmethod
+    def move_thresholds(cls):
+        """'60:2,300:3' -> {60: 2.0, 300: 3.0}"""
+        thresholds = {}
+        for item in cls.MOVE_THRESHOLDS.split(','):
+            horizon, pct = item.split(':')
+            thresholds[int(horizon)] = float(pct)
+        return thresholds
+
+    @classmethod
+    def validate(cls):
+        if not cls.TELEGRAM_BOT_TOKEN:
+            raise ValueError("TELEGRAM_BOT_TOKEN is required")
+        if not cls.HUOBI_API_KEY:
+            raise ValueError("HUOBI_API_KEY is required")
+        if cls.BOT_MODE not in ('polling', 'webhook'):
+            raise ValueError("BOT_MODE must be 'polling' or 'webhook'")
+        if cls.BOT_MODE == 'webhook' and not cls.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required in webhook mode")
+        return True
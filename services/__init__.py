@@ -0,0 +1,20 @@
+"""
+业务服务模块
+"""
+from .market import MarketSnapshot
+from .account import value_holdings
+from .symbols import SymbolIndex, SymbolInfo
+from .monitoring import AlertEngine, MoveDetector
+from .storage import UserStore
+from .statistics import BalanceHistory
+from .klines import KlineStore
+from .orderbook import OrderBook, OrderBookManager
+from .executor import TaskExecutor, run_blocking
+from .charts import ChartService
+
+__all__ = [
+    'MarketSnapshot', 'value_holdings', 'SymbolIndex', 'SymbolInfo',
+    'AlertEngine', 'MoveDetector', 'UserStore', 'BalanceHistory', 'KlineStore',
+    'OrderBook', 'OrderBookManager', 'TaskExecutor', 'run_blocking',
+    'ChartService'
+]
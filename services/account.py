@@ -0,0 +1,37 @@
+"""
+账户管理服务
+"""
+import logging
+from typing import Dict, Tuple
+
+import numpy as np
+
+from .market import MarketSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+def value_holdings(holdings: Dict[str, float], snapshot: MarketSnapshot,
+                   quote: str = 'usdt', bridge: str = 'btc') -> Tuple[float, Dict[str, float]]:
+    """按行情快照一次性估值所有持仓
+
+    优先使用 <币种><quote> 交易对；没有直接交易对时通过 <币种><bridge> × <bridge><quote> 折算。
+    返回 (总价值, 各币种价值)，无法估值的币种价值为 0。
+    """
+    if not holdings:
+        return 0.0, {}
+
+    currencies = np.array(list(holdings), dtype=str)
+    amounts = np.fromiter(holdings.values(), dtype=np.float64, count=len(holdings))
+
+    prices = snapshot.lookup(np.char.add(currencies, quote))
+    prices[currencies == quote] = 1.0
+
+    missing = np.isnan(prices)
+    if missing.any():
+        bridge_price = snapshot.price(f'{bridge}{quote}')
+        if bridge_price:
+            prices[missing] = snapshot.lookup(np.char.add(currencies[missing], bridge)) * bridge_price
+
+    values = np.nan_to_num(amounts * prices, nan=0.0)
+    return float(values.sum()), dict(zip(currencies.tolist(), values.tolist()))
@@ -0,0 +1,230 @@
+"""
+图表服务 - 进程池渲染与PNG缓存
+"""
+import asyncio
+import functools
+import io
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, List, Sequence
+
+import numpy as np
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+UP_COLOR = '#26a69a'
+DOWN_COLOR = '#ef5350'
+
+# 每个工作进程内复用的图形模板 {图表类型: (figure, axes)}
+_TEMPLATES: Dict[str, tuple] = {}
+
+
+# ========== 渲染（在进程池中执行） ==========
+
+def _template(kind: str):
+    """取出（首次调用时创建）图形模板并清空坐标轴，避免每张图重新构建 Figure"""
+    entry = _TEMPLATES.get(kind)
+    if entry is None:
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        if kind == 'kline':
+            figure = Figure(figsize=(10, 6), dpi=100)
+            axes = tuple(figure.subplots(2, 1, sharex=True, gridspec_kw={'height_ratios': [3, 1]}))
+        else:
+            figure = Figure(figsize=(8, 6), dpi=100)
+            axes = (figure.add_subplot(),)
+        FigureCanvasAgg(figure)
+        entry = _TEMPLATES[kind] = (figure, axes)
+
+    figure, axes = entry
+    for ax in axes:
+        ax.clear()
+    return figure, axes
+
+
+def _png(figure) -> bytes:
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def _moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    return (cumsum[window:] - cumsum[:-window]) / window
+
+
+def _bar_width(figure, ax, count: int, fill: float = 0.6) -> float:
+    """每根K线占坐标轴宽度的 fill 比例，换算为线宽（磅）"""
+    width_inches = figure.get_figwidth() * ax.get_position().width
+    return max(0.5, width_inches * 72 / max(count, 1) * fill)
+
+
+def _time_ticks(ax, ts: np.ndarray, count: int = 6):
+    positions = np.linspace(0, len(ts) - 1, min(count, len(ts))).astype(int)
+    ax.set_xticks(positions)
+    ax.set_xticklabels([time.strftime('%m-%d %H:%M', time.localtime(int(ts[i]))) for i in positions])
+
+
+def render_kline(symbol: str, period: str, candles: np.ndarray, ma_windows: Sequence[int] = (5, 20)) -> bytes:
+    """K线图：蜡烛 + 均线 + 成交额（candles 为 KlineStore 的结构化数组）"""
+    figure, (price_ax, volume_ax) = _template('kline')
+    x = np.arange(len(candles))
+    opens, closes = candles['open'], candles['close']
+    colors = np.where(closes >= opens, UP_COLOR, DOWN_COLOR)
+
+    # 影线、实体、成交额都画成竖线集合（单个 LineCollection），比逐根 bar 补丁快一个数量级
+    width = _bar_width(figure, price_ax, len(candles))
+    price_ax.vlines(x, candles['low'], candles['high'], colors=colors, linewidth=0.8)
+    top, bottom = np.maximum(opens, closes), np.minimum(opens, closes)
+    top = np.maximum(top, bottom + (candles['high'] - candles['low']).max() * 2e-3)
+    price_ax.vlines(x, bottom, top, colors=colors, linewidth=width)
+    windows = [window for window in ma_windows if len(candles) >= window]
+    for window in windows:
+        price_ax.plot(x[window - 1:], _moving_average(closes, window), linewidth=1, label=f'MA{window}')
+    if windows:
+        price_ax.legend(loc='upper left')
+    price_ax.set_title(f'{symbol.upper()} {period}  close {closes[-1]:.6g}')
+    price_ax.grid(alpha=0.3)
+
+    volume_ax.vlines(x, 0, candles['vol'], colors=colors, linewidth=width)
+    volume_ax.set_ylim(bottom=0)
+    price_ax.set_xlim(-1, len(candles))
+    volume_ax.grid(alpha=0.3)
+    _time_ticks(volume_ax, candles['ts'])
+    return _png(figure)
+
+
+def render_assets(values: Dict[str, float], top: int = 8, min_share: float = 0.02) -> bytes:
+    """资产分布饼图（USDT计价），前 top 个且占比不低于 min_share 的币种之外合并为 OTHER"""
+    figure, (ax,) = _template('assets')
+    items = sorted(((c, v) for c, v in values.items() if v > 0), key=lambda item: -item[1])
+    total = sum(v for _, v in items)
+    shown = [(c, v) for c, v in items[:top] if v >= total * min_share]
+    rest = total - sum(v for _, v in shown)
+    if rest > 0:
+        shown.append(('other', rest))
+    items = shown
+
+    if items:
+        ax.pie([v for _, v in items], labels=[c.upper() for c, _ in items],
+               autopct='%1.1f%%', startangle=90, counterclock=False)
+    ax.set_title(f'Total ${total:,.0f}', pad=24)
+    ax.axis('equal')
+    return _png(figure)
+
+
+def render_grid(symbol: str, period: str, candles: np.ndarray, levels: List[float],
+                buy_levels: List[int], sell_levels: List[int]) -> bytes:
+    """网格图：收盘价走势 + 网格价位（绿色为挂买单，红色为挂卖单，灰色为空闲）"""
+    figure, (ax,) = _template('grid')
+    x = np.arange(len(candles))
+    ax.plot(x, candles['close'], color='#1f77b4', linewidth=1.2)
+
+    buys, sells = set(buy_levels), set(sell_levels)
+    for i, price in enumerate(levels):
+        if i in buys:
+            ax.axhline(price, color=UP_COLOR, linestyle='--', linewidth=0.9)
+        elif i in sells:
+            ax.axhline(price, color=DOWN_COLOR, linestyle='--', linewidth=0.9)
+        else:
+            ax.axhline(price, color='grey', linestyle=':', linewidth=0.7)
+
+    ax.set_title(f'{symbol.upper()} grid {levels[0]:.6g} - {levels[-1]:.6g}  ({len(buys)} buy / {len(sells)} sell)')
+    ax.grid(alpha=0.3)
+    _time_ticks(ax, candles['ts'])
+    return _png(figure)
+
+
+# ========== 缓存与发送 ==========
+
+class ChartService:
+    """图表服务
+
+    渲染在共享执行器的进程池中进行（Agg 后端，每个进程复用图形模板）；
+    PNG 以 (图表类型, 交易对, 周期, 最后一根K线时间, ...) 为键缓存，按总字节数 LRU 淘汰；
+    首次上传后记下 Telegram 返回的 file_id，同一图表再次发送时只传 file_id，不再上传图片。
+    """
+
+    def __init__(self, executor, max_bytes: int = 32 * 1024 * 1024, max_file_ids: int = 4096):
+        self.executor = executor
+        self.max_bytes = max_bytes
+        self.max_file_ids = max_file_ids
+        self._cache: 'OrderedDict[Hashable, bytes]' = OrderedDict()
+        self._bytes = 0
+        self._file_ids: 'OrderedDict[Hashable, str]' = OrderedDict()
+        # 相同图表并发请求只渲染一次；渲染是独立任务，单个请求取消不影响其他等待者
+        self._rendering: Dict[Hashable, asyncio.Task] = {}
+
+        self.metrics = {'renders': 0, 'cache_hits': 0, 'evictions': 0, 'uploads': 0, 'file_id_hits': 0}
+
+    async def render(self, key: Hashable, func: Callable, *args) -> bytes:
+        """取缓存的PNG，未命中时在进程池中渲染"""
+        png = self._cache.get(key)
+        if png is not None:
+            self._cache.move_to_end(key)
+            self.metrics['cache_hits'] += 1
+            return png
+
+        task = self._rendering.get(key)
+        if task is None:
+            task = self._rendering[key] = asyncio.ensure_future(self._render(key, func, *args))
+            task.add_done_callback(functools.partial(self._render_done, key))
+        return await asyncio.shield(task)
+
+    async def _render(self, key: Hashable, func: Callable, *args) -> bytes:
+        png = await self.executor.run_cpu(func, *args)
+        self.metrics['renders'] += 1
+        self._store(key, png)
+        return png
+
+    def _render_done(self, key: Hashable, task: asyncio.Task):
+        if self._rendering.get(key) is task:
+            del self._rendering[key]
+        # 所有等待者都已取消时避免 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def _store(self, key: Hashable, png: bytes):
+        if len(png) > self.max_bytes:
+            return
+        old = self._cache.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        self._cache[key] = png
+        self._bytes += len(png)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.metrics['evictions'] += 1
+
+    def _remember(self, key: Hashable, file_id: str):
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        while len(self._file_ids) > self.max_file_ids:
+            self._file_ids.popitem(last=False)
+
+    async def send(self, bot, chat_id, key: Hashable, func: Callable, *args, caption: str = None):
+        """发送图表：已上传过的复用 file_id，否则渲染（或取缓存）后上传"""
+        file_id = self._file_ids.get(key)
+        if file_id is not None:
+            try:
+                message = await bot.send_photo(chat_id=chat_id, photo=file_id, caption=caption)
+                self._file_ids.move_to_end(key)
+                self.metrics['file_id_hits'] += 1
+                return message
+            except BadRequest as e:
+                logger.warning(f"file_id 已失效，重新上传图表: {e}")
+                self._file_ids.pop(key, None)
+
+        png = await self.render(key, func, *args)
+        message = await bot.send_photo(chat_id=chat_id, photo=png, caption=caption)
+        self.metrics['uploads'] += 1
+        if message.photo:
+            self._remember(key, message.photo[-1].file_id)
+        return message
+
+    def stats(self) -> Dict:
+        return dict(self.metrics, cached=len(self._cache), cached_bytes=self._bytes, file_ids=len(self._file_ids))
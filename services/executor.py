@@ -0,0 +1,148 @@
+"""
+共享执行器 - 阻塞I/O与CPU密集计算
+"""
+import asyncio
+import functools
+import logging
+import os
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Pool:
+    """单个执行器及其排队统计"""
+
+    def __init__(self, name: str, factory: Callable[[int], Executor], workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._factory = factory
+        self.executor: Optional[Executor] = None
+        # 已提交未完成的任务数上限 = 工作线程/进程数 + 排队上限
+        self.slots: Optional[asyncio.Semaphore] = None
+        self.in_flight = 0
+        self.metrics = {
+            'submitted': 0, 'completed': 0, 'failed': 0, 'timeouts': 0,
+            'abandoned': 0, 'max_depth': 0, 'max_latency': 0.0,
+        }
+
+    def get(self) -> Executor:
+        if self.executor is None:
+            self.executor = self._factory(self.workers)
+        return self.executor
+
+    @property
+    def depth(self) -> int:
+        """排队中（尚未开始执行）的任务数"""
+        return max(0, self.in_flight - self.workers)
+
+    def stats(self) -> Dict:
+        return dict(self.metrics, in_flight=self.in_flight, depth=self.depth, workers=self.workers)
+
+
+class TaskExecutor:
+    """共享执行器
+
+    所有阻塞调用（SQLite、文件读写、同步客户端）走有界线程池，图表与指标计算走进程池，
+    事件循环只负责等待结果：
+    - 每次调用都有截止时间（排队时间计算在内），超时抛出 asyncio.TimeoutError；
+    - 尚未开始的任务超时后直接取消，已在执行的任务无法中断，结果被丢弃并计入 abandoned；
+    - 排队达到上限时调用方等待空位，不会无限堆积。
+    """
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 0, max_queue: int = 100, timeout: float = 10):
+        cpu_workers = cpu_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.timeout = timeout
+        self._io = _Pool(
+            'io', lambda n: ThreadPoolExecutor(n, thread_name_prefix='io-worker'), io_workers, max_queue
+        )
+        # 进程池按需创建，避免未使用时启动子进程
+        self._cpu = _Pool('cpu', lambda n: ProcessPoolExecutor(n), cpu_workers, max_queue)
+        self._closed = False
+
+    async def run_io(self, func: Callable, *args, timeout: float = None, **kwargs):
+        """在I/O线程池中执行阻塞调用"""
+        return await self._run(self._io, func, args, kwargs, timeout)
+
+    async def run_cpu(self, func: Callable, *args, timeout: float = None, **kwargs):
+        """在进程池中执行CPU密集计算（func 与参数必须可序列化，func 需为模块级函数）"""
+        return await self._run(self._cpu, func, args, kwargs, timeout)
+
+    async def _run(self, pool: _Pool, func: Callable, args: tuple, kwargs: Dict, timeout: Optional[float]):
+        if self._closed:
+            raise RuntimeError('executor is shut down')
+        loop = asyncio.get_running_loop()
+        timeout = self.timeout if timeout is None else timeout
+        deadline = loop.time() + timeout
+        started = time.monotonic()
+        name = getattr(func, '__qualname__', repr(func))
+
+        if pool.slots is None:
+            pool.slots = asyncio.Semaphore(pool.workers + pool.max_queue)
+        try:
+            await asyncio.wait_for(pool.slots.acquire(), timeout)
+        except asyncio.TimeoutError:
+            pool.metrics['timeouts'] += 1
+            logger.warning(f"{pool.name} 执行器排队超时: {name}")
+            raise
+
+        try:
+            future = pool.get().submit(functools.partial(func, *args, **kwargs))
+        except Exception:
+            pool.slots.release()
+            raise
+        pool.in_flight += 1
+        pool.metrics['submitted'] += 1
+        pool.metrics['max_depth'] = max(pool.metrics['max_depth'], pool.depth)
+        future.add_done_callback(functools.partial(self._notify, loop, pool))
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), max(0.0, deadline - loop.time()))
+        except asyncio.TimeoutError:
+            pool.metrics['timeouts'] += 1
+            if not future.cancel():
+                pool.metrics['abandoned'] += 1
+            logger.warning(f"{pool.name} 执行器任务超时 ({timeout}s): {name}")
+            raise
+        finally:
+            pool.metrics['max_latency'] = max(pool.metrics['max_latency'], time.monotonic() - started)
+
+    def _notify(self, loop: asyncio.AbstractEventLoop, pool: _Pool, future: Future):
+        """任务结束（可能在工作线程中回调），回到事件循环释放名额"""
+        try:
+            loop.call_soon_threadsafe(self._finished, pool, future)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
+
+    @staticmethod
+    def _finished(pool: _Pool, future: Future):
+        pool.in_flight -= 1
+        pool.slots.release()
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            pool.metrics['failed'] += 1
+        else:
+            pool.metrics['completed'] += 1
+
+    def stats(self) -> Dict:
+        return {'io': self._io.stats(), 'cpu': self._cpu.stats()}
+
+    def shutdown(self, wait: bool = True):
+        """停止接收任务；wait 为 True 时等待已提交的任务完成"""
+        self._closed = True
+        for pool in (self._io, self._cpu):
+            if pool.executor is not None:
+                pool.executor.shutdown(wait=wait, cancel_futures=not wait)
+                pool.executor = None
+
+
+async def run_blocking(executor: Optional[TaskExecutor], func: Callable, *args, **kwargs):
+    """有执行器时放到I/O线程池执行，否则直接调用（供可选接入执行器的服务使用）"""
+    if executor is None:
+        return func(*args, **kwargs)
+    return await executor.run_io(func, *args, **kwargs)
@@ -0,0 +1,203 @@
+"""
+K线数据服务 - 本地存储与增量补齐
+"""
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+PERIOD_SECONDS = {
+    '1min': 60,
+    '5min': 300,
+    '15min': 900,
+    '30min': 1800,
+    '60min': 3600,
+    '4hour': 14400,
+    '1day': 86400,
+    '1week': 604800,
+    '1mon': 2592000,
+}
+
+# 单次请求的最大条数（火币限制）
+MAX_FETCH = 2000
+
+CANDLE_DTYPE = np.dtype([
+    ('ts', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'),
+    ('close', '<f8'), ('amount', '<f8'), ('vol', '<f8'), ('count', '<i8'),
+])
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS klines (
+    symbol TEXT NOT NULL,
+    period TEXT NOT NULL,
+    ts INTEGER NOT NULL,
+    open REAL, high REAL, low REAL, close REAL,
+    amount REAL, vol REAL, count INTEGER,
+    PRIMARY KEY (symbol, period, ts)
+) WITHOUT ROWID;
+"""
+
+
+def _to_row(candle: Dict) -> tuple:
+    return (
+        int(candle['id']), float(candle['open']), float(candle['high']), float(candle['low']),
+        float(candle['close']), float(candle.get('amount', 0)), float(candle.get('vol', 0)),
+        int(candle.get('count', 0)),
+    )
+
+
+class KlineStore:
+    """K线本地存储
+
+    以 (交易对, 周期) 为键持久化到 SQLite，内存中保留 NumPy 结构化数组；
+    每次查询只请求上次存储时间之后的K线，WebSocket K线推送原地合并，
+    重复分析不产生网络请求和JSON解析。
+    最后一根K线未收盘，距上次刷新（REST 补齐或 WebSocket 推送）超过 max_age 秒时重新请求最近的K线，
+    已订阅K线推送的交易对由推送保持最新，不产生请求。
+    指定 executor 时数据库读写在I/O线程池中执行；未收盘的K线只在内存中更新，收盘后落盘。
+    """
+
+    def __init__(self, db_path: str = 'data/klines.db', max_candles: int = 5000, executor=None,
+                 max_age: float = 10):
+        self.db_path = db_path
+        self.max_candles = max_candles
+        self.executor = executor
+        self.max_age = max_age
+        # (交易对, 周期) -> 最近一次刷新的时间
+        self._updated: Dict[Tuple[str, str], float] = {}
+        self._writes = set()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self._arrays: Dict[Tuple[str, str], np.ndarray] = {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # ========== 内存与数据库 ==========
+
+    def _load(self, symbol: str, period: str) -> np.ndarray:
+        key = (symbol, period)
+        array = self._arrays.get(key)
+        if array is None:
+            with self._lock:
+                rows = self._conn.execute(
+                    'SELECT ts, open, high, low, close, amount, vol, count FROM klines '
+                    'WHERE symbol = ? AND period = ? ORDER BY ts DESC LIMIT ?',
+                    (symbol, period, self.max_candles)
+                ).fetchall()
+            array = np.array(rows[::-1], dtype=CANDLE_DTYPE)
+            self._arrays[key] = array
+        return array
+
+    def _persist(self, symbol: str, period: str, rows: list):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO klines (symbol, period, ts, open, high, low, close, amount, vol, count) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                [(symbol, period) + row for row in rows]
+            )
+
+    def _persist_later(self, symbol: str, period: str, rows: list):
+        """后台落盘（供同步回调使用）"""
+        if self.executor is None:
+            self._persist(symbol, period, rows)
+            return
+        task = asyncio.ensure_future(self.executor.run_io(self._persist, symbol, period, rows))
+        self._writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Task):
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"K线落盘失败: {task.exception()}")
+
+    def merge(self, symbol: str, period: str, candles: list, persist: bool = True) -> list:
+        """合并一批K线（任意顺序，相同时间戳以新数据为准），返回排序后的行
+
+        persist=False 时只更新内存，由调用方负责落盘。
+        """
+        if not candles:
+            return []
+        rows = sorted(_to_row(c) for c in candles)
+        if persist:
+            self._persist(symbol, period, rows)
+
+        array = self._load(symbol, period)
+        incoming = np.array(rows, dtype=CANDLE_DTYPE)
+        if len(array) and incoming['ts'][0] > array['ts'][-1]:
+            merged = np.concatenate((array, incoming))
+        else:
+            # 有重叠：去掉旧数据中被覆盖的时间戳
+            keep = ~np.isin(array['ts'], incoming['ts'])
+            merged = np.concatenate((array[keep], incoming))
+            merged = merged[np.argsort(merged['ts'], kind='stable')]
+        self._arrays[(symbol, period)] = merged[-self.max_candles:]
+        return rows
+
+    def on_kline(self, symbol: str, period: str, tick: Dict):
+        """WebSocket K线推送：更新最后一根或追加新K线，上一根收盘时落盘"""
+        row = _to_row(tick)
+        array = self._load(symbol, period)
+        self._updated[(symbol, period)] = time.time()
+        if len(array) and array['ts'][-1] == row[0]:
+            array[-1] = row
+        elif not len(array) or row[0] > array['ts'][-1]:
+            closed = array[-1].item() if len(array) else None
+            self.merge(symbol, period, [tick], persist=False)
+            if closed is not None:
+                self._persist_later(symbol, period, [closed])
+
+    def last_ts(self, symbol: str, period: str) -> Optional[int]:
+        array = self._load(symbol, period)
+        return int(array['ts'][-1]) if len(array) else None
+
+    # ========== 查询 ==========
+
+    def window(self, symbol: str, period: str, size: int) -> np.ndarray:
+        """返回最近 size 根K线（按时间升序的结构化数组）"""
+        return self._load(symbol, period)[-size:]
+
+    async def get(self, client, symbol: str, period: str, size: int = 200, max_age: float = None) -> np.ndarray:
+        """获取最近 size 根K线，只补齐本地缺失的部分
+
+        max_age: 距上次刷新不超过该秒数、且最后一根K线仍是当前周期时直接使用本地数据（默认 self.max_age）
+        """
+        key = (symbol, period)
+        seconds = PERIOD_SECONDS[period]
+        if key not in self._arrays:
+            await run_blocking(self.executor, self._load, symbol, period)
+        last = self.last_ts(symbol, period)
+        stored = len(self._load(symbol, period))
+        now = time.time()
+        max_age = self.max_age if max_age is None else max_age
+
+        if (last is not None and stored >= size and now - last < seconds
+                and now - self._updated.get(key, 0.0) < max_age):
+            return self.window(symbol, period, size)
+
+        if last is None or stored < size:
+            fetch = size
+        else:
+            # 从最后一根（可能已收盘或仍在变化）开始补齐，至少刷新最近两根，缺口超过窗口时只取窗口
+            fetch = min(max(int((now - last) // seconds) + 1, 2), size)
+        fetch = max(1, min(fetch, MAX_FETCH))
+
+        candles = await client.get_klines(symbol, period, fetch)
+        rows = self.merge(symbol, period, candles, persist=False)
+        self._updated[key] = now
+        if rows:
+            await run_blocking(self.executor, self._persist, symbol, period, rows)
+        return self.window(symbol, period, size)
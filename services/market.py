@@ -0,0 +1,74 @@
+"""
+市场数据服务
+"""
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MarketSnapshot:
+    """全市场行情快照
+
+    一次 /market/tickers 请求取回所有交易对，按交易对名排序存为 NumPy 数组，
+    批量查价通过 searchsorted 向量化完成。
+    """
+
+    def __init__(self, client, max_age: float = 5.0):
+        self.client = client
+        self.max_age = max_age
+        self.symbols = np.array([], dtype=str)
+        self.closes = np.array([], dtype=np.float64)
+        self.opens = np.array([], dtype=np.float64)
+        self.vols = np.array([], dtype=np.float64)
+        self.updated_at = 0.0
+        self._lock = None
+
+    @property
+    def fresh(self) -> bool:
+        return len(self.symbols) > 0 and time.monotonic() - self.updated_at < self.max_age
+
+    async def refresh(self, force: bool = False) -> 'MarketSnapshot':
+        """拉取最新快照（并发调用只请求一次）"""
+        if not force and self.fresh:
+            return self
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if force or not self.fresh:
+                self.load(await self.client.get_tickers())
+        return self
+
+    def load(self, tickers: List[Dict]):
+        """从 /market/tickers 数据构建价格表（最新价、24小时开盘价、成交额）"""
+        rows = sorted(
+            (t['symbol'], float(t.get('close') or 0), float(t.get('open') or 0), float(t.get('vol') or 0))
+            for t in tickers if t.get('symbol')
+        )
+        self.symbols = np.array([r[0] for r in rows], dtype=str)
+        self.closes = np.array([r[1] for r in rows], dtype=np.float64)
+        self.opens = np.array([r[2] for r in rows], dtype=np.float64)
+        self.vols = np.array([r[3] for r in rows], dtype=np.float64)
+        self.updated_at = time.monotonic()
+
+    def lookup(self, symbols, field: str = 'close') -> np.ndarray:
+        """批量查询 close / open / vol，缺失的交易对返回 NaN"""
+        keys = np.asarray(symbols, dtype=str)
+        values = np.full(keys.shape, np.nan)
+        if len(self.symbols) == 0 or keys.size == 0:
+            return values
+        idx = np.searchsorted(self.symbols, keys)
+        idx = np.minimum(idx, len(self.symbols) - 1)
+        found = self.symbols[idx] == keys
+        column = {'close': self.closes, 'open': self.opens, 'vol': self.vols}[field]
+        values[found] = column[idx[found]]
+        return values
+
+    def price(self, symbol: str) -> Optional[float]:
+        """单个交易对价格"""
+        value = self.lookup([symbol])[0]
+        return None if np.isnan(value) else float(value)
@@ -0,0 +1,298 @@
+"""
+监控预警服务
+"""
+import itertools
+import logging
+import math
+import time
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class _ThresholdBook:
+    """单个交易对单个方向的有序阈值表
+
+    key 升序排列，已触发的阈值总是位于表尾，因此 pop 只需 bisect + 截断尾部。
+    向上突破的提醒存储为 -price，使两种方向都满足这一性质。
+    """
+
+    __slots__ = ('keys', 'ids')
+
+    def __init__(self):
+        self.keys: List[Tuple[float, int]] = []
+        self.ids: Dict[int, float] = {}
+
+    def add(self, key: float, alert_id: int):
+        insort(self.keys, (key, alert_id))
+        self.ids[alert_id] = key
+
+    def remove(self, alert_id: int) -> bool:
+        key = self.ids.pop(alert_id, None)
+        if key is None:
+            return False
+        i = bisect_left(self.keys, (key, alert_id))
+        del self.keys[i]
+        return True
+
+    def pop_from(self, key: float) -> List[int]:
+        """弹出所有 >= key 的阈值"""
+        i = bisect_left(self.keys, (key, -1))
+        if i == len(self.keys):
+            return []
+        crossed = [alert_id for _, alert_id in self.keys[i:]]
+        del self.keys[i:]
+        for alert_id in crossed:
+            del self.ids[alert_id]
+        return crossed
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class AlertEngine:
+    """价格提醒引擎
+
+    每个交易对维护 above/below 两张有序阈值表，新价格到来时
+    只弹出被穿越的提醒，复杂度 O(log n + k)，未触发的提醒不产生任何开销。
+    """
+
+    def __init__(self):
+        self._above: Dict[str, _ThresholdBook] = {}
+        self._below: Dict[str, _ThresholdBook] = {}
+        self._alerts: Dict[int, Tuple[str, Dict]] = {}
+        self._by_user: Dict[str, Set[int]] = {}
+        self._ids = itertools.count(1)
+
+    def __len__(self):
+        return len(self._alerts)
+
+    def add(self, user_id: str, alert: Dict) -> int:
+        """添加提醒，alert 需包含 symbol / price / direction"""
+        alert_id = next(self._ids)
+        symbol = alert['symbol']
+        if alert['direction'] == 'above':
+            self._above.setdefault(symbol, _ThresholdBook()).add(-float(alert['price']), alert_id)
+        else:
+            self._below.setdefault(symbol, _ThresholdBook()).add(float(alert['price']), alert_id)
+        self._alerts[alert_id] = (user_id, alert)
+        self._by_user.setdefault(user_id, set()).add(alert_id)
+        return alert_id
+
+    def remove(self, alert_id: int) -> bool:
+        """删除提醒"""
+        entry = self._alerts.pop(alert_id, None)
+        if entry is None:
+            return False
+        user_id, alert = entry
+        books = self._above if alert['direction'] == 'above' else self._below
+        book = books.get(alert['symbol'])
+        if book is not None:
+            book.remove(alert_id)
+            if not book:
+                del books[alert['symbol']]
+        self._discard_user(user_id, alert_id)
+        return True
+
+    def _discard_user(self, user_id: str, alert_id: int):
+        ids = self._by_user.get(user_id)
+        if ids is not None:
+            ids.discard(alert_id)
+            if not ids:
+                del self._by_user[user_id]
+
+    def on_price(self, symbol: str, price: float) -> List[Tuple[str, Dict]]:
+        """处理新价格，返回并移除所有被触发的 (user_id, alert)"""
+        crossed: List[int] = []
+
+        book = self._above.get(symbol)
+        if book is not None:
+            crossed.extend(book.pop_from(-price))
+            if not book:
+                del self._above[symbol]
+
+        book = self._below.get(symbol)
+        if book is not None:
+            crossed.extend(book.pop_from(price))
+            if not book:
+                del self._below[symbol]
+
+        triggered = []
+        for alert_id in crossed:
+            user_id, alert = self._alerts.pop(alert_id)
+            self._discard_user(user_id, alert_id)
+            triggered.append((user_id, alert))
+        return triggered
+
+    def symbols(self) -> Set[str]:
+        """存在未触发提醒的交易对"""
+        return set(self._above) | set(self._below)
+
+    def user_alerts(self, user_id: str) -> List[Dict]:
+        return [self._alerts[alert_id][1] for alert_id in sorted(self._by_user.get(user_id, ()))]
+
+    def load(self, price_alerts: Dict[str, List[Dict]]):
+        """从 {user_id: [alert, ...]} 格式导入"""
+        for user_id, alerts in price_alerts.items():
+            for alert in alerts:
+                self.add(user_id, alert)
+
+    def to_dict(self) -> Dict[str, List[Dict]]:
+        """导出为 {user_id: [alert, ...]} 格式，用于持久化"""
+        return {user_id: self.user_alerts(user_id) for user_id in self._by_user}
+
+
+class _MoveWindow:
+    """单个交易对的滚动窗口
+
+    价格按固定时长分桶，环形缓冲区保存最近若干个已收盘桶的对数收益，
+    每个周期维护一个滚动和（新桶加入、最旧桶移出），波动率为桶收益平方的EWMA，
+    因此每个推送只做常数次运算。
+    """
+
+    __slots__ = ('ring', 'pos', 'sums', 'bucket', 'base', 'last', 'variance', 'weight', 'seen', 'fired')
+
+    def __init__(self, slots: int, horizons: int, bucket: int, price: float):
+        self.ring = [0.0] * slots
+        self.pos = 0
+        self.sums = [0.0] * horizons
+        self.bucket = bucket
+        # 当前桶的起始价（上一桶收盘价）与最新价
+        self.base = price
+        self.last = price
+        # EWMA 从0起步，variance / weight 为去偏后的估计
+        self.variance = 0.0
+        self.weight = 0.0
+        self.seen = 0
+        # 每个周期上次触发的时间
+        self.fired = [0.0] * horizons
+
+
+class MoveDetector:
+    """价格异动检测
+
+    对每个交易对维护分桶的滚动收益窗口，按多个周期（默认 1/5/15 分钟）计算：
+    - 涨跌幅：当前未收盘桶 + 最近 n-1 个已收盘桶的对数收益之和；
+    - z 分数：涨跌幅 / (EWMA 单桶波动率 × sqrt(n))。
+    |z| 超过 sigma 且涨跌幅不低于 min_pct，或涨跌幅超过该周期的百分比阈值时产生事件；
+    同一交易对同一周期在一个周期长度内只触发一次，同时触发多个周期时只报告最短的一个。
+    每次更新 O(1)，与历史长度无关。
+    """
+
+    def __init__(self, horizons: Sequence[int] = (60, 300, 900), bucket: int = 10, sigma: float = 4.0,
+                 pct_thresholds: Dict[int, float] = None, min_pct: float = 0.5,
+                 halflife: float = 3600, warmup: int = 30):
+        self.horizons = sorted(int(h) for h in horizons)
+        self.bucket = bucket
+        # 每个周期包含的桶数（至少1个）
+        self.spans = [max(1, h // bucket) for h in self.horizons]
+        self.slots = max(self.spans)
+        self.sigma = sigma
+        self.pct_thresholds = [float((pct_thresholds or {}).get(h, 0) or 0) for h in self.horizons]
+        self.min_pct = min_pct
+        self.decay = 0.5 ** (bucket / halflife)
+        self.warmup = warmup
+        self.windows: Dict[str, _MoveWindow] = {}
+
+    def __len__(self):
+        return len(self.windows)
+
+    # ========== 更新 ==========
+
+    def _roll(self, window: _MoveWindow, bucket: int):
+        """收盘当前桶并推进到 bucket，中间没有数据的桶记为零收益"""
+        elapsed = bucket - window.bucket
+        ret = math.log(window.last / window.base) if window.base > 0 else 0.0
+        if elapsed >= self.slots:
+            # 断档超过最长周期，收益窗口清零，波动率保留
+            window.ring = [0.0] * self.slots
+            window.sums = [0.0] * len(self.spans)
+            window.pos = 0
+        else:
+            self._push(window, ret)
+            for _ in range(elapsed - 1):
+                self._push(window, 0.0)
+            gap_decay = self.decay ** (elapsed - 1)
+            window.variance *= gap_decay
+            window.weight *= gap_decay
+        window.variance = window.variance * self.decay + (1 - self.decay) * ret * ret
+        window.weight = window.weight * self.decay + (1 - self.decay)
+        window.seen += 1
+        window.base = window.last
+        window.bucket = bucket
+
+    def _push(self, window: _MoveWindow, ret: float):
+        ring, slots = window.ring, self.slots
+        pos = window.pos
+        for i, span in enumerate(self.spans):
+            # 滚动和覆盖最近 span-1 个已收盘桶，当前桶另行加上
+            if span > 1:
+                window.sums[i] += ret - ring[(pos - span + 1) % slots]
+        ring[pos] = ret
+        window.pos = pos = (pos + 1) % slots
+        if pos == 0:
+            # 每转一圈重算一次，消除浮点累计误差（均摊 O(1)）
+            for i, span in enumerate(self.spans):
+                window.sums[i] = sum(ring[(pos - k) % slots] for k in range(1, span))
+
+    def update(self, symbol: str, price: float, ts: float = None) -> List[Dict]:
+        """输入一个价格，返回触发的异动事件"""
+        if price <= 0:
+            return []
+        ts = time.time() if ts is None else ts
+        bucket = int(ts // self.bucket)
+        window = self.windows.get(symbol)
+        if window is None:
+            self.windows[symbol] = _MoveWindow(self.slots, len(self.spans), bucket, price)
+            return []
+
+        if bucket > window.bucket:
+            self._roll(window, bucket)
+        window.last = price
+
+        partial = math.log(price / window.base) if window.base > 0 else 0.0
+        sigma_ready = window.seen >= self.warmup and window.variance > 0
+        variance = window.variance / window.weight if sigma_ready else 0.0
+        events = []
+        for i, horizon in enumerate(self.horizons):
+            ret = window.sums[i] + partial
+            change = math.expm1(ret) * 100
+            zscore = ret / math.sqrt(variance * self.spans[i]) if sigma_ready else 0.0
+            threshold = self.pct_thresholds[i]
+            hit = (threshold > 0 and abs(change) >= threshold) or (
+                sigma_ready and abs(zscore) >= self.sigma and abs(change) >= self.min_pct
+            )
+            if hit and ts - window.fired[i] >= horizon:
+                window.fired[i] = ts
+                if events:
+                    # 同一次波动同时触发多个周期时只报告最短周期，其余周期进入冷却
+                    continue
+                events.append({
+                    'symbol': symbol,
+                    'horizon': horizon,
+                    'change_pct': change,
+                    'zscore': zscore,
+                    'price': price,
+                    'direction': 'up' if change > 0 else 'down',
+                })
+        return events
+
+    def update_many(self, prices: Iterable[Tuple[str, float]], ts: float = None) -> List[Dict]:
+        """批量输入（例如全市场快照），返回所有触发的事件"""
+        ts = time.time() if ts is None else ts
+        events = []
+        for symbol, price in prices:
+            events.extend(self.update(symbol, price, ts))
+        return events
+
+    def volatility(self, symbol: str, horizon: int) -> Optional[float]:
+        """某周期的EWMA波动率（百分比），样本不足时返回 None"""
+        window = self.windows.get(symbol)
+        if window is None or window.seen < self.warmup or not window.weight or horizon not in self.horizons:
+            return None
+        span = self.spans[self.horizons.index(horizon)]
+        return math.sqrt(window.variance / window.weight * span) * 100
+
+    def remove(self, symbol: str):
+        self.windows.pop(symbol, None)
@@ -0,0 +1,240 @@
+"""
+本地深度簿 - MBP增量推送维护
+"""
+import asyncio
+import logging
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class _BookSide:
+    """单边价位表：按优先级升序排列（卖盘存价格，买盘存负价格），第0档即最优价"""
+
+    __slots__ = ('sign', 'keys', 'sizes', '_cum')
+
+    def __init__(self, sign: int):
+        self.sign = sign
+        self.keys: List[float] = []
+        self.sizes: List[float] = []
+        self._cum: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def load(self, levels: List):
+        pairs = sorted((self.sign * float(price), float(size)) for price, size in levels if float(size) > 0)
+        self.keys = [key for key, _ in pairs]
+        self.sizes = [size for _, size in pairs]
+        self._cum = None
+
+    def update(self, price: float, size: float):
+        key = self.sign * price
+        i = bisect_left(self.keys, key)
+        exists = i < len(self.keys) and self.keys[i] == key
+        if size > 0:
+            if exists:
+                self.sizes[i] = size
+            else:
+                self.keys.insert(i, key)
+                self.sizes.insert(i, size)
+        elif exists:
+            del self.keys[i]
+            del self.sizes[i]
+        self._cum = None
+
+    def best(self) -> Optional[Tuple[float, float]]:
+        if not self.keys:
+            return None
+        return self.sign * self.keys[0], self.sizes[0]
+
+    def cumulative(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(价格, 累计数量, 累计金额)，更新后首次查询时重建"""
+        if self._cum is None:
+            prices = np.array(self.keys) * self.sign
+            sizes = np.array(self.sizes)
+            self._cum = prices, np.cumsum(sizes), np.cumsum(prices * sizes)
+        return self._cum
+
+    def levels(self, count: int) -> List[Tuple[float, float]]:
+        return [(self.sign * key, size) for key, size in zip(self.keys[:count], self.sizes[:count])]
+
+
+class OrderBook:
+    """单个交易对的L2深度簿
+
+    以快照的 seqNum 为起点，只接受 prevSeqNum 与当前 seqNum 相连的增量；
+    出现缺口即标记为未同步，由管理器重新拉取快照。
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.bids = _BookSide(-1)
+        self.asks = _BookSide(1)
+        self.seq_num: Optional[int] = None
+        self.synced = False
+
+    def load_snapshot(self, data: Dict):
+        self.bids.load(data.get('bids', []))
+        self.asks.load(data.get('asks', []))
+        self.seq_num = int(data['seqNum'])
+        self.synced = True
+
+    def apply(self, tick: Dict) -> bool:
+        """应用一条增量，序号不连续时返回 False"""
+        seq, prev = int(tick['seqNum']), int(tick['prevSeqNum'])
+        if self.seq_num is not None and seq <= self.seq_num:
+            return True
+        if prev != self.seq_num:
+            self.synced = False
+            return False
+        for price, size in tick.get('bids') or ():
+            self.bids.update(float(price), float(size))
+        for price, size in tick.get('asks') or ():
+            self.asks.update(float(price), float(size))
+        self.seq_num = seq
+        return True
+
+    # ========== 查询 ==========
+
+    @property
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        return self.bids.best()
+
+    @property
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        return self.asks.best()
+
+    @property
+    def mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid[0] + ask[0]) / 2
+
+    @property
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def depth(self, side: str, price_limit: float = None) -> float:
+        """累计挂单量；指定 price_limit 时只统计优于该价格的档位"""
+        book = self.bids if side == 'bid' else self.asks
+        prices, cum_size, _ = book.cumulative()
+        if not len(prices):
+            return 0.0
+        if price_limit is None:
+            return float(cum_size[-1])
+        count = int(np.searchsorted(book.sign * prices, book.sign * price_limit, side='right'))
+        return float(cum_size[count - 1]) if count else 0.0
+
+    def estimate_fill(self, side: str, amount: float) -> Optional[Dict[str, float]]:
+        """估算市价成交 amount 数量的均价与滑点（买入吃卖盘，卖出吃买盘）"""
+        book = self.asks if side == 'buy' else self.bids
+        prices, cum_size, cum_value = book.cumulative()
+        if not len(prices) or amount <= 0:
+            return None
+
+        i = int(np.searchsorted(cum_size, amount, side='left'))
+        if i >= len(prices):
+            filled, value, worst = float(cum_size[-1]), float(cum_value[-1]), float(prices[-1])
+        else:
+            prev_size = float(cum_size[i - 1]) if i else 0.0
+            prev_value = float(cum_value[i - 1]) if i else 0.0
+            filled = amount
+            value = prev_value + (amount - prev_size) * float(prices[i])
+            worst = float(prices[i])
+
+        best = float(prices[0])
+        average = value / filled
+        return {
+            'average_price': average,
+            'worst_price': worst,
+            'filled': filled,
+            'slippage_pct': abs(average - best) / best * 100,
+            'complete': filled >= amount,
+        }
+
+    def snapshot(self, levels: int = 5) -> Dict:
+        return {'bids': self.bids.levels(levels), 'asks': self.asks.levels(levels), 'seqNum': self.seq_num}
+
+
+class OrderBookManager:
+    """深度簿管理器
+
+    通过共享行情连接订阅 market.$symbol.mbp.$levels 增量推送，并用同一连接的 req 拉取快照；
+    快照返回前的增量先缓存，序号缺口时自动重新同步。
+    """
+
+    def __init__(self, hub, levels: int = 150):
+        self.hub = hub
+        self.levels = levels
+        self.books: Dict[str, OrderBook] = {}
+        self._pending: Dict[str, List[Dict]] = {}
+        self._syncing: Dict[str, asyncio.Task] = {}
+
+    def _channel(self, symbol: str) -> str:
+        return f'market.{symbol}.mbp.{self.levels}'
+
+    async def subscribe(self, symbol: str) -> OrderBook:
+        book = self.books.get(symbol)
+        if book is None:
+            book = OrderBook(symbol)
+            self.books[symbol] = book
+            await self.hub.subscribe(self._channel(symbol), self._on_update)
+            self._resync(symbol)
+        return book
+
+    async def unsubscribe(self, symbol: str):
+        if self.books.pop(symbol, None) is not None:
+            await self.hub.unsubscribe(self._channel(symbol), self._on_update)
+            self._pending.pop(symbol, None)
+
+    def get(self, symbol: str) -> Optional[OrderBook]:
+        """已同步的深度簿，未同步时返回 None"""
+        book = self.books.get(symbol)
+        return book if book is not None and book.synced else None
+
+    def _on_update(self, symbol: str, tick: Dict):
+        book = self.books.get(symbol)
+        if book is None:
+            return
+        pending = self._pending.get(symbol)
+        if pending is not None:
+            pending.append(tick)
+            return
+        if not book.apply(tick):
+            logger.warning(f"{symbol} 深度序号缺口 (期望 {book.seq_num}, 收到 {tick.get('prevSeqNum')})，重新同步")
+            self._resync(symbol, [tick])
+
+    def _resync(self, symbol: str, pending: List[Dict] = None):
+        self._pending[symbol] = list(pending or [])
+        task = self._syncing.get(symbol)
+        if task is None or task.done():
+            self._syncing[symbol] = asyncio.ensure_future(self._load_snapshot(symbol))
+
+    async def _load_snapshot(self, symbol: str, retries: int = 5):
+        delay = 1
+        for _ in range(retries):
+            book = self.books.get(symbol)
+            if book is None:
+                return
+            try:
+                data = await self.hub.request(self._channel(symbol))
+            except Exception as e:
+                logger.warning(f"获取 {symbol} 深度快照失败: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+                continue
+
+            book.load_snapshot(data)
+            pending = self._pending.pop(symbol, [])
+            if all(book.apply(tick) for tick in pending):
+                return
+            # 缓存的增量与快照之间仍有缺口，重新拉取
+            self._pending[symbol] = []
+        # 放弃本轮，下一条增量会因序号缺口再次触发同步
+        self._pending.pop(symbol, None)
+        logger.error(f"{symbol} 深度簿同步失败")
@@ -0,0 +1,191 @@
+"""
+统计分析服务 - 资产历史时间序列
+"""
+import logging
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+POINT_DTYPE = np.dtype([('ts', '<f8'), ('total', '<f8')])
+
+# 层级: 名称 -> (聚合粒度秒数, 容量)；raw 不聚合
+TIERS = {
+    'raw': (0, 4096),
+    '1h': (3600, 24 * 180),
+    '1d': (86400, 365 * 10),
+}
+
+
+class RingSeries:
+    """定长环形缓冲（内存映射文件）
+
+    第0行存放头部信息 (写入位置, 已有数量)，之后是 capacity 行数据；
+    写满后覆盖最旧的点，文件大小与运行时长无关。容量配置变化时保留最近的点重建文件。
+    """
+
+    def __init__(self, path: Path, capacity: int):
+        self.path = path
+        self.capacity = capacity
+        size = path.stat().st_size if path.exists() else 0
+        if size == (capacity + 1) * POINT_DTYPE.itemsize:
+            self._mm = np.memmap(path, dtype=POINT_DTYPE, mode='r+', shape=(capacity + 1,))
+            self._data = self._mm[1:]
+            return
+
+        points = self._read_points(path, size) if size else None
+        self._mm = np.memmap(path, dtype=POINT_DTYPE, mode='w+', shape=(capacity + 1,))
+        self._data = self._mm[1:]
+        if points is not None and len(points):
+            kept = points[-capacity:]
+            self._data[:len(kept)] = kept
+            self._set_header(len(kept) % capacity, len(kept))
+            self._mm.flush()
+            if len(kept) < len(points):
+                logger.warning(f"{path.name} 容量缩小为 {capacity}，丢弃最旧的 {len(points) - len(kept)} 个点")
+
+    @staticmethod
+    def _read_points(path: Path, size: int) -> Optional[np.ndarray]:
+        """按旧容量读出全部数据点（时间顺序），文件损坏时返回 None"""
+        if size % POINT_DTYPE.itemsize or size < 2 * POINT_DTYPE.itemsize:
+            logger.warning(f"{path.name} 文件大小异常，重新创建")
+            return None
+        raw = np.fromfile(path, dtype=POINT_DTYPE)
+        capacity = len(raw) - 1
+        head, count = int(raw[0]['ts']), int(raw[0]['total'])
+        if not 0 <= head < capacity or not 0 <= count <= capacity:
+            logger.warning(f"{path.name} 头部信息异常，重新创建")
+            return None
+        data = raw[1:]
+        return data[:count].copy() if count < capacity else np.concatenate((data[head:], data[:head]))
+
+    @property
+    def head(self) -> int:
+        return int(self._mm[0]['ts'])
+
+    @property
+    def count(self) -> int:
+        return int(self._mm[0]['total'])
+
+    def _set_header(self, head: int, count: int):
+        self._mm[0] = (head, count)
+
+    def last(self) -> Optional[Tuple[float, float]]:
+        if not self.count:
+            return None
+        row = self._data[(self.head - 1) % self.capacity]
+        return float(row['ts']), float(row['total'])
+
+    def append(self, ts: float, total: float):
+        head = self.head
+        self._data[head] = (ts, total)
+        self._set_header((head + 1) % self.capacity, min(self.count + 1, self.capacity))
+
+    def replace_last(self, ts: float, total: float):
+        self._data[(self.head - 1) % self.capacity] = (ts, total)
+
+    def view(self) -> np.ndarray:
+        """按时间顺序返回全部数据"""
+        count, head = self.count, self.head
+        if count < self.capacity:
+            return self._data[:count]
+        return np.concatenate((self._data[head:], self._data[:head]))
+
+    def flush(self):
+        self._mm.flush()
+
+
+class BalanceHistory:
+    """资产历史存储
+
+    每个用户按 raw → 1h → 1d 三层保存定长环形缓冲，写入时 O(1) 同步降采样
+    （每个时间桶保留最后一个值），内存与磁盘占用长期保持恒定；
+    趋势与盈亏查询直接在 NumPy 数组上切片计算。
+    """
+
+    def __init__(self, directory: str = 'data/balance_history', tiers: Dict[str, Tuple[int, int]] = None):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.tiers = tiers or TIERS
+        self._series: Dict[str, Dict[str, RingSeries]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _safe_name(user_id: str) -> str:
+        return re.sub(r'[^0-9A-Za-z_-]', '_', str(user_id))
+
+    def _user_series(self, user_id: str) -> Dict[str, RingSeries]:
+        series = self._series.get(user_id)
+        if series is None:
+            name = self._safe_name(user_id)
+            series = {
+                tier: RingSeries(self.directory / f'{name}.{tier}.dat', capacity)
+                for tier, (_, capacity) in self.tiers.items()
+            }
+            self._series[user_id] = series
+        return series
+
+    def users(self) -> List[str]:
+        """磁盘上已有历史的用户"""
+        found = {p.name.split('.', 1)[0] for p in self.directory.glob('*.raw.dat')}
+        return sorted(found | set(self._series))
+
+    def append(self, user_id: str, ts: float, total: float):
+        """追加一个快照并更新各降采样层"""
+        with self._lock:
+            for tier, series in self._user_series(user_id).items():
+                bucket_seconds = self.tiers[tier][0]
+                if not bucket_seconds:
+                    series.append(ts, total)
+                    continue
+                bucket = ts - ts % bucket_seconds
+                last = series.last()
+                if last is not None and last[0] == bucket:
+                    series.replace_last(bucket, total)
+                else:
+                    series.append(bucket, total)
+
+    def series(self, user_id: str, tier: str = 'raw', since: float = None) -> Tuple[np.ndarray, np.ndarray]:
+        """返回 (时间戳数组, 总资产数组)"""
+        with self._lock:
+            data = self._user_series(user_id)[tier].view()
+        if since is not None:
+            data = data[np.searchsorted(data['ts'], since):]
+        return np.array(data['ts']), np.array(data['total'])
+
+    def pick_tier(self, seconds: float) -> str:
+        """按查询跨度选择合适的层级"""
+        if seconds <= 2 * 86400:
+            return 'raw'
+        if seconds <= 90 * 86400:
+            return '1h'
+        return '1d'
+
+    def trend(self, user_id: str, seconds: float, now: float) -> Optional[Dict[str, float]]:
+        """最近 seconds 秒的盈亏趋势"""
+        ts, totals = self.series(user_id, self.pick_tier(seconds), since=now - seconds)
+        if len(totals) < 2:
+            return None
+        peak = np.maximum.accumulate(totals)
+        drawdown = np.where(peak > 0, (peak - totals) / peak, 0.0)
+        first, last = float(totals[0]), float(totals[-1])
+        return {
+            'start': first,
+            'end': last,
+            'change': last - first,
+            'change_pct': (last - first) / first * 100 if first else 0.0,
+            'high': float(totals.max()),
+            'low': float(totals.min()),
+            'max_drawdown_pct': float(drawdown.max()) * 100,
+            'points': len(totals),
+        }
+
+    def flush(self):
+        with self._lock:
+            for series in self._series.values():
+                for ring in series.values():
+                    ring.flush()
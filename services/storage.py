@@ -0,0 +1,219 @@
+"""
+用户数据持久化 - SQLite (WAL)
+"""
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS watchlist (
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    created TEXT,
+    PRIMARY KEY (user_id, symbol)
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    price REAL NOT NULL,
+    direction TEXT NOT NULL,
+    created TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts (user_id);
+CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts (symbol);
+CREATE TABLE IF NOT EXISTS grids (
+    grid_id TEXT PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    state TEXT NOT NULL,
+    updated REAL
+);
+"""
+
+_STOP = object()
+
+
+def sqlite_path(database_url: str) -> str:
+    """sqlite:///data/bot.db -> data/bot.db"""
+    prefix = 'sqlite:///'
+    return database_url[len(prefix):] if database_url.startswith(prefix) else database_url
+
+
+class UserStore:
+    """用户数据存储
+
+    写操作进入队列，由后台线程按批次在单个事务中提交（WAL 模式），
+    进程崩溃最多丢失一个批次；读操作走独立连接，按需查询，不再整体加载文件。
+    """
+
+    def __init__(self, db_path: str = 'data/bot.db', batch_size: int = 200, flush_interval: float = 1.0):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._read_conn = self._connect()
+        self._read_conn.executescript(SCHEMA)
+        self._read_lock = threading.Lock()
+
+        self._queue: 'queue.Queue' = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name='user-store-writer', daemon=True)
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    # ========== 后台写入 ==========
+
+    def _write_loop(self):
+        conn = self._connect()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                # 攒批：最多等待 flush_interval 或凑满 batch_size
+                batch = [item]
+                stop = False
+                deadline = time.monotonic() + self.flush_interval
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                self._commit(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit(self, conn: sqlite3.Connection, batch: List):
+        events = []
+        try:
+            with conn:
+                for sql, params in batch:
+                    if isinstance(sql, threading.Event):
+                        events.append(sql)
+                    else:
+                        conn.execute(sql, params)
+        except Exception as e:
+            logger.error(f"写入用户数据失败（{len(batch)} 条）: {e}")
+        finally:
+            for event in events:
+                event.set()
+
+    def _submit(self, sql: str, params: tuple):
+        self._queue.put((sql, params))
+
+    def flush(self, timeout: float = 10):
+        """等待已提交的写操作落盘"""
+        event = threading.Event()
+        self._queue.put((event, None))
+        event.wait(timeout)
+
+    def close(self):
+        """提交剩余数据并关闭"""
+        if self._writer.is_alive():
+            self._queue.put(_STOP)
+            self._writer.join()
+        self._read_conn.close()
+
+    def _query(self, sql: str, params: tuple = ()) -> List[tuple]:
+        with self._read_lock:
+            return self._read_conn.execute(sql, params).fetchall()
+
+    # ========== 自选 ==========
+
+    def add_watch(self, user_id: str, symbol: str, created: str = None):
+        self._submit(
+            'INSERT INTO watchlist (user_id, symbol, created) VALUES (?, ?, ?) '
+            'ON CONFLICT(user_id, symbol) DO NOTHING',
+            (user_id, symbol, created)
+        )
+
+    def remove_watch(self, user_id: str, symbol: str):
+        self._submit('DELETE FROM watchlist WHERE user_id = ? AND symbol = ?', (user_id, symbol))
+
+    def load_watchlists(self) -> Dict[str, List[str]]:
+        watchlists: Dict[str, List[str]] = {}
+        for user_id, symbol in self._query('SELECT user_id, symbol FROM watchlist ORDER BY rowid'):
+            watchlists.setdefault(user_id, []).append(symbol)
+        return watchlists
+
+    # ========== 提醒 ==========
+
+    def upsert_alert(self, user_id: str, alert: Dict):
+        self._submit(
+            'INSERT INTO alerts (id, user_id, symbol, price, direction, created) VALUES (?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT(id) DO UPDATE SET price = excluded.price, direction = excluded.direction',
+            (alert['id'], user_id, alert['symbol'], alert['price'], alert['direction'], alert.get('created'))
+        )
+
+    def delete_alert(self, alert_id: str):
+        self._submit('DELETE FROM alerts WHERE id = ?', (alert_id,))
+
+    def load_alerts(self, user_id: str = None) -> Dict[str, List[Dict]]:
+        sql = 'SELECT id, user_id, symbol, price, direction, created FROM alerts'
+        params: tuple = ()
+        if user_id is not None:
+            sql += ' WHERE user_id = ?'
+            params = (user_id,)
+        alerts: Dict[str, List[Dict]] = {}
+        for alert_id, uid, symbol, price, direction, created in self._query(sql + ' ORDER BY rowid', params):
+            alerts.setdefault(uid, []).append({
+                'id': alert_id, 'symbol': symbol, 'price': price, 'direction': direction, 'created': created
+            })
+        return alerts
+
+    # ========== 网格 ==========
+
+    def upsert_grid(self, user_id: str, grid_id: str, symbol: str, state: Dict):
+        self._submit(
+            'INSERT INTO grids (grid_id, user_id, symbol, state, updated) VALUES (?, ?, ?, ?, ?) '
+            'ON CONFLICT(grid_id) DO UPDATE SET state = excluded.state, updated = excluded.updated',
+            (grid_id, user_id, symbol, json.dumps(state), time.time())
+        )
+
+    def delete_grid(self, grid_id: str):
+        self._submit('DELETE FROM grids WHERE grid_id = ?', (grid_id,))
+
+    def load_grids(self) -> List[Tuple[str, Dict]]:
+        """运行中的网格 [(user_id, 状态), ...]"""
+        return [(user_id, json.loads(state)) for user_id, state in
+                self._query('SELECT user_id, state FROM grids ORDER BY rowid')]
+
+    # ========== 旧版资产历史（资产历史已改存 BalanceHistory 环形缓冲） ==========
+
+    def load_legacy_balance_history(self) -> Dict[str, List[Dict]]:
+        """读取旧版 balance_history 表（不存在时返回空字典），仅用于迁移"""
+        if not self._query("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'balance_history'"):
+            return {}
+        history: Dict[str, List[Dict]] = {}
+        for user_id, t, total in self._query('SELECT user_id, time, total FROM balance_history ORDER BY user_id, time'):
+            history.setdefault(user_id, []).append({'time': t, 'total': total})
+        return history
+
+    def drop_legacy_balance_history(self):
+        """迁移完成后删除旧表"""
+        self._submit('DROP TABLE IF EXISTS balance_history', ())
+
+    def is_empty(self) -> bool:
+        for table in ('watchlist', 'alerts'):
+            if self._query(f'SELECT 1 FROM {table} LIMIT 1'):
+                return False
+        return True
@@ -0,0 +1,174 @@
+"""
+交易对元数据服务
+"""
+import json
+import logging
+import time
+from collections import namedtuple
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .executor import run_blocking
+
+logger = logging.getLogger(__name__)
+
+SymbolInfo = namedtuple('SymbolInfo', [
+    'symbol', 'base', 'quote', 'state',
+    'price_precision', 'amount_precision', 'value_precision',
+    'min_order_amt', 'max_order_amt', 'min_order_value',
+    'price_step', 'amount_step'
+])
+
+
+def _step(precision: int) -> Decimal:
+    return Decimal(1).scaleb(-precision)
+
+
+def _plain(value) -> str:
+    """定点小数字符串（str(Decimal) 对很小的值会输出 1.23E-7，交易所不接受）"""
+    return format(value if isinstance(value, Decimal) else Decimal(str(value)), 'f')
+
+
+class SymbolIndex:
+    """交易对索引
+
+    启动时加载一次 /v1/common/symbols，按交易对和基础币建立字典索引，
+    精度查询、币种解析均为 O(1)。数据落盘到 data/，重启时直接读取本地文件，再在后台刷新。
+    """
+
+    def __init__(self, cache_file: str = 'data/symbols.json', max_age: float = 6 * 3600, executor=None):
+        self.cache_file = Path(cache_file)
+        self.max_age = max_age
+        self.executor = executor
+        self.symbols: Dict[str, SymbolInfo] = {}
+        self.by_base: Dict[str, Dict[str, str]] = {}
+        self.updated_at = 0.0
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self.symbols
+
+    @property
+    def stale(self) -> bool:
+        return not self.symbols or time.time() - self.updated_at > self.max_age
+
+    # ========== 加载 ==========
+
+    def load(self, raw_symbols: List[Dict], updated_at: float = None):
+        """从接口数据构建索引"""
+        symbols: Dict[str, SymbolInfo] = {}
+        by_base: Dict[str, Dict[str, str]] = {}
+
+        for item in raw_symbols:
+            symbol = item.get('symbol') or f"{item['base-currency']}{item['quote-currency']}"
+            price_precision = int(item.get('price-precision', 8))
+            amount_precision = int(item.get('amount-precision', 8))
+            info = SymbolInfo(
+                symbol=symbol,
+                base=item['base-currency'],
+                quote=item['quote-currency'],
+                state=item.get('state', 'online'),
+                price_precision=price_precision,
+                amount_precision=amount_precision,
+                value_precision=int(item.get('value-precision', 8)),
+                min_order_amt=float(item.get('limit-order-min-order-amt', item.get('min-order-amt', 0)) or 0),
+                max_order_amt=float(item.get('limit-order-max-order-amt', item.get('max-order-amt', 0)) or 0),
+                min_order_value=float(item.get('min-order-value', 0) or 0),
+                price_step=_step(price_precision),
+                amount_step=_step(amount_precision)
+            )
+            symbols[symbol] = info
+            by_base.setdefault(info.base, {})[info.quote] = symbol
+
+        # 整体替换，读取方不会看到半成品
+        self.symbols = symbols
+        self.by_base = by_base
+        self.updated_at = updated_at or time.time()
+
+    def load_file(self) -> bool:
+        """读取本地缓存文件"""
+        if not self.cache_file.exists():
+            return False
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            self.load(cached['data'], cached.get('updated_at'))
+            logger.info(f"从本地加载 {len(self.symbols)} 个交易对")
+            return True
+        except Exception as e:
+            logger.error(f"读取交易对缓存失败: {e}")
+            return False
+
+    def save_file(self, raw_symbols: List[Dict]):
+        """写入本地缓存文件"""
+        try:
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = self.cache_file.with_suffix('.tmp')
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'updated_at': self.updated_at, 'data': raw_symbols}, f)
+            tmp_file.replace(self.cache_file)
+        except Exception as e:
+            logger.error(f"保存交易对缓存失败: {e}")
+
+    async def refresh(self, client):
+        """从交易所重新下载并落盘"""
+        raw_symbols = await client.get_symbols()
+        if not raw_symbols:
+            return
+        self.load(raw_symbols)
+        await run_blocking(self.executor, self.save_file, raw_symbols)
+        logger.info(f"交易对信息已更新: {len(self.symbols)} 个")
+
+    async def ensure_loaded(self, client):
+        """启动时调用：优先本地文件，缺失时同步下载"""
+        if not self.symbols:
+            await run_blocking(self.executor, self.load_file)
+        if not self.symbols:
+            await self.refresh(client)
+
+    # ========== 查询 ==========
+
+    def get(self, symbol: str) -> Optional[SymbolInfo]:
+        return self.symbols.get(symbol)
+
+    def resolve(self, coin: str, quote: str = 'usdt') -> Optional[str]:
+        """币种名或交易对名解析为交易对"""
+        coin = coin.lower()
+        if coin in self.symbols:
+            return coin
+        return self.by_base.get(coin, {}).get(quote)
+
+    def round_price(self, symbol: str, price: float) -> Decimal:
+        """按价格精度四舍五入"""
+        info = self.symbols[symbol]
+        return Decimal(str(price)).quantize(info.price_step, rounding=ROUND_HALF_UP)
+
+    def round_amount(self, symbol: str, amount: float) -> Decimal:
+        """按数量精度向下取整，避免超出可用余额"""
+        info = self.symbols[symbol]
+        return Decimal(str(amount)).quantize(info.amount_step, rounding=ROUND_DOWN)
+
+    def format_order(self, symbol: str, amount, price=None) -> tuple:
+        """返回符合交易所精度的 (数量, 价格) 字符串，未知交易对原样返回"""
+        if symbol not in self.symbols:
+            return _plain(amount), (_plain(price) if price is not None else None)
+        amount_str = _plain(self.round_amount(symbol, amount))
+        price_str = _plain(self.round_price(symbol, price)) if price is not None else None
+        return amount_str, price_str
+
+    def validate_order(self, symbol: str, amount: float, price: float = None):
+        """校验下单数量与金额限制"""
+        info = self.symbols.get(symbol)
+        if info is None:
+            raise ValueError(f"未知交易对: {symbol}")
+        if info.state != 'online':
+            raise ValueError(f"交易对 {symbol} 当前不可交易")
+        if info.min_order_amt and amount < info.min_order_amt:
+            raise ValueError(f"下单数量低于最小值 {info.min_order_amt}")
+        if info.max_order_amt and amount > info.max_order_amt:
+            raise ValueError(f"下单数量高于最大值 {info.max_order_amt}")
+        if price is not None and info.min_order_value and amount * price < info.min_order_value:
+            raise ValueError(f"下单金额低于最小值 {info.min_order_value}")
@@ -0,0 +1,7 @@
+"""
+策略模块
+"""
+from .indicators import scan_crosses, stack_candles
+from .grid_trading import GridStrategy, GridManager
+
+__all__ = ['scan_crosses', 'stack_candles', 'GridStrategy', 'GridManager']
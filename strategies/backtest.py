@@ -0,0 +1,287 @@
+"""
+网格策略离线回测
+"""
+import argparse
+import itertools
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .grid_trading import RANGE_BARS, GridStrategy
+
+logger = logging.getLogger(__name__)
+
+# 网格区间默认取开头 RANGE_BARS 根4小时K线的高低点（与实盘网格共用 RANGE_BARS）
+RANGE_SECONDS = 4 * 3600
+
+_ALIASES = {
+    'ts': ('ts', 'id', 'timestamp', 'time', 'open_time'),
+    'open': ('open',), 'high': ('high',), 'low': ('low',), 'close': ('close',),
+    'amount': ('amount',), 'vol': ('vol', 'volume'), 'count': ('count', 'trades'),
+}
+
+# 进程池工作进程内共享的价格路径（由 initializer 设置一次，避免每个参数组合重复传输）
+_PATH: Optional[np.ndarray] = None
+
+
+# ========== 数据加载 ==========
+
+def _from_columns(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """按列名组装为 KlineStore 的结构化数组，按时间排序去重，毫秒时间戳换算为秒"""
+    from services.klines import CANDLE_DTYPE
+
+    columns = {name.strip().lower(): values for name, values in columns.items()}
+    size = len(next(iter(columns.values()))) if columns else 0
+    candles = np.zeros(size, dtype=CANDLE_DTYPE)
+    for field, aliases in _ALIASES.items():
+        name = next((alias for alias in aliases if alias in columns), None)
+        if name is not None:
+            candles[field] = columns[name]
+        elif field in ('ts', 'open', 'high', 'low', 'close'):
+            raise ValueError(f"K线文件缺少列: {field}")
+
+    if size and np.median(candles['ts']) > 1e11:
+        candles['ts'] //= 1000
+    candles = candles[np.argsort(candles['ts'], kind='stable')]
+    _, first = np.unique(candles['ts'], return_index=True)
+    return candles[first]
+
+
+def load_candles(path: str, symbol: str = None, period: str = '1min') -> np.ndarray:
+    """读取K线文件：CSV（首行为列名）、Parquet，或机器人的 K线数据库（需指定 symbol）"""
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix in ('.db', '.sqlite', '.sqlite3'):
+        if not symbol:
+            raise ValueError("从K线数据库读取需要指定交易对")
+        conn = sqlite3.connect(path)
+        try:
+            rows = conn.execute(
+                "SELECT ts, open, high, low, close, amount, vol, count FROM klines "
+                "WHERE symbol = ? AND period = ? ORDER BY ts",
+                (symbol, period)
+            ).fetchall()
+        finally:
+            conn.close()
+        names = ('ts', 'open', 'high', 'low', 'close', 'amount', 'vol', 'count')
+        data = np.array(rows, dtype=np.float64).reshape(-1, len(names))
+        return _from_columns({name: data[:, i] for i, name in enumerate(names)})
+
+    if suffix == '.parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("读取 Parquet 文件需要安装 pyarrow: pip install pyarrow") from None
+        table = pq.read_table(path)
+        return _from_columns({name: table.column(name).to_numpy() for name in table.column_names})
+
+    with open(path, encoding='utf-8') as f:
+        header = [name.strip().lower() for name in f.readline().split(',')]
+    wanted = {alias for aliases in _ALIASES.values() for alias in aliases}
+    usecols = [i for i, name in enumerate(header) if name in wanted]
+    data = np.loadtxt(path, delimiter=',', skiprows=1, usecols=usecols, dtype=np.float64, ndmin=2)
+    return _from_columns({header[i]: data[:, j] for j, i in enumerate(usecols)})
+
+
+# ========== 价格路径 ==========
+
+def price_path(candles: np.ndarray) -> np.ndarray:
+    """把K线展开为价格路径：阳线按 开-低-高-收、阴线按 开-高-低-收 的顺序经过"""
+    up = candles['close'] >= candles['open']
+    path = np.empty((len(candles), 4), dtype=np.float64)
+    path[:, 0] = candles['open']
+    path[:, 1] = np.where(up, candles['low'], candles['high'])
+    path[:, 2] = np.where(up, candles['high'], candles['low'])
+    path[:, 3] = candles['close']
+    return path.ravel()
+
+
+def grid_range(candles: np.ndarray, period: int = RANGE_SECONDS, bars: int = RANGE_BARS) -> Tuple[float, float, int]:
+    """用开头 bars 个周期的高低点作为网格区间，返回 (下限, 上限, 回测起始下标)"""
+    buckets = candles['ts'] // period
+    starts = np.flatnonzero(np.diff(buckets)) + 1
+    if len(starts) < bars:
+        raise ValueError(f"K线不足 {bars + 1} 个 {period} 秒周期，无法计算网格区间")
+    end = int(starts[bars - 1])
+    return float(candles['low'][:end].min()), float(candles['high'][:end].max()), end
+
+
+# ========== 成交模拟 ==========
+
+def _anchors(prices: np.ndarray, path: np.ndarray) -> np.ndarray:
+    """逐点计算网格锚点（向量化）
+
+    与 GridStrategy 相同：价格下穿挂单价位时锚点下移到最低成交价位，上穿时上移到最高成交价位。
+    价格连续经过路径上相邻两点之间的所有价位，因此每点之后锚点必在该点所处价格区间的两端
+    [lo, hi] 之内：恰好落在价位上时就是该价位，否则从上方进入取 hi、从下方进入取 lo，
+    停留在同一区间内不变，只需对"进入新区间"的点取值再向前填充。
+    """
+    lo = np.searchsorted(prices, path, 'right') - 1
+    hi = np.searchsorted(prices, path, 'left')
+
+    values = lo.copy()
+    values[1:] = np.where((lo[1:] < hi[1:]) & (path[:-1] > path[1:]), hi[1:], values[1:])
+    # 起点：与 GridStrategy.start 相同，取最近的价位
+    first = int(hi[0])
+    if first == 0 or (first < len(prices) and prices[first] - path[0] < path[0] - prices[first - 1]):
+        values[0] = first
+    else:
+        values[0] = first - 1
+    np.clip(values, 0, len(prices) - 1, out=values)
+
+    entered = np.ones(len(path), dtype=bool)
+    entered[1:] = ~((lo[1:] == lo[:-1]) & (hi[1:] == hi[:-1]) & (lo[1:] < hi[1:]))
+    index = np.where(entered, np.arange(len(path)), 0)
+    np.maximum.accumulate(index, out=index)
+    return values[index]
+
+
+def simulate_grid(path: np.ndarray, prices: np.ndarray, order_value: float, fee_rate: float = 0.002) -> Dict:
+    """在价格路径上模拟一个网格，返回成交次数、网格利润、手续费与盈亏
+
+    买单每格投入 order_value，卖单卖出下一格买入的数量（GridStrategy.order_amount）；
+    起始时按起点价格买入锚点以上卖单所需的币，期末按最后价格计算持仓市值。
+    """
+    anchors = _anchors(prices, path)
+    before, after = anchors[:-1], anchors[1:]
+    moved = after - before
+
+    # 价位前缀和：卖出到价位 l 的累计网格利润 / 卖单回款，锚点为 a 时的持币数量
+    gains = prices[1:] / prices[:-1] - 1
+    profit_sum = np.concatenate(([0.0], np.cumsum(gains))) * order_value
+    proceeds_sum = np.concatenate(([0.0], np.cumsum(1 + gains))) * order_value
+    holding = np.concatenate(([0.0], np.cumsum(1 / prices[:-1])))
+    holding = (holding[-1] - holding) * order_value
+
+    sold = moved > 0
+    cash = np.where(sold, proceeds_sum[after] - proceeds_sum[before], moved * order_value)
+    fees = fee_rate * np.abs(cash)
+    equity = np.empty(len(path), dtype=np.float64)
+    equity[0] = 0.0
+    np.cumsum(cash - fees, out=equity[1:])
+    equity += holding[anchors] * path - holding[anchors[0]] * path[0]
+    drawdown = np.maximum.accumulate(equity) - equity
+
+    return {
+        'buys': int(-moved[moved < 0].sum()),
+        'sells': int(moved[sold].sum()),
+        'grid_profit': float((profit_sum[after] - profit_sum[before])[sold].sum()),
+        'fees': float(fees.sum()),
+        'pnl': float(equity[-1]),
+        'max_drawdown': float(drawdown.max()),
+        'anchor': int(anchors[-1]),
+    }
+
+
+def run_grid(path: np.ndarray, lower: float, upper: float, levels: int, profit_rate: float,
+             investment: float = 1000, geometric: bool = False, fee_rate: float = 0.002) -> Dict:
+    """用 GridStrategy 构建网格（与 /grid 相同的价位计算与间距校验，不按交易对精度取整）并回测，网格无效时返回 error"""
+    order_value = investment / levels
+    result = {'levels': levels, 'profit_rate': profit_rate}
+    try:
+        grid = GridStrategy('backtest', '', lower, upper, levels, order_value,
+                            profit_rate=profit_rate, geometric=geometric)
+    except ValueError as e:
+        result['error'] = str(e)
+        return result
+    result.update(simulate_grid(path, grid.prices, order_value, fee_rate))
+    result['return'] = result['pnl'] / investment
+    return result
+
+
+def _init_worker(path: np.ndarray):
+    global _PATH
+    _PATH = path
+
+
+def _run_combo(args: tuple) -> Dict:
+    return run_grid(_PATH, *args)
+
+
+# ========== 参数扫描 ==========
+
+def sweep(candles: np.ndarray, levels: Iterable[int], profit_rates: Iterable[float], investment: float = 1000,
+          lower: float = None, upper: float = None, geometric: bool = False, fee_rate: float = 0.002,
+          workers: int = 0) -> List[Dict]:
+    """对网格数量 × 利润率的所有组合回测，按盈亏从高到低返回
+
+    未指定区间时用开头 RANGE_BARS 根4小时K线的高低点，并从其后开始回测；
+    价格路径只在每个工作进程启动时传输一次，组合按批分发到进程池。
+    """
+    start = 0
+    if lower is None or upper is None:
+        range_low, range_high, start = grid_range(candles)
+        lower = range_low if lower is None else lower
+        upper = range_high if upper is None else upper
+    path = price_path(candles[start:])
+    combos = [(n, rate, investment, geometric, fee_rate) for n, rate in itertools.product(levels, profit_rates)]
+    combos = [(lower, upper) + combo for combo in combos]
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(combos) == 1:
+        results = [run_grid(path, *combo) for combo in combos]
+    else:
+        chunksize = max(1, len(combos) // (workers * 4))
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(path,)) as pool:
+            results = list(pool.map(_run_combo, combos, chunksize=chunksize))
+
+    valid = [result for result in results if 'error' not in result]
+    if len(valid) < len(results):
+        logger.info(f"{len(results) - len(valid)} 个参数组合的网格间距小于利润率，已跳过")
+    for result in valid:
+        result.update(lower=lower, upper=upper)
+    return sorted(valid, key=lambda result: -result['pnl'])
+
+
+# ========== 命令行 ==========
+
+def _values(text: str, cast) -> List:
+    """'5,10,20' 或 '起始:结束:步长'（不含结束值）"""
+    if ':' in text:
+        start, stop, step = (cast(part) for part in text.split(':'))
+        return [cast(value) for value in np.arange(start, stop, step)]
+    return [cast(part) for part in text.split(',')]
+
+
+def main(argv: Sequence[str] = None):
+    parser = argparse.ArgumentParser(description='网格策略离线回测与参数扫描')
+    parser.add_argument('file', help='K线文件（.csv / .parquet / 机器人的 klines.db）')
+    parser.add_argument('--symbol', help='从 klines.db 读取时的交易对')
+    parser.add_argument('--period', default='1min', help='从 klines.db 读取时的K线周期')
+    parser.add_argument('--levels', default='5:105:5', help="网格数量，如 '10' 或 '5:105:5'")
+    parser.add_argument('--profit-rates', default='0.001,0.002,0.003', help="最低利润率，如 '0.002' 或 '0.001:0.011:0.001'")
+    parser.add_argument('--investment', type=float, default=1000, help='投资金额 (USDT)')
+    parser.add_argument('--lower', type=float, help=f'区间下限（默认取开头{RANGE_BARS}根4小时K线的最低价）')
+    parser.add_argument('--upper', type=float, help=f'区间上限（默认取开头{RANGE_BARS}根4小时K线的最高价）')
+    parser.add_argument('--geometric', action='store_true', help='等比网格')
+    parser.add_argument('--fee-rate', type=float, default=0.002, help='手续费率')
+    parser.add_argument('--workers', type=int, default=0, help='进程数（默认CPU核数）')
+    parser.add_argument('--top', type=int, default=10, help='输出前N个组合')
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    candles = load_candles(args.file, args.symbol, args.period)
+    loaded = time.perf_counter()
+    levels, rates = _values(args.levels, int), _values(args.profit_rates, float)
+    results = sweep(candles, levels, rates, args.investment, args.lower, args.upper,
+                    args.geometric, args.fee_rate, args.workers)
+    elapsed = time.perf_counter() - loaded
+
+    print(f"K线 {len(candles)} 根（读取 {loaded - started:.1f}s），{len(levels) * len(rates)} 个组合，"
+          f"有效 {len(results)} 个，回测耗时 {elapsed:.1f}s")
+    if results:
+        print(f"区间 {results[0]['lower']:.6g} - {results[0]['upper']:.6g}")
+    print(f"{'网格':>4} {'利润率':>7} {'买入':>6} {'卖出':>6} {'网格利润':>10} {'手续费':>9} {'盈亏':>10} {'收益率':>8} {'最大回撤':>9}")
+    for result in results[:args.top]:
+        print(f"{result['levels']:>6} {result['profit_rate']:>10.4f} {result['buys']:>8} {result['sells']:>8} "
+              f"{result['grid_profit']:>14.2f} {result['fees']:>12.2f} {result['pnl']:>12.2f} "
+              f"{result['return']:>10.2%} {result['max_drawdown']:>12.2f}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    main()
@@ -0,0 +1,420 @@
+"""
+网格交易策略
+"""
+import asyncio
+import functools
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BUY = 'buy'
+SELL = 'sell'
+# 订单已撤销（含部分成交后撤销）：释放价位，按当前锚点重新挂单
+CANCELED_STATES = {'canceled', 'partial-canceled'}
+
+# 网格区间：最近 30 根4小时K线的最高价与最低价
+RANGE_PERIOD = '4hour'
+RANGE_BARS = 30
+
+OrderKey = Tuple[str, int]
+
+
+class GridStrategy:
+    """单个网格
+
+    网格价位预先计算为升序数组，价格变化通过二分查找映射到受影响的价位。
+    状态只有一个锚点（最近成交的价位）：锚点以下挂买单、以上挂卖单，
+    买单成交后锚点下移、卖单成交后锚点上移，补单由期望订单集与实际挂单的差集得出。
+    """
+
+    def __init__(self, grid_id: str, symbol: str, lower: float, upper: float, levels: int,
+                 order_value: float, profit_rate: float = 0.0, geometric: bool = False,
+                 symbol_index=None):
+        if lower <= 0 or upper <= lower:
+            raise ValueError("网格区间无效")
+        if levels < 2:
+            raise ValueError("网格数量至少为2")
+
+        self.grid_id = grid_id
+        self.symbol = symbol
+        self.order_value = order_value
+        self.symbol_index = symbol_index
+
+        spacing = np.geomspace if geometric else np.linspace
+        prices = spacing(lower, upper, levels + 1)
+        if symbol_index is not None and symbol_index.get(symbol) is not None:
+            prices = np.array([float(symbol_index.round_price(symbol, p)) for p in prices])
+        prices = np.unique(prices)
+        if len(prices) < 2 or np.min(np.diff(prices) / prices[:-1]) <= profit_rate:
+            raise ValueError(f"网格间距小于最低利润率 {profit_rate:.2%}")
+
+        self.prices = prices
+        self.levels: List[float] = prices.tolist()
+        self.anchor: Optional[int] = None
+
+        self.open: Dict[OrderKey, str] = {}
+        self._keys: Dict[str, OrderKey] = {}
+        self._seq = 0
+        self.fills = 0
+        self.profit = 0.0
+        # 已请求停止：不再补单，只撤销剩余挂单
+        self.stopped = False
+
+    def __len__(self):
+        return len(self.levels)
+
+    # ========== 价位映射 ==========
+
+    def nearest_level(self, price: float) -> int:
+        i = bisect_left(self.levels, price)
+        if i == 0:
+            return 0
+        if i == len(self.levels):
+            return i - 1
+        return i if self.levels[i] - price < price - self.levels[i - 1] else i - 1
+
+    def start(self, price: float):
+        """以当前价格最近的价位为锚点"""
+        self.anchor = self.nearest_level(price)
+
+    def crossed_levels(self, price: float) -> range:
+        """价格穿越的挂单价位（买单: 价格 <= 价位；卖单: 价格 >= 价位），O(log n)"""
+        if self.anchor is None:
+            return range(0)
+        low = bisect_left(self.levels, price)
+        if low < self.anchor:
+            return range(low, self.anchor)
+        high = bisect_right(self.levels, price)
+        if high - 1 > self.anchor:
+            return range(self.anchor + 1, high)
+        return range(0)
+
+    # ========== 订单状态 ==========
+
+    def desired(self) -> Dict[OrderKey, float]:
+        """期望挂单 {(方向, 价位序号): 价格}"""
+        if self.anchor is None:
+            return {}
+        orders = {(BUY, i): self.levels[i] for i in range(self.anchor)}
+        for i in range(self.anchor + 1, len(self.levels)):
+            orders[(SELL, i)] = self.levels[i]
+        return orders
+
+    def owns(self, client_order_id: str) -> bool:
+        return client_order_id in self._keys
+
+    def on_fill(self, client_order_id: str) -> bool:
+        """订单完全成交：移动锚点，卖单累计网格利润"""
+        key = self._keys.pop(client_order_id, None)
+        if key is None:
+            return False
+        self.open.pop(key, None)
+        side, level = key
+        self.fills += 1
+        if side == BUY:
+            self.anchor = min(self.anchor, level) if self.anchor is not None else level
+        else:
+            self.anchor = max(self.anchor, level) if self.anchor is not None else level
+            if level > 0:
+                self.profit += self.order_amount(SELL, level) * (self.levels[level] - self.levels[level - 1])
+        return True
+
+    def on_cancel(self, client_order_id: str):
+        key = self._keys.pop(client_order_id, None)
+        if key is not None:
+            self.open.pop(key, None)
+
+    def missing(self, open_client_ids: Iterable[str]) -> List[str]:
+        """本网格记录为挂单、但已不在交易所挂单列表中的订单"""
+        live = set(open_client_ids)
+        return [client_order_id for client_order_id in self._keys if client_order_id not in live]
+
+    def sync(self, states: Dict[str, Optional[str]]):
+        """按订单实际状态对账：完全成交才移动锚点，已撤销或查无此单的释放价位，其余状态保持不变"""
+        for client_order_id, state in states.items():
+            if state == 'filled':
+                self.on_fill(client_order_id)
+            elif state is None or state in CANCELED_STATES:
+                self.on_cancel(client_order_id)
+
+    def order_amount(self, side: str, level: int) -> float:
+        """买单按单格金额计算数量，卖单卖出下一格买入的数量"""
+        buy_level = level if side == BUY else level - 1
+        return self.order_value / self.levels[buy_level]
+
+    def _next_client_id(self, side: str, level: int) -> str:
+        self._seq += 1
+        return f'{self.grid_id}{side[0]}{level}n{self._seq}'
+
+    def plan(self, stop: bool = False) -> Tuple[List[Dict], List[str]]:
+        """计算最小调整: (待下单列表, 待撤单 client-order-id 列表)"""
+        desired = {} if stop or self.stopped else self.desired()
+        cancels = [client_order_id for key, client_order_id in self.open.items() if key not in desired]
+        places = []
+        for (side, level), price in desired.items():
+            if (side, level) in self.open:
+                continue
+            places.append({
+                'symbol': self.symbol,
+                'order_type': f'{side}-limit',
+                'price': price,
+                'amount': self.order_amount(side, level),
+                'client_order_id': self._next_client_id(side, level),
+                'key': (side, level),
+            })
+        return places, cancels
+
+    def on_placed(self, order: Dict):
+        self.open[order['key']] = order['client_order_id']
+        self._keys[order['client_order_id']] = order['key']
+
+    def to_dict(self) -> Dict:
+        """持久化状态（价位按实际价格保存，恢复时不重新计算）"""
+        return {
+            'grid_id': self.grid_id,
+            'symbol': self.symbol,
+            'levels': self.levels,
+            'order_value': self.order_value,
+            'anchor': self.anchor,
+            'open': [[side, level, client_order_id] for (side, level), client_order_id in self.open.items()],
+            'seq': self._seq,
+            'fills': self.fills,
+            'profit': self.profit,
+            'stopped': self.stopped,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, symbol_index=None) -> 'GridStrategy':
+        """从 to_dict 的结果恢复网格（含挂单映射与锚点）"""
+        levels = [float(price) for price in data['levels']]
+        grid = cls(data['grid_id'], data['symbol'], levels[0], levels[-1], len(levels) - 1, data['order_value'])
+        grid.prices = np.array(levels)
+        grid.levels = levels
+        grid.symbol_index = symbol_index
+        grid.anchor = data.get('anchor')
+        for side, level, client_order_id in data.get('open', []):
+            grid.open[(side, level)] = client_order_id
+            grid._keys[client_order_id] = (side, level)
+        grid._seq = data.get('seq', 0)
+        grid.fills = data.get('fills', 0)
+        grid.profit = data.get('profit', 0.0)
+        grid.stopped = data.get('stopped', False)
+        return grid
+
+    def status(self) -> Dict:
+        return {
+            'grid_id': self.grid_id,
+            'symbol': self.symbol,
+            'lower': self.levels[0],
+            'upper': self.levels[-1],
+            'levels': len(self.levels),
+            'anchor': self.anchor,
+            'open_orders': len(self.open),
+            'fills': self.fills,
+            'profit': self.profit,
+        }
+
+
+class GridManager:
+    """网格管理器
+
+    按交易对索引网格，每个行情推送只对该交易对的网格做二分查找；
+    只有价格穿越挂单价位时才调度对账，同一网格两次对账至少间隔 sync_interval 秒；
+    成交处理（移动锚点）、补单、对账与停止共用每个网格一把锁，状态变更与下单之间不会交错；
+    下单/撤单失败或后台调整异常时，sync_interval 秒后自动重新对账。
+    每次调整后回调 on_change(grid)（网格已移除时也会回调），供调用方持久化状态。
+    """
+
+    def __init__(self, client, sync_interval: float = 5.0, on_change: Callable = None):
+        self.client = client
+        self.sync_interval = sync_interval
+        self.on_change = on_change
+        self.grids: Dict[str, GridStrategy] = {}
+        self._by_symbol: Dict[str, List[GridStrategy]] = {}
+        self._pending: Dict[str, asyncio.Task] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._synced: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+
+    def add(self, grid: GridStrategy):
+        self.grids[grid.grid_id] = grid
+        self._by_symbol.setdefault(grid.symbol, []).append(grid)
+
+    def remove(self, grid_id: str) -> Optional[GridStrategy]:
+        grid = self.grids.pop(grid_id, None)
+        if grid is not None:
+            grids = self._by_symbol[grid.symbol]
+            grids.remove(grid)
+            if not grids:
+                del self._by_symbol[grid.symbol]
+        self._pending.pop(grid_id, None)
+        self._locks.pop(grid_id, None)
+        self._synced.pop(grid_id, None)
+        return grid
+
+    def symbols(self) -> List[str]:
+        return list(self._by_symbol)
+
+    def find_by_order(self, client_order_id: str) -> Optional[GridStrategy]:
+        for grid in self.grids.values():
+            if grid.owns(client_order_id):
+                return grid
+        return None
+
+    def on_fill(self, fill: Dict) -> Optional[GridStrategy]:
+        """成交推送：订单完全成交时移动锚点并立即补单"""
+        if fill.get('status') != 'filled' or not fill.get('client_order_id'):
+            return None
+        grid = self.find_by_order(fill['client_order_id'])
+        if grid is not None:
+            self._spawn(grid, self._fill(grid, fill['client_order_id']))
+        return grid
+
+    async def _fill(self, grid: GridStrategy, client_order_id: str) -> Tuple[int, int]:
+        async with self._lock(grid):
+            if not grid.on_fill(client_order_id):
+                return 0, 0
+            return await self._apply(grid)
+
+    def on_price(self, symbol: str, price: float) -> List[GridStrategy]:
+        """行情回调：返回挂单价位被穿越、需要对账的网格"""
+        crossed = [grid for grid in self._by_symbol.get(symbol, ()) if grid.crossed_levels(price)]
+        for grid in crossed:
+            self.schedule(grid)
+        return crossed
+
+    def schedule(self, grid: GridStrategy):
+        """调度一次对账（同一网格同时只有一个）"""
+        if grid.grid_id not in self.grids:
+            return
+        task = self._pending.get(grid.grid_id)
+        if task is not None and not task.done():
+            return
+        now = time.monotonic()
+        if now - self._synced.get(grid.grid_id, 0.0) < self.sync_interval:
+            return
+        self._synced[grid.grid_id] = now
+        self._pending[grid.grid_id] = self._spawn(grid, self.reconcile(grid))
+
+    def _spawn(self, grid: GridStrategy, coro) -> asyncio.Task:
+        """后台调整任务：保留引用直到完成，异常记录日志并安排重新对账"""
+        task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(functools.partial(self._task_done, grid))
+        return task
+
+    def _task_done(self, grid: GridStrategy, task: asyncio.Task):
+        self._tasks.discard(task)
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None:
+            logger.error(f"网格 {grid.grid_id} 后台调整失败: {error}")
+            self._retry(grid)
+
+    def _retry(self, grid: GridStrategy):
+        """sync_interval 秒后重新对账（至少1秒）"""
+        asyncio.get_running_loop().call_later(max(self.sync_interval, 1.0), self.schedule, grid)
+
+    async def start(self, grid: GridStrategy, price: float) -> Tuple[int, int]:
+        """设置锚点并挂出初始订单"""
+        grid.start(price)
+        self.add(grid)
+        return await self.apply(grid)
+
+    async def stop(self, grid_id: str) -> Tuple[int, int]:
+        """撤销网格全部挂单，返回 (撤单数, 剩余挂单数)
+
+        挂单全部撤销后才移除网格；撤单失败的网格保持停止状态继续跟踪，可再次停止或由对账撤销。
+        """
+        grid = self.grids.get(grid_id)
+        if grid is None:
+            return 0, 0
+        async with self._lock(grid):
+            grid.stopped = True
+            _, cancelled = await self._apply(grid)
+        return cancelled, len(grid.open)
+
+    def _lock(self, grid: GridStrategy) -> asyncio.Lock:
+        lock = self._locks.get(grid.grid_id)
+        if lock is None:
+            lock = self._locks[grid.grid_id] = asyncio.Lock()
+        return lock
+
+    async def reconcile(self, grid: GridStrategy) -> Tuple[int, int]:
+        """拉取交易所挂单对账，逐个查询消失订单的实际状态，再补齐差异"""
+        async with self._lock(grid):
+            try:
+                orders = await self.client.get_open_orders(grid.symbol)
+                missing = grid.missing(order.get('client-order-id') for order in orders)
+                states = await self._order_states(missing)
+            except Exception as e:
+                logger.error(f"网格 {grid.grid_id} 对账失败: {e}")
+                return 0, 0
+            grid.sync(states)
+            return await self._apply(grid)
+
+    async def _order_states(self, client_order_ids: List[str]) -> Dict[str, Optional[str]]:
+        """查询订单状态（查无此单为 None）；单个查询失败的订单本轮不处理"""
+        results = await asyncio.gather(
+            *(self.client.get_order_by_client_id(client_order_id) for client_order_id in client_order_ids),
+            return_exceptions=True
+        )
+        states = {}
+        for client_order_id, result in zip(client_order_ids, results):
+            if isinstance(result, Exception):
+                logger.warning(f"查询订单状态失败 {client_order_id}: {result}")
+                continue
+            states[client_order_id] = result.get('state') if result else None
+        return states
+
+    async def apply(self, grid: GridStrategy, stop: bool = False) -> Tuple[int, int]:
+        """执行最小下单/撤单集合，返回 (下单数, 撤单数)"""
+        async with self._lock(grid):
+            return await self._apply(grid, stop)
+
+    async def _apply(self, grid: GridStrategy, stop: bool = False) -> Tuple[int, int]:
+        places, cancels = grid.plan(stop=stop)
+        if not places and not cancels:
+            self._finish(grid)
+            return 0, 0
+
+        cancelled, failed = await self.client.cancel_orders_batch(cancels)
+        for client_order_id in cancelled:
+            grid.on_cancel(client_order_id)
+        for client_order_id, error in failed.items():
+            logger.error(f"网格 {grid.grid_id} 撤单失败 {client_order_id}: {error}")
+
+        placed, failed = await self.client.place_orders_batch(places)
+        for order in places:
+            if order['client_order_id'] in placed:
+                grid.on_placed(order)
+        for client_order_id, error in failed.items():
+            logger.error(f"网格 {grid.grid_id} 下单失败 {client_order_id}: {error}")
+
+        logger.info(
+            f"网格 {grid.grid_id} 调整: 下单 {len(placed)}/{len(places)}，撤单 {len(cancelled)}/{len(cancels)}"
+        )
+        if len(placed) < len(places) or len(cancelled) < len(cancels):
+            self._retry(grid)
+        self._finish(grid)
+        return len(placed), len(cancelled)
+
+    def _finish(self, grid: GridStrategy):
+        """调整结束：已停止且挂单撤完的网格移除，然后通知调用方保存状态"""
+        if grid.stopped and not grid.open:
+            self.remove(grid.grid_id)
+        self._changed(grid)
+
+    def _changed(self, grid: GridStrategy):
+        if self.on_change is None:
+            return
+        try:
+            self.on_change(grid)
+        except Exception as e:
+            logger.error(f"网格 {grid.grid_id} 保存状态失败: {e}")
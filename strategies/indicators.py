@@ -0,0 +1,118 @@
+"""
+技术指标 - 批量向量化计算
+
+所有函数接受形状为 (交易对数, K线数) 的二维数组（一维数组视为单个交易对），
+沿最后一维计算，整个自选池一次完成；数据不足窗口长度的位置为 NaN。
+K线窗口由 KlineStore 随推送/刷新保持最新，每次分析直接对窗口重新计算，不另外维护增量状态。
+"""
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GOLDEN_CROSS = 1
+DEATH_CROSS = -1
+
+
+def _as_2d(values) -> np.ndarray:
+    array = np.asarray(values, dtype=np.float64)
+    return array[np.newaxis, :] if array.ndim == 1 else array
+
+
+def stack_candles(candles: Dict[str, np.ndarray], field: str, size: int) -> Tuple[List[str], np.ndarray]:
+    """把各交易对的K线结构化数组按右对齐堆叠成 (N, size) 矩阵，不足部分左侧补 NaN"""
+    symbols = list(candles)
+    matrix = np.full((len(symbols), size), np.nan)
+    for i, symbol in enumerate(symbols):
+        column = candles[symbol][field][-size:]
+        if len(column):
+            matrix[i, -len(column):] = column
+    return symbols, matrix
+
+
+def sma(values, window: int) -> np.ndarray:
+    """简单移动平均（累加和差分），窗口内含 NaN 时结果为 NaN"""
+    data = _as_2d(values)
+    out = np.full(data.shape, np.nan)
+    if data.shape[1] < window:
+        return out
+    valid = ~np.isnan(data)
+    csum = np.cumsum(np.where(valid, data, 0.0), axis=1)
+    ccount = np.cumsum(valid, axis=1)
+    sums = csum[:, window - 1:].copy()
+    counts = ccount[:, window - 1:].copy()
+    sums[:, 1:] -= csum[:, :-window]
+    counts[:, 1:] -= ccount[:, :-window]
+    out[:, window - 1:] = np.where(counts == window, sums / window, np.nan)
+    return out
+
+
+def ema(values, span: int) -> np.ndarray:
+    """指数移动平均（按时间递推，各交易对同时向量化计算；以首个完整SMA作为初值）"""
+    data = _as_2d(values)
+    seed = sma(data, span)
+    out = np.full(data.shape, np.nan)
+    alpha = 2.0 / (span + 1)
+    current = np.full(data.shape[0], np.nan)
+    for t in range(span - 1, data.shape[1]):
+        current = np.where(np.isnan(current), seed[:, t], current + alpha * (data[:, t] - current))
+        out[:, t] = current
+    return out
+
+
+def crossovers(fast: np.ndarray, slow: np.ndarray) -> np.ndarray:
+    """交叉信号矩阵：1 金叉（快线上穿慢线），-1 死叉，0 无交叉"""
+    above = np.where(np.isnan(fast) | np.isnan(slow), np.nan, np.sign(fast - slow))
+    signals = np.zeros(above.shape, dtype=np.int8)
+    prev, curr = above[:, :-1], above[:, 1:]
+    with np.errstate(invalid='ignore'):
+        signals[:, 1:][(prev <= 0) & (curr > 0)] = GOLDEN_CROSS
+        signals[:, 1:][(prev >= 0) & (curr < 0)] = DEATH_CROSS
+    return signals
+
+
+def true_range(high, low, close) -> np.ndarray:
+    """真实波幅"""
+    high, low, close = _as_2d(high), _as_2d(low), _as_2d(close)
+    prev_close = np.empty_like(close)
+    prev_close[:, 0] = np.nan
+    prev_close[:, 1:] = close[:, :-1]
+    # fmax 忽略 NaN（首根K线没有前收盘价），整行补齐的 NaN 保持为 NaN 且不产生警告
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def atr(high, low, close, window: int = 14) -> np.ndarray:
+    """平均真实波幅（简单平均）"""
+    return sma(true_range(high, low, close), window)
+
+
+def price_range(high, low, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """最近 window 根K线的最高价与最低价（网格区间）"""
+    high, low = _as_2d(high), _as_2d(low)
+    return np.fmax.reduce(high[:, -window:], axis=1), np.fmin.reduce(low[:, -window:], axis=1)
+
+
+def scan_crosses(closes, fast: int = 5, slow: int = 20, lookback: int = 1) -> np.ndarray:
+    """扫描最近 lookback 根K线内的均线交叉，返回每个交易对最近一次信号（无则为0）"""
+    signals = crossovers(sma(closes, fast), sma(closes, slow))[:, -lookback:]
+    latest = np.zeros(signals.shape[0], dtype=np.int8)
+    for column in range(signals.shape[1]):
+        hit = signals[:, column] != 0
+        latest[hit] = signals[hit, column]
+    return latest
+
+
+def summarize(highs, lows, closes, fast: int = 5, slow: int = 20) -> Dict[str, np.ndarray]:
+    """一次性计算交叉信号、最新收盘价、ATR 与区间高低点（模块级函数，可在进程池中执行）"""
+    highs, lows, closes = _as_2d(highs), _as_2d(lows), _as_2d(closes)
+    range_high, range_low = price_range(highs, lows, slow)
+    return {
+        'signal': scan_crosses(closes, fast, slow),
+        'close': closes[:, -1],
+        'atr': atr(highs, lows, closes)[:, -1],
+        'range_high': range_high,
+        'range_low': range_low,
+    }
+
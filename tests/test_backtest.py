@@ -0,0 +1,61 @@
+"""
+网格回测：向量化锚点与逐笔事件模拟一致
+"""
+import numpy as np
+import pytest
+
+from strategies.backtest import RANGE_SECONDS, _anchors, grid_range, simulate_grid
+from strategies.grid_trading import GridStrategy
+
+
+def event_anchors(grid: GridStrategy, path: np.ndarray) -> np.ndarray:
+    """逐点调用 GridStrategy.crossed_levels，成交后按实盘规则移动锚点"""
+    grid.start(path[0])
+    anchors = [grid.anchor]
+    for price in path[1:]:
+        crossed = grid.crossed_levels(price)
+        if crossed:
+            grid.anchor = crossed[0] if crossed[0] < grid.anchor else crossed[-1]
+        anchors.append(grid.anchor)
+    return np.array(anchors)
+
+
+def test_anchors_match_grid_strategy_events():
+    rng = np.random.default_rng(7)
+    for _ in range(300):
+        grid = GridStrategy('bt', '', 100, 200, int(rng.integers(2, 12)), 10, geometric=bool(rng.integers(2)))
+        prices = grid.prices
+        # 混入恰好落在价位上与两价位正中间的点，覆盖边界与起点取整
+        exact = rng.choice(np.concatenate((prices, (prices[1:] + prices[:-1]) / 2)), 60)
+        path = np.where(rng.random(60) < 0.4, exact, rng.uniform(90, 210, 60))
+        np.testing.assert_array_equal(_anchors(prices, path), event_anchors(grid, path))
+
+
+def test_simulate_grid_hand_computed():
+    # 起点110（锚点1）→ 下跌到100买入一格 → 上涨到121卖出两格
+    result = simulate_grid(np.array([110.0, 100.0, 121.0]), np.array([100.0, 110.0, 121.0]), 100, fee_rate=0.01)
+    assert (result['buys'], result['sells'], result['anchor']) == (1, 2, 2)
+    assert result['grid_profit'] == pytest.approx(20.0)
+    assert result['fees'] == pytest.approx(1.0 + 2.2)
+    # 回款 110 + 110，买入 100，初始持币成本 100，扣除手续费
+    assert result['pnl'] == pytest.approx(16.8)
+    assert result['max_drawdown'] == pytest.approx(1.0 + 100 / 110 * 10)
+
+
+def make_candles(hours: int) -> np.ndarray:
+    candles = np.zeros(hours, dtype=[('ts', 'i8'), ('open', 'f8'), ('high', 'f8'), ('low', 'f8'), ('close', 'f8')])
+    candles['ts'] = np.arange(hours) * 3600
+    candles['high'] = 100 + np.arange(hours)
+    candles['low'] = 50 - np.arange(hours)
+    return candles
+
+
+def test_grid_range_uses_leading_4h_buckets():
+    lower, upper, start = grid_range(make_candles(12), bars=2)
+    assert start == 8
+    assert (lower, upper) == (43.0, 107.0)
+
+
+def test_grid_range_needs_enough_4h_buckets():
+    with pytest.raises(ValueError):
+        grid_range(make_candles(2 * RANGE_SECONDS // 3600), bars=2)
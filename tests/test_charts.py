@@ -0,0 +1,37 @@
+"""
+图表渲染合并与取消
+"""
+import asyncio
+
+import pytest
+
+from services.charts import ChartService
+
+
+class SlowExecutor:
+    def __init__(self):
+        self.calls = 0
+
+    async def run_cpu(self, func, *args):
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return func(*args)
+
+
+def test_cancelled_first_caller_does_not_cancel_other_waiters():
+    executor = SlowExecutor()
+    charts = ChartService(executor)
+
+    async def main():
+        first = asyncio.ensure_future(charts.render('k', bytes, 3))
+        second = asyncio.ensure_future(charts.render('k', bytes, 3))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == b'\x00\x00\x00'
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(main())
+    assert executor.calls == 1
+    assert charts._cache['k'] == b'\x00\x00\x00'
+    assert not charts._rendering
@@ -0,0 +1,13 @@
+"""
+出站消息调度：会话ID归一化
+"""
+from bot.dispatcher import PRIORITY_ALERT, MessageDispatcher
+
+
+def test_send_keeps_channel_usernames_and_merges_numeric_ids():
+    dispatcher = MessageDispatcher(bot=None)
+    dispatcher.send('@price_alerts', 'a', priority=PRIORITY_ALERT)
+    dispatcher.send('-100123', 'b', priority=PRIORITY_ALERT)
+    dispatcher.send(-100123, 'c', priority=PRIORITY_ALERT)
+    assert set(dispatcher._pending) == {('@price_alerts', PRIORITY_ALERT), (-100123, PRIORITY_ALERT)}
+    assert dispatcher.depth == 3
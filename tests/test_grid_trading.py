@@ -0,0 +1,126 @@
+"""
+网格对账与成交补单
+"""
+import asyncio
+from collections import Counter
+
+from strategies.grid_trading import BUY, SELL, GridManager, GridStrategy
+
+
+class FakeExchange:
+    """内存交易所：每个接口都让出一次事件循环，便于暴露并发交错"""
+
+    def __init__(self):
+        self.open = {}
+        self.states = {}
+
+    async def get_open_orders(self, symbol=None):
+        await asyncio.sleep(0)
+        return [{'client-order-id': client_order_id} for client_order_id in self.open]
+
+    async def get_order_by_client_id(self, client_order_id):
+        await asyncio.sleep(0)
+        state = self.states.get(client_order_id)
+        return {'state': state} if state else None
+
+    async def place_orders_batch(self, orders):
+        await asyncio.sleep(0)
+        for order in orders:
+            self.open[order['client_order_id']] = order['key']
+            self.states[order['client_order_id']] = 'submitted'
+        return {order['client_order_id']: '1' for order in orders}, {}
+
+    async def cancel_orders_batch(self, client_order_ids):
+        await asyncio.sleep(0)
+        for client_order_id in client_order_ids:
+            self.open.pop(client_order_id, None)
+            self.states[client_order_id] = 'canceled'
+        return list(client_order_ids), {}
+
+    def close(self, key, state):
+        client_order_id = next(c for c, k in self.open.items() if k == key)
+        del self.open[client_order_id]
+        self.states[client_order_id] = state
+        return client_order_id
+
+
+def start_grid():
+    exchange = FakeExchange()
+    manager = GridManager(exchange, sync_interval=0)
+    grid = GridStrategy('g1', 'btcusdt', 100, 200, 10, 20)
+    asyncio.run(manager.start(grid, 150))
+    return exchange, manager, grid
+
+
+def test_fill_and_tick_do_not_duplicate_orders():
+    exchange, manager, grid = start_grid()
+
+    async def fill_during_reconcile():
+        client_order_id = exchange.close((SELL, 6), 'filled')
+        manager.schedule(grid)
+        manager.on_fill({'client_order_id': client_order_id, 'status': 'filled'})
+        await asyncio.gather(*asyncio.all_tasks() - {asyncio.current_task()})
+
+    asyncio.run(fill_during_reconcile())
+    assert grid.anchor == 6 and grid.fills == 1
+    assert max(Counter(exchange.open.values()).values()) == 1
+    assert set(exchange.open) == set(grid.open.values())
+    assert (BUY, 5) in grid.open and (SELL, 6) not in grid.open
+
+
+def test_reconcile_moves_anchor_only_for_filled_orders():
+    exchange, manager, grid = start_grid()
+    exchange.close((SELL, 7), 'canceled')
+    asyncio.run(manager.reconcile(grid))
+    assert grid.anchor == 5 and grid.fills == 0
+    assert (SELL, 7) in grid.open
+
+    exchange.close((BUY, 4), 'filled')
+    asyncio.run(manager.reconcile(grid))
+    assert grid.anchor == 4 and grid.fills == 1
+    assert set(exchange.open) == set(grid.open.values())
+
+
+def test_state_round_trip():
+    _, _, grid = start_grid()
+    restored = GridStrategy.from_dict(grid.to_dict())
+    assert restored.to_dict() == grid.to_dict()
+    assert restored._keys == grid._keys
+
+
+def test_stop_keeps_grid_until_all_orders_cancelled():
+    exchange, manager, grid = start_grid()
+    saved = []
+    manager.on_change = lambda g: saved.append(g.grid_id in manager.grids)
+    stuck = next(iter(exchange.open))
+    cancel = exchange.cancel_orders_batch
+
+    async def failing_cancel(client_order_ids):
+        cancelled, _ = await cancel([c for c in client_order_ids if c != stuck])
+        return cancelled, {stuck: 'timeout'}
+
+    exchange.cancel_orders_batch = failing_cancel
+    assert asyncio.run(manager.stop('g1')) == (9, 1)
+    assert 'g1' in manager.grids and grid.stopped and list(grid.open.values()) == [stuck]
+    assert saved == [True]
+
+    exchange.cancel_orders_batch = cancel
+    assert asyncio.run(manager.stop('g1')) == (1, 0)
+    assert 'g1' not in manager.grids and not exchange.open
+    assert saved == [True, False]
+    assert not manager._locks and not manager._synced and not manager._pending
+
+
+def test_fill_waits_for_adjustment_in_progress():
+    exchange, manager, grid = start_grid()
+
+    async def fill_while_locked():
+        client_order_id = exchange.close((SELL, 6), 'filled')
+        async with manager._lock(grid):
+            manager.on_fill({'client_order_id': client_order_id, 'status': 'filled'})
+            await asyncio.sleep(0)
+            assert grid.anchor == 5 and (SELL, 6) in grid.open
+        await asyncio.gather(*manager._tasks)
+
+    asyncio.run(fill_while_locked())
+    assert grid.anchor == 6 and (BUY, 5) in grid.open and not manager._tasks
@@ -0,0 +1,74 @@
+"""
+批量指标计算
+"""
+import warnings
+
+import numpy as np
+
+from strategies import indicators
+
+
+def candles(n: int = 60, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    high = close + rng.uniform(0, 2, n)
+    low = close - rng.uniform(0, 2, n)
+    return high, low, close
+
+
+def reference_ema(values, span):
+    """以首个完整窗口的简单平均为初值，之后按 alpha = 2 / (span + 1) 递推"""
+    out = [np.nan] * len(values)
+    current = float(np.mean(values[:span]))
+    out[span - 1] = current
+    alpha = 2.0 / (span + 1)
+    for t in range(span, len(values)):
+        current += alpha * (values[t] - current)
+        out[t] = current
+    return np.array(out)
+
+
+def reference_atr(high, low, close, window):
+    """真实波幅的简单移动平均（首根K线的真实波幅为 high - low）"""
+    tr = [high[0] - low[0]]
+    for t in range(1, len(close)):
+        tr.append(max(high[t] - low[t], abs(high[t] - close[t - 1]), abs(low[t] - close[t - 1])))
+    tr = np.array(tr)
+    out = np.full(len(tr), np.nan)
+    for t in range(window - 1, len(tr)):
+        out[t] = tr[t - window + 1:t + 1].mean()
+    return out
+
+
+def test_ema_matches_reference():
+    _, _, close = candles()
+    np.testing.assert_allclose(indicators.ema(close, 10)[0], reference_ema(close, 10), equal_nan=True)
+
+
+def test_atr_matches_reference():
+    high, low, close = candles()
+    np.testing.assert_allclose(
+        indicators.atr(high, low, close, 14)[0], reference_atr(high, low, close, 14), equal_nan=True
+    )
+
+
+def test_summarize_nan_padded_rows_without_warnings():
+    high, low, close = candles(30)
+    symbols = {
+        'full': np.array(list(zip(high, low, close)), dtype=[('high', 'f8'), ('low', 'f8'), ('close', 'f8')]),
+        'short': np.array(list(zip(high[-8:], low[-8:], close[-8:])), dtype=[('high', 'f8'), ('low', 'f8'), ('close', 'f8')]),
+        'empty': np.zeros(0, dtype=[('high', 'f8'), ('low', 'f8'), ('close', 'f8')]),
+    }
+    names, closes = indicators.stack_candles(symbols, 'close', 30)
+    _, highs = indicators.stack_candles(symbols, 'high', 30)
+    _, lows = indicators.stack_candles(symbols, 'low', 30)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        summary = indicators.summarize(highs, lows, closes, fast=5, slow=20)
+
+    full, short, empty = (names.index(name) for name in ('full', 'short', 'empty'))
+    assert summary['range_high'][full] == high[-20:].max()
+    assert summary['range_low'][short] == low[-8:].min()
+    assert np.isnan(summary['range_high'][empty]) and np.isnan(summary['atr'][empty])
+    assert summary['signal'][empty] == 0
@@ -0,0 +1,26 @@
+"""
+交易对精度格式化
+"""
+from services.symbols import SymbolIndex
+
+
+def make_index() -> SymbolIndex:
+    index = SymbolIndex(cache_file='/nonexistent/symbols.json')
+    index.load([{
+        'symbol': 'pepeusdt', 'base-currency': 'pepe', 'quote-currency': 'usdt',
+        'price-precision': 10, 'amount-precision': 2,
+    }])
+    return index
+
+
+def test_format_order_small_price_is_plain_decimal():
+    amount, price = make_index().format_order('pepeusdt', 1000000.5, 0.000000123456)
+    assert amount == '1000000.50'
+    assert price == '0.0000001235'
+
+
+def test_format_order_unknown_symbol_is_plain_decimal():
+    amount, price = make_index().format_order('xyzusdt', 0.00000005, 0.0000001)
+    assert amount == '0.00000005'
+    assert price == '0.0000001'
+    assert make_index().format_order('xyzusdt', 2)[1] is None